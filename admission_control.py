@@ -0,0 +1,204 @@
+"""
+Admission Control
+
+Keeps one box from thrashing under concurrent quiz requests:
+Incoming pipeline run
+→ Request admission: MAX_ACTIVE_REQUESTS running + MAX_QUEUED_REQUESTS waiting
+   └─ Queue full → Overloaded (HTTP 429, Retry-After from queue depth × measured service time)
+→ Per-resource bounded semaphores inside the pipeline
+   ├─ whisper  (CPU/GPU heavy, usually 1)
+   ├─ ollama   (LLM calls)
+   ├─ ffmpeg   (audio extraction / decoding)
+   └─ http     (downloads, transcript API, web search)
+→ Waits honour the request's cancellation token (disconnect / deadline)
+→ Utilisation and wait/hold times exposed for tuning (get_admission_stats)
+"""
+
+import os
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+from cancellation import current_token
+from tracing import set_attributes
+
+# ===============================
+# ADMISSION CONFIG
+# ===============================
+MAX_ACTIVE_REQUESTS = int(os.environ.get("MAX_ACTIVE_REQUESTS", "4"))    # Pipelines running at once
+MAX_QUEUED_REQUESTS = int(os.environ.get("MAX_QUEUED_REQUESTS", "16"))   # Waiting beyond that → 429
+
+RESOURCE_LIMITS = {
+    "whisper": int(os.environ.get("MAX_CONCURRENT_WHISPER", "1")),
+    "ollama": int(os.environ.get("MAX_CONCURRENT_OLLAMA", "2")),
+    "ffmpeg": int(os.environ.get("MAX_CONCURRENT_FFMPEG", "2")),
+    "http": int(os.environ.get("MAX_CONCURRENT_HTTP", "8")),
+}
+
+DEFAULT_REQUEST_SECONDS = 120.0  # Prior for the Retry-After estimate until measured
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 600
+POLL_INTERVAL = 0.25             # Seconds between cancellation checks while waiting
+EWMA_ALPHA = 0.2
+
+
+class Overloaded(RuntimeError):
+    """Admission queue is full; retry after retry_after seconds"""
+
+    def __init__(self, retry_after, message="Server busy: quiz generation queue is full"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _ewma(old, new):
+    return new if old is None else (1 - EWMA_ALPHA) * old + EWMA_ALPHA * new
+
+
+def _acquire(semaphore):
+    """Block until semaphore is acquired, giving up if the current request is cancelled"""
+    token = current_token()
+    while not semaphore.acquire(timeout=POLL_INTERVAL):
+        if token is not None:
+            token.raise_if_cancelled()
+
+
+# ===============================
+# PER-RESOURCE SEMAPHORES
+# ===============================
+class ResourcePool:
+    """Bounded semaphore for one resource, with wait/hold time measurements"""
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = max(1, limit)
+        self._semaphore = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+        self.avg_wait = None
+        self.avg_hold = None
+
+    @contextmanager
+    def slot(self):
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            _acquire(self._semaphore)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        acquired = time.monotonic()
+        with self._lock:
+            self.in_use += 1
+            self.avg_wait = _ewma(self.avg_wait, acquired - started)
+        if acquired - started >= 0.001:
+            set_attributes(**{f"wait_{self.name}_ms": round((acquired - started) * 1000, 1)})
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_use -= 1
+                self.avg_hold = _ewma(self.avg_hold, time.monotonic() - acquired)
+            self._semaphore.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "avg_wait_seconds": round(self.avg_wait or 0.0, 3),
+                "avg_hold_seconds": round(self.avg_hold or 0.0, 3),
+            }
+
+
+resource_pools = {name: ResourcePool(name, limit) for name, limit in RESOURCE_LIMITS.items()}
+
+
+def resource_slot(name):
+    """Context manager holding one slot of a resource ("whisper", "ollama", "ffmpeg", "http")"""
+    return resource_pools[name].slot()
+
+
+# ===============================
+# REQUEST ADMISSION
+# ===============================
+class AdmissionController:
+    """Bounded number of running pipelines plus a bounded wait queue"""
+
+    def __init__(self, max_active=MAX_ACTIVE_REQUESTS, max_queued=MAX_QUEUED_REQUESTS):
+        self.max_active = max(1, max_active)
+        self.max_queued = max(0, max_queued)
+        self._slots = threading.Semaphore(self.max_active)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self.avg_service = None
+
+    def retry_after(self):
+        """Seconds until a slot is likely free: queue ahead of the caller × mean service time"""
+        with self._lock:
+            service = self.avg_service or DEFAULT_REQUEST_SECONDS
+            ahead = self.queued + 1
+        seconds = math.ceil(ahead / self.max_active * service)
+        return max(MIN_RETRY_AFTER, min(MAX_RETRY_AFTER, seconds))
+
+    @contextmanager
+    def admit(self):
+        """
+        Hold a pipeline slot for the duration of the block.
+
+        Raises:
+            Overloaded: Every slot is busy and the wait queue is full
+            OperationCancelled: The request was cancelled while queued
+        """
+        with self._lock:
+            full = self.active + self.queued >= self.max_active + self.max_queued
+            if full:
+                self.rejected += 1
+            else:
+                self.queued += 1
+        if full:
+            raise Overloaded(self.retry_after())
+
+        queued_at = time.monotonic()
+        try:
+            _acquire(self._slots)
+        finally:
+            with self._lock:
+                self.queued -= 1
+        started = time.monotonic()
+        set_attributes(admission_wait_ms=round((started - queued_at) * 1000, 1))
+        with self._lock:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.avg_service = _ewma(self.avg_service, time.monotonic() - started)
+            self._slots.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "max_active": self.max_active,
+                "max_queued": self.max_queued,
+                "active": self.active,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "avg_service_seconds": round(self.avg_service or 0.0, 1),
+            }
+
+
+admission = AdmissionController()
+
+
+def get_admission_stats():
+    """Pipeline slots, wait queue and per-resource utilisation on this process"""
+    return dict(admission.snapshot(), resources={
+        name: pool.snapshot() for name, pool in resource_pools.items()
+    })
@@ -5,24 +5,77 @@ Endpoints:
     POST /generate-quiz - Generate 20 MCQs from YouTube URL
     POST /generate-quiz-from-video - Generate 20 MCQs from direct video URL (S3, CDN, HTTPS)
     POST /generate-course-quiz - Generate MCQs from multiple course videos
-    GET /health - Health check endpoint
+    GET /health - Health check endpoint (liveness)
+    GET /ready - Readiness: 200 once Whisper / Ollama models are warm, 503 before (see warmup.py)
+    GET /stats - Runtime tuning stats (Ollama throughput, stage durations, Whisper speed)
+    GET /metrics - Prometheus metrics (stage latency histograms, Ollama tokens, retries, queues)
+    GET /admin/profiles - Stored per-request profiles (X-Admin-Token required)
+
+Requests carrying X-Profile: <PROFILE_ADMIN_TOKEN> (or ?profile=<token>) are profiled
+per pipeline stage (CPU samples + tracemalloc snapshots, see profiling.py).
+
+Requests beyond the admission queue are rejected with 429 and a Retry-After header.
 """
-from fastapi import FastAPI, HTTPException
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from app.schemas import (
     QuizRequest, QuizResponse,
     VideoURLRequest, CourseVideoRequest, CourseQuizResponse
 )
 from app.services.quiz_service import (
-    generate_quiz, create_quiz, create_quiz_from_video_url, create_course_quiz
+    generate_quiz, create_quiz, create_quiz_from_video_url, create_course_quiz,
+    build_pipeline_config
 )
+from token_budget import get_throughput_stats
+from deadline_scheduler import get_stage_stats
+from cancellation import CancellationToken, OperationCancelled, get_cancellation_stats
+from single_flight import get_single_flight_stats
+from admission_control import Overloaded, get_admission_stats
+from cpu_partition import get_cpu_partition
+from ollama_pool import get_ollama_pool_stats
+from circuit_breaker import CircuitOpen, get_breaker_stats
+from warmup import start_warmup, get_readiness
+from asr_service import get_asr_stats
+from metrics import render_metrics, record_http_request
+from tracing import span
+from profiling import (
+    is_authorized, start_session, end_session, list_profiles, profile_file_path
+)
+
+# LOG_LEVEL=DEBUG also logs per-stage timings and raw LLM output
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+# How often a running request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 1.0
+
+# Scrapes / probes are not traced (they would bury the quiz traces)
+UNTRACED_PATHS = {"/metrics", "/health", "/ready", "/stats"}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up runs in the background: /health answers at once, /ready once models are warm
+    start_warmup()
+    yield
 
 app = FastAPI(
     title="Video MCQ Generator API",
     description="Generate 20 unique multiple-choice questions from YouTube videos or direct video URLs (S3, CDN, HTTPS)",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Enable CORS for frontend integration
@@ -35,14 +88,202 @@ app.add_middleware(
 )
 
 
+async def run_cancellable(request: Request, token: CancellationToken, func, *args, **kwargs):
+    """
+    Run blocking pipeline work in the thread pool, cancelling it if the client disconnects
+    
+    The handler keeps waiting for the worker after cancelling, so the thread pool
+    slot is only released once the pipeline has actually stopped.
+    """
+    work = asyncio.ensure_future(run_in_threadpool(func, *args, cancel_token=token, **kwargs))
+    while not work.done():
+        await asyncio.wait({work}, timeout=DISCONNECT_POLL_SECONDS)
+        if not work.done() and not token.cancelled and await request.is_disconnected():
+            token.cancel("client disconnected")
+    return work.result()
+
+
+def overloaded_http_error(e: Overloaded):
+    """429 with a Retry-After estimated from the queue depth"""
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def upstream_down_http_error(e: CircuitOpen):
+    """503 while a required upstream (e.g. every Ollama endpoint) is failing"""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, int(e.retry_in)))})
+
+
+def cancelled_http_error(token: CancellationToken, e: OperationCancelled):
+    """504 when the request deadline passed, 499 (client closed request) otherwise"""
+    status_code = 504 if token.reason == "deadline exceeded" else 499
+    return HTTPException(status_code=status_code, detail=str(e))
+
+
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "Video MCQ Generator API"}
 
 
+@app.get("/ready")
+def readiness_check():
+    """
+    Readiness probe for the load balancer
+    
+    200 once every warm-up backend (Whisper model, Ollama models per endpoint)
+    is loaded and has answered a tiny inference, 503 before. The body lists
+    each backend's state, warm-up attempts and warm-up latency in seconds.
+    """
+    readiness = get_readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+
+class RequestObservabilityMiddleware:
+    """
+    Latency metric, root trace span and per-request profiling for every HTTP request.
+
+    Pure ASGI (not @app.middleware / BaseHTTPMiddleware): `receive` reaches the
+    endpoint untouched, so request.is_disconnected() in run_cancellable still sees
+    the client's http.disconnect.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        started = time.monotonic()
+        state = {"status_code": 500, "headers": []}
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                state["status_code"] = message["status"]
+                if state["headers"]:
+                    message = {**message, "headers": [*message.get("headers", []), *state["headers"]]}
+            await send(message)
+
+        try:
+            if request.url.path in UNTRACED_PATHS:
+                await self.app(scope, receive, send_with_headers)
+                return
+            # Root span of the request's trace; the trace ID lets a client look it up later
+            with span(f"{request.method} {request.url.path}", kind="http") as root:
+                if root:
+                    state["headers"].append((b"x-trace-id", root.trace_id.encode()))
+                profile_token = request.headers.get("X-Profile") or request.query_params.get("profile")
+                if profile_token and not is_authorized(profile_token):
+                    response = JSONResponse({"detail": "Profiling not authorized"}, status_code=403)
+                    await response(scope, receive, send_with_headers)
+                elif profile_token:
+                    await self.call_profiled(request, receive, send_with_headers, state,
+                                             root.trace_id if root else None)
+                else:
+                    await self.app(scope, receive, send_with_headers)
+                if root:
+                    root.set(status_code=state["status_code"])
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"  # Bounded label values
+            record_http_request(request.method, path, state["status_code"], time.monotonic() - started)
+
+    async def call_profiled(self, request, receive, send, state, trace_id):
+        """Run the request under a profile session; the profile name comes back in X-Profile-Name"""
+        session, reset = start_session(f"{request.method} {request.url.path}", trace_id)
+        finished = False
+
+        async def finish(status_code):
+            nonlocal finished
+            finished = True
+            end_session(reset)
+            return await run_in_threadpool(session.finish, status_code)
+
+        async def send_profiled(message):
+            if message["type"] == "http.response.start" and not finished:
+                # The endpoint has produced its response: close the profile before the headers go out
+                name = await finish(message["status"])
+                state["headers"].append((b"x-profile-name", name.encode()))
+            await send(message)
+
+        try:
+            await self.app(request.scope, receive, send_profiled)
+        finally:
+            if not finished:
+                await finish(None)
+
+
+app.add_middleware(RequestObservabilityMiddleware)
+
+
+def require_admin(request: Request):
+    if not is_authorized(request.headers.get("X-Admin-Token")):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.get("/admin/profiles")
+def admin_profiles(request: Request):
+    """
+    Stored per-request profiles, newest first
+    
+    Each entry has the request, its trace ID, duration, CPU samples per stage and
+    net memory allocated per stage; download the files with
+    GET /admin/profiles/{name}/{file} (cpu.folded is flamegraph / speedscope input).
+    """
+    require_admin(request)
+    return {"profiles": list_profiles()}
+
+
+@app.get("/admin/profiles/{name}/{file}")
+def admin_profile_file(name: str, file: str, request: Request):
+    """One file of a stored profile (summary.json, cpu.folded or memory.json)"""
+    require_admin(request)
+    try:
+        return FileResponse(profile_file_path(name, file))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Profile file not found: {name}/{file}")
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/stats")
+def runtime_stats():
+    """
+    Runtime tuning stats
+    
+    Returns the Ollama throughput measured on this host (prompt/eval tokens per
+    second and calibrated chars per token, per model) and the measured stage
+    durations / Whisper real-time factors. These estimates drive the per-call
+    num_ctx/num_predict, timeouts and deadline degradations. Also reports the
+    work stopped by cancellations and the worker time it freed, how many
+    requests were coalesced onto an in-flight generation, admission queue /
+    per-resource slot utilisation, the CPU thread budgets per stage, the
+    load / health of each Ollama endpoint pool (HTTP transport), the
+    circuit breaker state of every upstream, the warm-up readiness, and the
+    ASR service queue / workers (null when Whisper runs in-process).
+    """
+    return {
+        "throughput": get_throughput_stats(),
+        "stages": get_stage_stats(),
+        "cancellation": get_cancellation_stats(),
+        "coalescing": get_single_flight_stats(),
+        "admission": get_admission_stats(),
+        "cpu_partition": get_cpu_partition().to_dict(),
+        "ollama_pools": get_ollama_pool_stats(),
+        "circuit_breakers": get_breaker_stats(),
+        "readiness": get_readiness(),
+        "asr": get_asr_stats()
+    }
+
+
 @app.post("/generate-quiz", response_model=QuizResponse)
-def generate_quiz_api(payload: QuizRequest):
+async def generate_quiz_api(payload: QuizRequest, request: Request):
     """
     Generate 20 unique MCQs from a video URL (YouTube or direct video URL)
     
@@ -56,17 +297,29 @@ def generate_quiz_api(payload: QuizRequest):
     3. Generate 20 unique MCQs using Ollama
     
     Args:
-        payload: QuizRequest containing url (YouTube or direct video URL)
+        payload: QuizRequest containing url (YouTube or direct video URL) and
+            optional pipeline options (profile "fast" / "exam" + overrides)
         
     Returns:
         QuizResponse with exactly 20 MCQ questions
         
     Raises:
-        HTTPException: If quiz generation fails
+        HTTPException: If quiz generation fails, the request was cancelled or
+            the server is at capacity (429)
     """
+    token = CancellationToken()
     try:
-        result = generate_quiz(str(payload.url))
+        config = build_pipeline_config(payload.pipeline)
+        result = await run_cancellable(
+            request, token, generate_quiz, str(payload.url), config, payload.deadline_seconds
+        )
         return result
+    except OperationCancelled as e:
+        raise cancelled_http_error(token, e)
+    except Overloaded as e:
+        raise overloaded_http_error(e)
+    except CircuitOpen as e:
+        raise upstream_down_http_error(e)
     except ValueError as e:
         # Handle unsupported URL type
         raise HTTPException(status_code=400, detail=str(e))
@@ -82,7 +335,7 @@ def generate_quiz_api(payload: QuizRequest):
 
 
 @app.post("/generate-quiz-from-video", response_model=QuizResponse)
-def generate_quiz_from_video(payload: VideoURLRequest):
+async def generate_quiz_from_video(payload: VideoURLRequest, request: Request):
     """
     Generate 20 unique MCQs from a direct video URL (S3, CDN, HTTPS)
     
@@ -97,17 +350,32 @@ def generate_quiz_from_video(payload: VideoURLRequest):
     5. Generate 20 unique MCQs using Ollama
     
     Args:
-        payload: VideoURLRequest containing video_url
+        payload: VideoURLRequest containing video_url and optional pipeline options
         
     Returns:
         QuizResponse with exactly 20 MCQ questions
         
     Raises:
-        HTTPException: If quiz generation fails
+        HTTPException: If quiz generation fails or the request was cancelled
     """
     try:
-        result = create_quiz_from_video_url(str(payload.video_url))
+        config = build_pipeline_config(payload.pipeline)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    token = CancellationToken()
+    try:
+        result = await run_cancellable(
+            request, token, create_quiz_from_video_url,
+            str(payload.video_url), config, payload.deadline_seconds
+        )
         return result
+    except OperationCancelled as e:
+        raise cancelled_http_error(token, e)
+    except Overloaded as e:
+        raise overloaded_http_error(e)
+    except CircuitOpen as e:
+        raise upstream_down_http_error(e)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
@@ -118,7 +386,7 @@ def generate_quiz_from_video(payload: VideoURLRequest):
 
 
 @app.post("/generate-course-quiz", response_model=CourseQuizResponse)
-def generate_course_quiz(payload: CourseVideoRequest):
+async def generate_course_quiz(payload: CourseVideoRequest, request: Request):
     """
     Generate MCQs from multiple course video URLs
     
@@ -135,11 +403,23 @@ def generate_course_quiz(payload: CourseVideoRequest):
         HTTPException: If processing fails
     """
     try:
-        result = create_course_quiz(
+        config = build_pipeline_config(payload.pipeline)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    token = CancellationToken()
+    try:
+        result = await run_cancellable(
+            request, token, create_course_quiz,
             payload.course_id or "",
-            list(payload.video_urls)
+            list(payload.video_urls),
+            use_question_bank=payload.use_question_bank,
+            config=config,
+            deadline_seconds=payload.deadline_seconds
         )
         return result
+    except Overloaded as e:
+        raise overloaded_http_error(e)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -1,24 +1,45 @@
 """
 Pydantic schemas for request/response validation
 """
-from pydantic import BaseModel, AnyUrl
-from typing import Dict, List, Optional
+from pydantic import BaseModel, AnyUrl, Field
+from typing import Dict, List, Literal, Optional
+
+
+class PipelineOptions(BaseModel):
+    """Per-request speed/quality tier (profile) with optional individual overrides"""
+    profile: Optional[Literal["fast", "exam"]] = None
+    fast_mode: Optional[bool] = None
+    max_transcript_tokens: Optional[int] = Field(default=None, ge=100, le=8192)
+    whisper_model: Optional[str] = None
+    ollama_model: Optional[str] = None
+    enrichment_model: Optional[str] = None
+    fetch_all_topics: Optional[bool] = None
+    topic_extractor: Optional[Literal["llm", "local"]] = None
+    enrichment_source: Optional[Literal["web", "local", "local+web"]] = None
+    max_retries: Optional[int] = Field(default=None, ge=0, le=20)
 
 
 class QuizRequest(BaseModel):
     """Request model for quiz generation from YouTube URL or direct video URL (S3, CDN, HTTPS)"""
     url: AnyUrl
+    pipeline: Optional[PipelineOptions] = None  # Process defaults if omitted
+    deadline_seconds: Optional[float] = Field(default=None, gt=0, le=3600)  # Latency SLA
 
 
 class VideoURLRequest(BaseModel):
     """Request model for quiz generation from direct video URL (S3, CDN, HTTPS)"""
     video_url: AnyUrl
+    pipeline: Optional[PipelineOptions] = None
+    deadline_seconds: Optional[float] = Field(default=None, gt=0, le=3600)
 
 
 class CourseVideoRequest(BaseModel):
     """Request model for generating MCQs from multiple course videos"""
     course_id: Optional[str] = None
     video_urls: List[AnyUrl]
+    use_question_bank: bool = True  # Reuse banked questions, generate only uncovered videos
+    pipeline: Optional[PipelineOptions] = None
+    deadline_seconds: Optional[float] = Field(default=None, gt=0, le=3600)  # Whole batch
 
 
 class MCQ(BaseModel):
@@ -32,12 +53,17 @@ class MCQ(BaseModel):
 class QuizResponse(BaseModel):
     """Response model containing list of MCQs"""
     questions: List[MCQ]
+    # Applied to meet deadline_seconds: skip_enrichment, whisper_tiny,
+    # reduced_question_count, chunk_sampling
+    degradations: List[str] = []
 
 
 class VideoQuizResult(BaseModel):
     """Result for a single video quiz generation"""
     video_url: str
     questions: List[MCQ]
+    from_bank: bool = False  # True if served from the course question bank (no LLM call)
+    degradations: List[str] = []
 
 
 class CourseQuizResponse(BaseModel):
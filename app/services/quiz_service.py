@@ -3,54 +3,151 @@ Service layer that bridges FastAPI to the core quiz generation logic
 """
 import sys
 import os
+import math
 
 # Add parent directory to path to import youtube_quiz_generator
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(os.path.dirname(current_dir))
 sys.path.insert(0, project_root)
 
-from youtube_quiz_generator import generate_quiz_from_url, generate_quiz_from_video_url
+from youtube_quiz_generator import (
+    generate_quiz_from_url, generate_quiz_from_video_url, canonical_video_id,
+    get_pipeline_config, default_pipeline_config, TOKENS_PER_MCQ
+)
+from question_bank import get_question_bank
+from deadline_scheduler import DeadlineScheduler, Deadline
+from cancellation import CancellationToken, OperationCancelled, cancel_scope
+from single_flight import get_quiz_flights
+from admission_control import admission, Overloaded
+from metrics import record_cache
+from tracing import span, set_attributes
 
+# Deadline requests coalesce only within the same geometric deadline bucket
+# (bucket width ×1.25: a 3600s request never attaches to a flight planned for 10s)
+DEADLINE_KEY_RATIO = 1.25
 
-def generate_quiz(url: str):
+
+def _make_scheduler(deadline_seconds):
+    """Per-request deadline scheduler (None = no deadline, full pipeline)"""
+    if deadline_seconds is None:
+        return None
+    return DeadlineScheduler(deadline_seconds, tokens_per_mcq=TOKENS_PER_MCQ)
+
+
+def _request_token(cancel_token, deadline):
+    """Cancellation token for the request; it also fires when the deadline passes"""
+    token = cancel_token or CancellationToken()
+    if deadline is not None:
+        token.deadline = deadline
+    return token
+
+
+def _quiz_result(questions, scheduler):
+    return {
+        "questions": questions,
+        "degradations": list(scheduler.degradations) if scheduler is not None else []
+    }
+
+
+def build_pipeline_config(options=None):
+    """
+    Build the per-request PipelineConfig from API options
+    
+    Args:
+        options: app.schemas.PipelineOptions or None (process defaults)
+        
+    Returns:
+        PipelineConfig (validated)
+        
+    Raises:
+        ValueError: If the profile or an override is not supported
+    """
+    if options is None:
+        return get_pipeline_config()
+    overrides = options.model_dump(exclude_none=True)
+    return get_pipeline_config(overrides.pop("profile", None), **overrides)
+
+
+def _flight_key(video_url, config, scheduler):
+    """
+    Single-flight key: canonical video + pipeline fingerprint
+    
+    Deadline requests get their own flights, per deadline bucket, so a request is
+    never handed a quiz degraded for a much tighter deadline than its own.
+    """
+    key = f"{canonical_video_id(video_url)}|{config.fingerprint()}"
+    if scheduler is None:
+        return key
+    bucket = math.floor(math.log(max(1.0, scheduler.deadline.seconds), DEADLINE_KEY_RATIO))
+    return f"{key}|deadline:{bucket}"
+
+
+def generate_quiz(url: str, config=None, deadline_seconds=None, cancel_token=None):
     """
     Generate quiz from URL - automatically routes based on URL type
     
+    Concurrent requests for the same video and pipeline profile are coalesced:
+    they attach to the one in-flight generation and all receive its result.
+    
     Supports:
     - YouTube URLs (youtube.com, youtu.be)
     - Direct video URLs (S3, CDN, HTTPS with .mp4, .mov, .mkv, .webm extensions)
     
     Args:
         url: Video URL (YouTube or direct video URL)
+        config: PipelineConfig for this request (process defaults if None)
+        deadline_seconds: Optional latency budget; the pipeline degrades to meet it
+            and is cancelled once it has passed
+        cancel_token: Optional CancellationToken (cancelled on client disconnect)
         
     Returns:
-        dict: {"questions": [...]} with 20 MCQ dictionaries
+        dict: {"questions": [...], "degradations": [...]} with 20 MCQ dictionaries
+            (fewer if the deadline forced a reduced question count)
         
     Raises:
         ValueError: If URL type is unsupported
+        OperationCancelled: If the request was cancelled
         Exception: If quiz generation fails
     """
     url = url.strip()
-    
+    config = config or default_pipeline_config()
+    scheduler = _make_scheduler(deadline_seconds)
+    token = _request_token(cancel_token, scheduler.deadline if scheduler else None)
+    return get_quiz_flights().do(
+        _flight_key(url, config, scheduler),
+        lambda flight_token: _route_quiz(url, config, scheduler, flight_token),
+        token
+    )
+
+
+def _route_quiz(url, config, scheduler, token):
+    """Run the pipeline matching the URL type (inside an admission slot)"""
+    with cancel_scope(token), admission.admit():
+        return _route_quiz_admitted(url, config, scheduler, token)
+
+
+def _route_quiz_admitted(url, config, scheduler, token):
     # 1️⃣ YouTube URLs
     if "youtube.com" in url or "youtu.be" in url:
-        questions = generate_quiz_from_url(url)
-        return {"questions": questions}
+        questions = generate_quiz_from_url(url, config, scheduler, token)
+        return _quiz_result(questions, scheduler)
     
     # 2️⃣ Direct video URLs (S3 / CDN / MP4)
     if url.startswith("http") and (
         url.endswith((".mp4", ".mov", ".mkv", ".webm")) or
         ".mp4" in url or ".mov" in url or ".mkv" in url or ".webm" in url
     ):
-        questions = generate_quiz_from_video_url(url)
-        return {"questions": questions}
+        questions = generate_quiz_from_video_url(url, config, scheduler, token)
+        return _quiz_result(questions, scheduler)
     
     # 3️⃣ Generic HTTPS URLs (assume video if not YouTube)
     if url.startswith("http"):
         # Try as direct video URL (will fail gracefully if not a video)
         try:
-            questions = generate_quiz_from_video_url(url)
-            return {"questions": questions}
+            questions = generate_quiz_from_video_url(url, config, scheduler, token)
+            return _quiz_result(questions, scheduler)
+        except OperationCancelled:
+            raise
         except Exception:
             raise ValueError(
                 f"Unsupported URL type: {url}\n"
@@ -82,58 +179,133 @@ def create_quiz(youtube_url: str):
     return {"questions": questions}
 
 
-def create_quiz_from_video_url(video_url: str):
+def create_quiz_from_video_url(video_url: str, config=None, deadline_seconds=None,
+                               cancel_token=None):
     """
     Generate quiz from direct video URL (S3, CDN, HTTPS)
     
+    Concurrent requests for the same video and pipeline profile are coalesced.
+    
     Args:
         video_url: HTTP/HTTPS URL to video file (string)
+        config: PipelineConfig for this request (process defaults if None)
+        deadline_seconds: Optional latency budget; the pipeline degrades to meet it
+            and is cancelled once it has passed
+        cancel_token: Optional CancellationToken (cancelled on client disconnect)
         
     Returns:
-        dict: {"questions": [...]} with 20 MCQ dictionaries
+        dict: {"questions": [...], "degradations": [...]} with 20 MCQ dictionaries
+            (fewer if the deadline forced a reduced question count)
         
     Raises:
         Exception: If quiz generation fails
     """
-    questions = generate_quiz_from_video_url(video_url)
-    return {"questions": questions}
+    config = config or default_pipeline_config()
+    scheduler = _make_scheduler(deadline_seconds)
+    token = _request_token(cancel_token, scheduler.deadline if scheduler else None)
+    
+    def run(flight_token):
+        with cancel_scope(flight_token), admission.admit():
+            questions = generate_quiz_from_video_url(video_url, config, scheduler, flight_token)
+        return _quiz_result(questions, scheduler)
+    
+    return get_quiz_flights().do(_flight_key(video_url, config, scheduler), run, token)
 
 
-def create_course_quiz(course_id: str, video_urls: list):
+def create_course_quiz(course_id: str, video_urls: list, use_question_bank: bool = True,
+                       config=None, deadline_seconds=None, cancel_token=None):
     """
     Generate quizzes from multiple course video URLs
     
+    Videos already covered by the course question bank are served from it
+    without any LLM call; only uncovered videos go through the pipeline.
+    Newly generated questions are banked with cross-video dedup, so a later
+    lecture never re-asks a question from an earlier one.
+    
     Args:
         course_id: Optional course identifier
         video_urls: List of video URLs (strings)
+        use_question_bank: Reuse/store questions in the course question bank
+        config: PipelineConfig shared by all videos (process defaults if None)
+        deadline_seconds: Optional latency budget for the whole batch; the time
+            left is split evenly across the videos still to be generated
+        cancel_token: Optional CancellationToken (cancelled on client disconnect);
+            once cancelled, the remaining videos are reported as not processed
         
     Returns:
         dict: {"course_id": ..., "results": [...]} with quiz results per video
         
     Raises:
-        Exception: If quiz generation fails for any video
+        Overloaded: The server was at capacity before any video was processed
     """
+    config = config or default_pipeline_config()
     results = []
+    bank = get_question_bank() if use_question_bank else None
+    deadline = Deadline(deadline_seconds) if deadline_seconds is not None else None
+    token = _request_token(cancel_token, deadline)
     
-    for video_url in video_urls:
-        try:
-            questions = generate_quiz_from_video_url(str(video_url))
-            results.append({
-                "video_url": str(video_url),
-                "questions": questions
-            })
-        except Exception as e:
-            # Continue with other videos even if one fails
-            results.append({
-                "video_url": str(video_url),
-                "questions": [],
-                "error": str(e)
-            })
+    for index, video_url in enumerate(video_urls):
+        video_url = str(video_url)
+        video_id = canonical_video_id(video_url)
+        with span("course_video", video_url=video_url, video_id=video_id, index=index):
+            try:
+                # Serve from the bank when this video was already processed for the course
+                banked = bank is not None and bank.has_video(course_id, video_id)
+                if bank is not None:
+                    record_cache("question_bank", banked)
+                    set_attributes(from_bank=banked)
+                if banked:
+                    results.append({
+                        "video_url": video_url,
+                        "questions": bank.get_video_questions(course_id, video_id),
+                        "from_bank": True
+                    })
+                    continue
+            
+                scheduler = None
+                if deadline is not None:
+                    scheduler = _make_scheduler(max(0.0, deadline.remaining()) / (len(video_urls) - index))
+            
+                def run(flight_token):
+                    with cancel_scope(flight_token), admission.admit():
+                        questions = generate_quiz_from_video_url(video_url, config, scheduler, flight_token)
+                    return _quiz_result(questions, scheduler)
+            
+                result = dict(get_quiz_flights().do(_flight_key(video_url, config, scheduler), run, token))
+                # A deadline-degraded quiz (fewer questions, sampled audio, smaller Whisper)
+                # answers this request only: banked, it would be served to every later one
+                if bank is not None and not result["degradations"]:
+                    if bank.has_video(course_id, video_id):
+                        # A concurrent request for this course banked the same coalesced run
+                        results.append({
+                            "video_url": video_url,
+                            "questions": bank.get_video_questions(course_id, video_id),
+                            "from_bank": True
+                        })
+                        continue
+                    result["questions"] = bank.add_questions(
+                        course_id, video_id, video_url, result["questions"], model=config.ollama_model
+                    )
+                results.append({"video_url": video_url, **result})
+            except (OperationCancelled, Overloaded) as e:
+                if isinstance(e, Overloaded) and not results:
+                    # Nothing done yet: let the client retry the whole batch (429)
+                    raise
+                # Stop the batch: report this and every remaining video as not processed
+                set_attributes(error=str(e))
+                for skipped_url in video_urls[index:]:
+                    results.append({"video_url": str(skipped_url), "questions": [], "error": str(e)})
+                break
+            except Exception as e:
+                # Continue with other videos even if one fails
+                set_attributes(error=str(e))
+                results.append({
+                    "video_url": video_url,
+                    "questions": [],
+                    "error": str(e)
+                })
     
     return {
         "course_id": course_id,
         "results": results
     }
-
-
-
@@ -0,0 +1,482 @@
+"""
+ASR Service Tier (Whisper in dedicated worker processes)
+
+By default Whisper runs inside the API worker: a long transcription holds that
+process's CPU (and, in the GIL-bound parts, its event loop) while every other request
+on it waits. With ASR_SERVICE set, the API workers only decode and cut the audio:
+API worker (load_whisper_model → RemoteWhisperModel)
+→ model.transcribe(pcm, **options): float32 PCM + options over a local socket
+  (multiprocessing.connection, pickle; Unix socket 0600 or TCP with ASR_AUTHKEY)
+   └─ waits polling for cancellation: a cancelled request closes the connection and
+      its queued segment is dropped before any worker starts it
+ASR service (python asr_service.py, sized independently: ASR_WORKERS)
+→ accepts connections, queues segments (FIFO)
+→ ASR_WORKERS worker processes, each with the ASR_MODELS preloaded and warm
+   ├─ one segment at a time: transcribe → result dict (text, language, segments)
+   ├─ recycled after ASR_MAX_JOBS segments or once its RSS grew ASR_MAX_RSS_GROWTH_MB
+   │  past the post-load baseline (allocator fragmentation / leaks)
+   └─ a worker that dies mid-segment fails that segment only and is respawned
+→ {"op": "stats"}: queue depth, per-worker jobs / RSS / restarts (GET /stats "asr")
+
+Usage:
+    ASR_SERVICE=/tmp/quiz_asr.sock ASR_WORKERS=2 python asr_service.py
+    ASR_SERVICE=/tmp/quiz_asr.sock uvicorn app.main:app --workers 4
+"""
+
+import os
+import sys
+import time
+import queue
+import signal
+import socket
+import logging
+import argparse
+import threading
+import multiprocessing
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# ASR SERVICE CONFIG
+# ===============================
+# Where the ASR service listens: "/path/to.sock" (or "unix:/path"), "host:port".
+# Empty = Whisper runs in-process in every API worker
+ASR_SERVICE = os.environ.get("ASR_SERVICE", "")
+# Shared secret for the connection handshake (required for TCP: messages are pickles)
+ASR_AUTHKEY = os.environ.get("ASR_AUTHKEY", "")
+ASR_WORKERS = int(os.environ.get("ASR_WORKERS", "2"))
+# Whisper models every worker preloads, comma-separated (default: WHISPER_MODEL)
+ASR_MODELS = os.environ.get("ASR_MODELS", "")
+# Torch threads per worker (0 = cores / ASR_WORKERS)
+ASR_THREADS = int(os.environ.get("ASR_THREADS", "0"))
+# Recycle a worker after this many segments (0 = never)
+ASR_MAX_JOBS = int(os.environ.get("ASR_MAX_JOBS", "1000"))
+# Recycle a worker once its RSS grew this many MB past its post-load baseline (0 = never)
+ASR_MAX_RSS_GROWTH_MB = float(os.environ.get("ASR_MAX_RSS_GROWTH_MB", "1024"))
+# Client side: seconds one transcribe call may take, queueing included
+ASR_TIMEOUT = float(os.environ.get("ASR_TIMEOUT", "900"))
+POLL_SECONDS = 0.2      # Cancellation / disconnect check interval while a segment runs
+RESPAWN_DELAY = 1.0     # Seconds before respawning a worker that died during start-up
+STOP_TIMEOUT = 30.0     # Seconds a worker gets to finish its segment on shutdown
+
+
+class ASRUnavailable(RuntimeError):
+    """The ASR service could not run the segment (unreachable, worker died, timed out)"""
+
+
+def parse_address(address):
+    """multiprocessing.connection address: socket path, or (host, port) for "host:port" """
+    if address.startswith("unix:"):
+        return address[len("unix:"):]
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+def _authkey():
+    return ASR_AUTHKEY.encode() if ASR_AUTHKEY else None
+
+
+# ===============================
+# CLIENT (API WORKERS)
+# ===============================
+class RemoteWhisperModel:
+    """Stand-in for a loaded Whisper model whose transcribe() runs on the ASR service"""
+
+    def __init__(self, name, address=None):
+        from circuit_breaker import get_breaker
+        self.name = name
+        self.address = address or ASR_SERVICE
+        self.breaker = get_breaker("asr_service")
+
+    def transcribe(self, audio, **options):
+        """
+        Transcribe float32 PCM (whisper.audio.SAMPLE_RATE) on an ASR worker.
+
+        Returns:
+            Whisper's result dict (text, language, segments)
+
+        Raises:
+            CircuitOpen: The ASR service keeps failing
+            ASRUnavailable: Service unreachable, worker died or ASR_TIMEOUT exceeded
+            OperationCancelled: The request was cancelled while the segment was queued / running
+            RuntimeError: Whisper failed on this segment
+        """
+        import numpy as np
+        request = {
+            "op": "transcribe",
+            "model": self.name,
+            "audio": np.ascontiguousarray(audio, dtype=np.float32).tobytes(),
+            "options": options,
+        }
+        with self.breaker.guard(is_failure=lambda e: isinstance(e, ASRUnavailable)):
+            reply = _call(self.address, request, ASR_TIMEOUT)
+            if reply.get("unavailable"):
+                raise ASRUnavailable(reply["error"])
+        if not reply["ok"]:
+            raise RuntimeError(f"ASR service: {reply['error']}")
+        return reply["result"]
+
+
+def _call(address, request, timeout):
+    from cancellation import current_token
+    token = current_token()
+    try:
+        conn = Client(parse_address(address), authkey=_authkey())
+    except OSError as e:
+        raise ASRUnavailable(f"ASR service unreachable at {address}: {e}") from e
+    # Closing the connection (cancel / timeout) tells the service to drop the segment
+    with conn:
+        try:
+            conn.send(request)
+            deadline = time.monotonic() + timeout
+            while not conn.poll(POLL_SECONDS):
+                if token is not None:
+                    token.raise_if_cancelled()
+                if time.monotonic() > deadline:
+                    raise ASRUnavailable(f"ASR service gave no answer within {timeout:.0f}s")
+            return conn.recv()
+        except (EOFError, OSError) as e:
+            raise ASRUnavailable(f"ASR service connection lost: {e}") from e
+
+
+def get_asr_stats():
+    """Queue / worker stats of the ASR service (None when Whisper runs in-process)"""
+    if not ASR_SERVICE:
+        return None
+    try:
+        reply = _call(ASR_SERVICE, {"op": "stats"}, timeout=5)
+    except ASRUnavailable as e:
+        return {"address": ASR_SERVICE, "error": str(e)}
+    return {"address": ASR_SERVICE, **reply["result"]}
+
+
+# ===============================
+# WORKER PROCESS
+# ===============================
+def _rss_mb():
+    """Current resident set size of this process in MB (None where unknown)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Peak: KB on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _worker_main(conn, models, threads, max_jobs, max_growth_mb, log_level):
+    """ASR worker: preload + warm the models, then transcribe segments from conn until it closes"""
+    logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s asr-worker %(process)d: %(message)s")
+    import numpy as np
+    import youtube_quiz_generator as pipeline
+
+    loaded = [pipeline.load_local_whisper_model(name) for name in models]
+    if threads and loaded:
+        import torch
+        torch.set_num_threads(threads)
+    for model in loaded:
+        model.transcribe(np.zeros(pipeline.WHISPER_SAMPLE_RATE, dtype=np.float32))
+    baseline = _rss_mb()
+    conn.send({"ready": True, "models": models, "rss_mb": baseline})
+
+    jobs = 0
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            model = pipeline.load_local_whisper_model(job["model"])
+            audio = np.frombuffer(job["audio"], dtype=np.float32)
+            reply = {"ok": True, "result": model.transcribe(audio, **job["options"])}
+        except Exception as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"[:500]}
+        jobs += 1
+        rss = _rss_mb()
+        retire = None
+        if max_jobs and jobs >= max_jobs:
+            retire = "jobs"
+        elif max_growth_mb and rss is not None and baseline is not None and rss - baseline > max_growth_mb:
+            retire = "memory"
+        conn.send({"reply": reply, "rss_mb": rss, "retire": retire})
+        if retire:
+            return
+
+
+# ===============================
+# WORKER POOL (SERVICE PROCESS)
+# ===============================
+class _Job:
+    __slots__ = ("request", "reply", "done", "cancelled")
+
+    def __init__(self, request):
+        self.request = request
+        self.reply = None
+        self.done = threading.Event()
+        self.cancelled = False
+
+    def finish(self, reply):
+        self.reply = reply
+        self.done.set()
+
+
+class ASRWorkerPool:
+    """
+    ASR_WORKERS worker processes fed from one FIFO of segments.
+
+    One thread per worker slot owns its process: it hands the next segment to the
+    worker, returns the result, and respawns the worker when it retires or dies.
+    """
+
+    def __init__(self, workers=None, models=None, threads=None,
+                 max_jobs=ASR_MAX_JOBS, max_growth_mb=ASR_MAX_RSS_GROWTH_MB):
+        self.workers = max(1, workers or ASR_WORKERS)
+        self.models = list(models or [])
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.max_jobs = max_jobs
+        self.max_growth_mb = max_growth_mb
+        self.log_level = logging.getLogger().getEffectiveLevel()
+        self._ctx = multiprocessing.get_context("spawn")  # Fresh interpreters: safe from a threaded parent
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._slots = []
+        self._threads = []
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.recycled = {"jobs": 0, "memory": 0, "crash": 0}
+
+    def start(self):
+        for index in range(self.workers):
+            slot = {"index": index, "pid": None, "state": "starting", "jobs": 0, "rss_mb": None,
+                    "baseline_mb": None, "restarts": 0, "process": None, "conn": None}
+            self._slots.append(slot)
+            thread = threading.Thread(target=self._run_slot, args=(slot,), name=f"asr-slot-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, request):
+        job = _Job(request)
+        self._jobs.put(job)
+        return job
+
+    def _spawn(self, slot):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, name=f"asr-worker-{slot['index']}", daemon=True,
+            args=(child_conn, self.models, self.threads, self.max_jobs, self.max_growth_mb, self.log_level),
+        )
+        process.start()
+        child_conn.close()  # Our copy closed: recv() raises EOFError once the worker is gone
+        slot.update(process=process, conn=parent_conn, pid=process.pid, state="starting", jobs=0)
+        started = time.monotonic()
+        hello = parent_conn.recv()
+        slot.update(state="idle", baseline_mb=hello["rss_mb"], rss_mb=hello["rss_mb"])
+        logger.info(f"🎙 ASR worker {process.pid} ready in {time.monotonic() - started:.1f}s "
+                    f"(models: {', '.join(self.models) or 'on demand'})")
+
+    def _close_worker(self, slot):
+        """Closing the pipe ends the worker's loop; killed if it does not exit in time"""
+        process = slot["process"]
+        slot["conn"].close()
+        process.join(STOP_TIMEOUT)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def _retire(self, slot, reason):
+        self._close_worker(slot)
+        with self._lock:
+            self.recycled[reason] += 1
+        slot.update(restarts=slot["restarts"] + 1, state="restarting")
+
+    def _next_job(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._jobs.get(timeout=POLL_SECONDS * 5)
+            except queue.Empty:
+                continue
+            if job.cancelled:
+                with self._lock:
+                    self.dropped += 1
+                continue
+            return job
+        return None
+
+    def _run_slot(self, slot):
+        while not self._stopping.is_set():
+            try:
+                self._spawn(slot)
+            except (EOFError, OSError):
+                process = slot["process"]
+                if process is not None:
+                    self._retire(slot, "crash")
+                # No process when Pipe()/start() itself failed
+                exit_code = process.exitcode if process is not None else "n/a"
+                logger.error(f"❌ ASR worker failed to start (exit code {exit_code}), "
+                             f"retrying in {RESPAWN_DELAY:.0f}s")
+                time.sleep(RESPAWN_DELAY)
+                continue
+            while True:
+                job = self._next_job()
+                if job is None:
+                    self._close_worker(slot)
+                    slot["state"] = "stopped"
+                    return
+                slot["state"] = "busy"
+                try:
+                    slot["conn"].send(job.request)
+                    answer = slot["conn"].recv()
+                except (EOFError, OSError):
+                    job.finish({"ok": False, "error": "ASR worker exited mid-segment", "unavailable": True})
+                    with self._lock:
+                        self.failed += 1
+                    self._retire(slot, "crash")
+                    logger.warning(f"⚠ ASR worker {slot['pid']} died mid-segment (exit code "
+                                   f"{slot['process'].exitcode}), respawning")
+                    break
+                job.finish(answer["reply"])
+                with self._lock:
+                    if answer["reply"]["ok"]:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                slot.update(state="idle", jobs=slot["jobs"] + 1, rss_mb=answer["rss_mb"])
+                if answer["retire"]:
+                    logger.info(f"♻ ASR worker {slot['pid']} recycled ({answer['retire']}: "
+                                f"{slot['jobs']} segments, RSS {answer['rss_mb'] or 0:.0f} MB)")
+                    self._retire(slot, answer["retire"])
+                    break
+
+    def stop(self):
+        """Stop taking segments: workers exit after the one they are running"""
+        self._stopping.set()
+
+    @property
+    def stopping(self):
+        return self._stopping.is_set()
+
+    def join(self, timeout=STOP_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            counters = {"completed": self.completed, "failed": self.failed, "dropped": self.dropped,
+                        "recycled": dict(self.recycled)}
+        return {
+            "queued": self._jobs.qsize(),
+            "models": self.models,
+            "threads_per_worker": self.threads,
+            **counters,
+            "workers": [
+                {key: slot[key] for key in ("index", "pid", "state", "jobs", "rss_mb", "baseline_mb", "restarts")}
+                for slot in self._slots
+            ],
+        }
+
+
+# ===============================
+# SERVICE
+# ===============================
+def _handle(pool, conn):
+    """One client connection: one request, one reply"""
+    with conn:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        if request.get("op") == "stats":
+            conn.send({"ok": True, "result": pool.stats()})
+            return
+        job = pool.submit(request)
+        while not job.done.wait(POLL_SECONDS):
+            if conn.poll():  # Readable before we answered: the client hung up (cancelled)
+                job.cancelled = True
+                return
+        try:
+            conn.send(job.reply)
+        except OSError:
+            pass  # Client gone after all
+
+
+def _remove_stale_socket(path):
+    """Delete a socket file left behind by a previous run (refuses to steal a live one)"""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        sys.exit(f"An ASR service is already listening on {path}")
+    finally:
+        probe.close()
+
+
+def serve(address, pool):
+    """Accept client connections on address until SIGTERM / SIGINT"""
+    target = parse_address(address)
+    if isinstance(target, tuple) and not ASR_AUTHKEY:
+        sys.exit("ASR_AUTHKEY is required when the ASR service listens on TCP")
+    if isinstance(target, str) and not target.startswith("\\\\"):
+        _remove_stale_socket(target)
+    listener = Listener(target, authkey=_authkey())
+    if isinstance(target, str) and os.path.exists(target):
+        os.chmod(target, 0o600)  # Same user only: the payloads are pickles
+
+    def stop(signum, frame):
+        if pool.stopping:
+            return
+        logger.info("🛑 ASR service stopping")
+        pool.stop()
+        listener.close()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(f"🚀 ASR service on {address} with {pool.workers} worker(s), "
+                f"{pool.threads} thread(s) each")
+    while True:
+        try:
+            conn = listener.accept()
+        except multiprocessing.AuthenticationError as e:
+            logger.warning(f"⚠ Rejected ASR client: {e}")
+            continue
+        except OSError:
+            break  # Listener closed by stop()
+        threading.Thread(target=_handle, args=(pool, conn), name="asr-conn", daemon=True).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Whisper transcription from dedicated worker processes")
+    parser.add_argument("--address", default=ASR_SERVICE or "/tmp/quiz_asr.sock",
+                        help="Socket path or host:port (default: ASR_SERVICE)")
+    parser.add_argument("--workers", type=int, default=ASR_WORKERS)
+    parser.add_argument("--models", default=ASR_MODELS, help="Whisper models to preload, comma-separated")
+    parser.add_argument("--threads", type=int, default=ASR_THREADS, help="Torch threads per worker")
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "INFO").upper())
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    if not models:
+        import youtube_quiz_generator as pipeline
+        models = [pipeline.WHISPER_MODEL]
+    pool = ASRWorkerPool(args.workers, list(dict.fromkeys(models)), args.threads or None)
+    pool.start()
+    serve(args.address, pool)
+    pool.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+CPU Partition Benchmark
+
+Finds the throughput-optimal core split between Whisper (ASR) and Ollama (LLM)
+for a mixed workload on this host:
+For each CPU profile (and optional share sweep)
+→ ASR worker and LLM worker run concurrently with the profile's thread budgets / cores
+→ Each worker's rate is normalised by its rate running alone on the whole machine
+→ Score = ASR share + LLM share  (2.0 = no interference, 1.0 = no better than running serially)
+
+Workloads:
+    synthetic (default)   PyTorch (or NumPy/BLAS) kernels shaped like Whisper's encoder
+                          (compute bound) and LLM decoding (memory bound)
+    --audio FILE          real Whisper transcription of FILE (units: audio seconds)
+    --ollama-model NAME   real Ollama generations on OLLAMA_HOST with num_thread (units: tokens);
+                          the Ollama server's own affinity must be set outside (taskset)
+
+Usage:
+    python benchmarks/cpu_partition_benchmark.py --seconds 20
+    python benchmarks/cpu_partition_benchmark.py --sweep --affinity --audio lecture.mp3
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cpu_partition import CPU_PROFILES, available_cpus, build_partition  # noqa: E402
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+SWEEP_SHARES = (0.25, 0.375, 0.5, 0.625, 0.75)
+
+
+# ===============================
+# WORKERS (run in child processes)
+# ===============================
+def _synthetic_kernel(kind):
+    """One unit of work: encoder-like matmuls (asr) or decode-like matrix-vector products (llm)"""
+    try:
+        import torch
+        if kind == "asr":
+            a, b = torch.randn(384, 384), torch.randn(384, 384)
+        else:
+            a, b = torch.randn(4096, 2048), torch.randn(2048, 1)
+
+        def step():
+            for _ in range(8):
+                a @ b
+            return 1
+        return step
+    except ImportError:
+        import numpy as np
+        if kind == "asr":
+            a, b = np.random.rand(384, 384), np.random.rand(384, 384)
+        else:
+            a, b = np.random.rand(4096, 2048), np.random.rand(2048, 1)
+
+        def step():
+            for _ in range(8):
+                a @ b
+            return 1
+        return step
+
+
+def _whisper_kernel(audio_path, model_name):
+    import whisper
+    model = whisper.load_model(model_name)
+    audio = whisper.load_audio(audio_path)
+    seconds = len(audio) / whisper.audio.SAMPLE_RATE
+
+    def step():
+        model.transcribe(audio)
+        return seconds
+    return step
+
+
+def _ollama_kernel(model, threads):
+    import requests
+    host = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434").rstrip("/")
+    options = {"num_predict": 64}
+    if threads:
+        options["num_thread"] = threads
+
+    def step():
+        response = requests.post(f"{host}/api/generate", json={
+            "model": model,
+            "prompt": "Explain one fact about photosynthesis.",
+            "stream": False,
+            "options": options,
+        }, timeout=300)
+        response.raise_for_status()
+        return response.json().get("eval_count", 0)
+    return step
+
+
+def run_worker(args):
+    if args.cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, [int(c) for c in args.cpus.split(",")])
+    if args.threads:
+        try:
+            import torch
+            torch.set_num_threads(args.threads)
+        except ImportError:
+            pass  # BLAS threads were limited through the environment
+
+    if args.worker == "asr" and args.audio:
+        step = _whisper_kernel(args.audio, args.whisper_model)
+    elif args.worker == "llm" and args.ollama_model:
+        step = _ollama_kernel(args.ollama_model, args.threads)
+    else:
+        step = _synthetic_kernel(args.worker)
+
+    step()  # Warm-up (model load, thread pool start)
+    units, started = 0.0, time.monotonic()
+    while time.monotonic() - started < args.seconds:
+        units += step()
+    print(json.dumps({"units": units, "seconds": time.monotonic() - started}))
+
+
+# ===============================
+# DRIVER
+# ===============================
+def _spawn(kind, threads, cpus, args):
+    cmd = [
+        sys.executable, os.path.abspath(__file__),
+        "--worker", kind, "--seconds", str(args.seconds), "--whisper-model", args.whisper_model,
+    ]
+    if threads:
+        cmd += ["--threads", str(threads)]
+    if cpus:
+        cmd += ["--cpus", ",".join(str(c) for c in cpus)]
+    if args.audio:
+        cmd += ["--audio", args.audio]
+    if args.ollama_model:
+        cmd += ["--ollama-model", args.ollama_model]
+    env = dict(os.environ)
+    if threads:
+        env.update({name: str(threads) for name in THREAD_ENV_VARS})
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, env=env)
+
+
+def _rate(proc):
+    out, _ = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"Benchmark worker failed with code {proc.returncode}")
+    result = json.loads(out.strip().splitlines()[-1])
+    return result["units"] / result["seconds"]
+
+
+def run_mixed(partition, args):
+    """ASR and LLM workers side by side under partition; returns (asr rate, llm rate)"""
+    asr = _spawn("asr", partition.whisper_threads, partition.cpus("whisper"), args)
+    llm = _spawn("llm", partition.ollama_threads, partition.cpus("ollama"), args)
+    return _rate(asr), _rate(llm)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=15.0, help="Duration of each run")
+    parser.add_argument("--profiles", default=",".join(CPU_PROFILES),
+                        help="Comma-separated CPU profiles to compare")
+    parser.add_argument("--sweep", action="store_true", help="Also try whisper/ollama share splits")
+    parser.add_argument("--affinity", action="store_true", help="Pin each worker to its cores")
+    parser.add_argument("--audio", help="Benchmark real Whisper on this audio file")
+    parser.add_argument("--whisper-model", default="base")
+    parser.add_argument("--ollama-model", help="Benchmark real Ollama generations with this model")
+    parser.add_argument("--worker", choices=("asr", "llm"), help=argparse.SUPPRESS)
+    parser.add_argument("--threads", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--cpus", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    cpus = available_cpus()
+    print(f"🧮 {len(cpus)} cores available, {args.seconds:.0f}s per run")
+    if len(cpus) < 2:
+        print("⚠ Fewer than 2 cores: every split degenerates to time-sharing one core")
+
+    print("▶ Solo baselines (each workload alone on all cores)")
+    solo_asr = _rate(_spawn("asr", None, None, args))
+    solo_llm = _rate(_spawn("llm", None, None, args))
+    print(f"   asr {solo_asr:.2f} units/s, llm {solo_llm:.2f} units/s")
+
+    profiles = [p.strip() for p in args.profiles.split(",") if p.strip()]
+    if args.sweep:
+        profiles += [f"whisper={share},ollama={1 - share},ffmpeg={share / 2}" for share in SWEEP_SHARES]
+
+    rows = []
+    for profile in profiles:
+        partition = build_partition(profile, cpus=cpus, affinity=args.affinity, overrides={})
+        asr_rate, llm_rate = run_mixed(partition, args)
+        score = asr_rate / solo_asr + llm_rate / solo_llm
+        rows.append((score, profile, partition, asr_rate, llm_rate))
+        print(f"   {profile:<45} whisper={partition.whisper_threads or 'all'} "
+              f"ollama={partition.ollama_threads or 'all'}  asr {asr_rate:.2f}/s  "
+              f"llm {llm_rate:.2f}/s  score {score:.2f}")
+
+    best = max(rows, key=lambda row: row[0])
+    score, profile, partition = best[0], best[1], best[2]
+    print(f"\n✅ Best split: {profile} (score {score:.2f} of 2.00)")
+    print(f"   CPU_PROFILE=\"{profile}\"" + (" CPU_AFFINITY=true" if args.affinity else ""))
+    if partition.ollama_cpus and args.ollama_model:
+        cores = ",".join(str(c) for c in partition.ollama_cpus)
+        print(f"   Pin the Ollama server to its share: taskset -c {cores} ollama serve")
+
+
+if __name__ == "__main__":
+    main()
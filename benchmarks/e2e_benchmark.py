@@ -0,0 +1,364 @@
+"""
+Offline End-to-End Benchmark
+
+Reproducible pipeline latency without YouTube, the web or a real LLM:
+Local upstreams (benchmarks/fake_upstreams.py)
+   ├─ Transcript API → recorded fixtures (benchmarks/fixtures/transcripts/*.json)
+   ├─ Ollama        → FakeOllama (HTTP) or the fake `ollama` CLI, fixed tokens/sec,
+   │                  optional malformed-JSON rate
+   └─ Wikipedia / DuckDuckGo / web pages / media → WebStub
+→ Scenarios, each run --runs times after --warmup runs
+   ├─ youtube    generate_quiz_from_url, one run per transcript fixture
+   ├─ video_url  generate_quiz_from_video_url on --media (needs ffmpeg + Whisper)
+   └─ course     create_course_quiz over --course-size copies of --media
+→ End-to-end latency and per-stage latency (from quiz_stage_duration_seconds)
+→ JSON report (--output); --baseline compares against an earlier report and exits 1
+  when a scenario or stage got slower than --max-regression
+
+Usage:
+    python benchmarks/e2e_benchmark.py --runs 5 --output bench.json
+    python benchmarks/e2e_benchmark.py --mode full --malformed-rate 0.2 --baseline bench.json
+    python benchmarks/e2e_benchmark.py --scenarios video_url,course --media lecture.mp4
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import importlib.util
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_upstreams import FakeOllama, WebStub, write_cli_shim  # noqa: E402
+
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures", "transcripts")
+SCENARIOS = ("youtube", "video_url", "course")
+MIN_REGRESSION_SECONDS = 0.05  # Ignore slowdowns smaller than this (timer noise)
+
+
+# ===============================
+# TRANSCRIPT FIXTURES
+# ===============================
+def load_fixtures():
+    fixtures = {}
+    for name in sorted(os.listdir(FIXTURE_DIR)):
+        if name.endswith(".json"):
+            with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+                fixture = json.load(f)
+            fixtures[fixture["video_id"]] = fixture
+    return fixtures
+
+
+class NoTranscriptFound(Exception):
+    """Same name as youtube_transcript_api's error, so the pipeline treats it as 'no captions'"""
+
+
+def fixture_transcript_api(fixtures, latency, any_video=False):
+    """
+    YouTubeTranscriptApi stand-in serving the recorded fixtures.
+
+    With any_video, unknown video IDs get a fixture picked by a stable hash of the ID
+    (load tests: every ID is a distinct video with realistic captions).
+    """
+    ids = sorted(fixtures)
+
+    class FixtureTranscriptApi:
+        @staticmethod
+        def get_transcript(video_id, languages=("en",)):
+            time.sleep(latency)
+            if any_video and video_id not in fixtures:
+                video_id = ids[zlib.crc32(video_id.encode()) % len(ids)]
+            if video_id not in fixtures or "en" not in languages:
+                raise NoTranscriptFound(video_id)
+            return [dict(segment) for segment in fixtures[video_id]["segments"]]
+
+        @staticmethod
+        def translate_transcript(transcript, language):
+            return transcript
+
+    return FixtureTranscriptApi
+
+
+# ===============================
+# MEASUREMENT
+# ===============================
+def stage_totals():
+    """stage → (seconds, runs) summed over quiz_stage_duration_seconds (all outcomes)"""
+    from metrics import STAGE_SECONDS
+    totals = {}
+    for metric in STAGE_SECONDS.collect():
+        for sample in metric.samples:
+            stage = sample.labels.get("stage")
+            seconds, runs = totals.get(stage, (0.0, 0))
+            if sample.name.endswith("_sum"):
+                totals[stage] = (seconds + sample.value, runs)
+            elif sample.name.endswith("_count"):
+                totals[stage] = (seconds, runs + int(sample.value))
+    return totals
+
+
+def ollama_call_count():
+    """Ollama calls so far (either transport), from ollama_call_duration_seconds"""
+    from metrics import OLLAMA_CALL_SECONDS
+    return sum(sample.value for metric in OLLAMA_CALL_SECONDS.collect()
+               for sample in metric.samples if sample.name.endswith("_count"))
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def summarize(values):
+    if not values:
+        return {}
+    return {
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 0.5), 4),
+        "p95": round(percentile(values, 0.95), 4),
+        "min": round(min(values), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def measure(fn):
+    """Run fn once: (seconds, stage → (seconds, calls) spent in this run, result, error)"""
+    before = stage_totals()
+    started = time.perf_counter()
+    result, error = None, None
+    try:
+        result = fn()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"[:300]
+    elapsed = time.perf_counter() - started
+    stages = {}
+    for stage, (seconds, calls) in stage_totals().items():
+        old_seconds, old_calls = before.get(stage, (0.0, 0))
+        if calls > old_calls:
+            stages[stage] = (seconds - old_seconds, calls - old_calls)
+    return elapsed, stages, result, error
+
+
+def run_scenario(name, jobs, runs, warmup, web):
+    """
+    Run every job (label, fn, question count fn) warmup + runs times.
+
+    Returns:
+        Scenario report dict
+    """
+    for _ in range(warmup):
+        for _, fn, _ in jobs:
+            measure(fn)
+    calls_before, web_before = ollama_call_count(), web.requests
+
+    e2e, per_stage, questions, errors = [], {}, [], []
+    for run in range(runs):
+        for label, fn, count in jobs:
+            elapsed, stages, result, error = measure(fn)
+            print(f"   {name:<10} {label:<24} run {run + 1}/{runs}: {elapsed:7.2f}s"
+                  + (f"  ERROR {error}" if error else ""))
+            if error:
+                errors.append({"job": label, "error": error})
+                continue
+            e2e.append(elapsed)
+            questions.append(count(result))
+            for stage, (seconds, calls) in stages.items():
+                per_stage.setdefault(stage, {"seconds": [], "calls": 0})
+                per_stage[stage]["seconds"].append(seconds)
+                per_stage[stage]["calls"] += calls
+
+    measured = max(1, runs * len(jobs))
+    return {
+        "runs": len(e2e),
+        "errors": errors,
+        "e2e_seconds": summarize(e2e),
+        "stages": {
+            stage: {**summarize(data["seconds"]), "calls_per_run": round(data["calls"] / measured, 2)}
+            for stage, data in sorted(per_stage.items())
+        },
+        "questions_per_run": round(sum(questions) / len(questions), 2) if questions else 0,
+        "ollama_calls_per_run": round((ollama_call_count() - calls_before) / measured, 2),
+        "web_requests_per_run": round((web.requests - web_before) / measured, 2),
+    }
+
+
+# ===============================
+# BASELINE COMPARISON
+# ===============================
+def compare(report, baseline, max_regression):
+    """Regressions (p50 end-to-end / stage mean) beyond max_regression, as printable lines"""
+    regressions = []
+    for name, scenario in report["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old or "e2e_seconds" not in scenario or not old.get("e2e_seconds"):
+            continue
+        checks = [("end-to-end p50", scenario["e2e_seconds"].get("p50"), old["e2e_seconds"].get("p50"))]
+        for stage, stats in scenario.get("stages", {}).items():
+            if stage in old.get("stages", {}):
+                checks.append((f"stage {stage} mean", stats.get("mean"), old["stages"][stage].get("mean")))
+        for what, new, before in checks:
+            if new is None or before is None:
+                continue
+            if new > before * (1 + max_regression) and new - before > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{name}: {what} {before:.3f}s → {new:.3f}s (+{(new / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="youtube,video_url,course",
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--mode", choices=("fast", "full"), default="fast",
+                        help="fast = FAST_MODE (no enrichment), full = Agent-03 enrichment on")
+    parser.add_argument("--transport", choices=("http", "cli"), default="http")
+    parser.add_argument("--enrichment-source", choices=("web", "local", "local+web"), default="web")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="Fake Ollama generation speed")
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=2000.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="Fraction of MCQ responses returned as malformed JSON")
+    parser.add_argument("--web-latency", type=float, default=0.02, help="Seconds per web stub response")
+    parser.add_argument("--transcript-latency", type=float, default=0.05,
+                        help="Seconds per transcript API call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--media", help="Audio/video file served to the video_url / course scenarios")
+    parser.add_argument("--course-size", type=int, default=3)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed slowdown vs. the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    fixtures = load_fixtures()
+    texts = [" ".join(s["text"] for s in f["segments"][i:i + 8])
+             for f in fixtures.values() for i in range(0, len(f["segments"]), 8)]
+    media_dir = os.path.dirname(os.path.abspath(args.media)) if args.media else None
+    ollama = FakeOllama(tokens_per_sec=args.tokens_per_sec, prompt_tokens_per_sec=args.prompt_tokens_per_sec,
+                        malformed_rate=args.malformed_rate, seed=args.seed).start()
+    web = WebStub(texts=texts, latency=args.web_latency, media_dir=media_dir).start()
+
+    # The pipeline reads its configuration at import time
+    shim_dir = tempfile.mkdtemp(prefix="bench_ollama_")
+    write_cli_shim(shim_dir)
+    os.environ.update({
+        "PATH": shim_dir + os.pathsep + os.environ.get("PATH", ""),
+        "FAST_MODE": "true" if args.mode == "fast" else "false",
+        "OLLAMA_TRANSPORT": args.transport,
+        "OLLAMA_HOST": ollama.url,
+        "ENRICHMENT_SOURCE": args.enrichment_source,
+        "WIKIPEDIA_API_URL": f"{web.url}/api/rest_v1",
+        "DUCKDUCKGO_SEARCH_URL": f"{web.url}/html/",
+        "EXTRA_APPROVED_DOMAINS": "127.0.0.1",
+        "SINGLE_FLIGHT_CROSS_PROCESS": "false",  # Never reuse a result from an earlier run
+        "TRANSCRIPT_CACHE_TTL": "0",              # ... nor a transcript
+        "FAKE_OLLAMA_TPS": str(args.tokens_per_sec),
+        "FAKE_OLLAMA_PROMPT_TPS": str(args.prompt_tokens_per_sec),
+        "FAKE_OLLAMA_MALFORMED_RATE": str(args.malformed_rate),
+        "FAKE_OLLAMA_SEED": str(args.seed),
+    })
+    import youtube_transcript_api
+    youtube_transcript_api.YouTubeTranscriptApi = fixture_transcript_api(fixtures, args.transcript_latency)
+    import logging
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    from youtube_quiz_generator import generate_quiz_from_url, generate_quiz_from_video_url
+    from app.services.quiz_service import create_course_quiz
+
+    media_ready = bool(args.media and shutil.which("ffmpeg") and importlib.util.find_spec("whisper"))
+    media_url = f"{web.url}/media/{os.path.basename(args.media)}" if args.media else None
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "scenarios": {},
+    }
+    print(f"🏁 Offline benchmark: {', '.join(scenarios)} ({args.runs} run(s), mode={args.mode}, "
+          f"transport={args.transport})")
+    for name in scenarios:
+        if name == "youtube":
+            jobs = [
+                (vid, lambda vid=vid: generate_quiz_from_url(f"https://www.youtube.com/watch?v={vid}"), len)
+                for vid in fixtures
+            ]
+        elif not media_ready:
+            reason = "needs --media, ffmpeg and openai-whisper"
+            print(f"   {name:<10} skipped ({reason})")
+            report["scenarios"][name] = {"skipped": reason}
+            continue
+        elif name == "video_url":
+            jobs = [(os.path.basename(args.media), lambda: generate_quiz_from_video_url(media_url), len)]
+        else:
+            urls = [f"{media_url}?copy={i}" for i in range(args.course_size)]
+            jobs = [(f"{args.course_size} videos", lambda: create_course_quiz(
+                "benchmark", urls, use_question_bank=False
+            ), lambda result: sum(len(r["questions"]) for r in result["results"]))]
+        report["scenarios"][name] = run_scenario(name, jobs, args.runs, args.warmup, web)
+
+    print("\n📊 Results")
+    for name, scenario in report["scenarios"].items():
+        if "skipped" in scenario:
+            continue
+        e2e = scenario["e2e_seconds"]
+        if e2e:
+            print(f"   {name:<10} p50 {e2e['p50']:.2f}s  p95 {e2e['p95']:.2f}s  "
+                  f"({scenario['ollama_calls_per_run']} Ollama calls/run, {len(scenario['errors'])} errors)")
+        for stage, stats in sorted(scenario["stages"].items(), key=lambda item: -item[1]["mean"]):
+            print(f"      {stage:<24} mean {stats['mean']:.3f}s  p95 {stats['p95']:.3f}s  "
+                  f"x{stats['calls_per_run']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Report written to {args.output}")
+
+    ollama.stop()
+    web.stop()
+    shutil.rmtree(shim_dir, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        changed = sorted(k for k, v in report["settings"].items() if baseline.get("settings", {}).get(k) != v)
+        if changed:
+            print(f"\n⚠ Baseline was run with different settings: {', '.join(changed)}")
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {args.baseline}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✓ No regressions vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+Fake Upstreams for Offline Benchmarks
+
+Local stand-ins for everything the pipeline talks to, so runs are reproducible:
+FakeOllama (HTTP)
+→ POST /api/chat  streams canned responses (NDJSON) at a configurable tokens/sec,
+                  after a prompt-processing delay (prompt tokens / prompt tokens/sec)
+   ├─ Recognises the pipeline's prompts: MCQs, topics, search queries, synthesis
+   ├─ A configurable fraction of MCQ answers is malformed JSON
+   │  (truncated, missing comma, wrapped in prose)
+   └─ Optional parallel limit (like OLLAMA_NUM_PARALLEL): further calls queue
+→ GET /api/ps, /api/tags  (health checks / model affinity)
+Fake Ollama CLI
+→ python benchmarks/fake_upstreams.py ollama run <model> <prompt>
+  (same responses; rates from FAKE_OLLAMA_* env vars - used through an `ollama` shim)
+WebStub (HTTP)
+→ GET /api/rest_v1/page/summary/<topic>   Wikipedia REST summary
+→ GET /wiki/<topic>, /page/<slug>          article pages built from the fixture texts
+→ GET /html/?q=<query>                     DuckDuckGo-like result page
+→ GET /media/<file>                        media files for the video URL pipeline
+                                           (or generated bytes, one "video" per name)
+Fake ASR (in-process)
+→ install_fake_asr(): ffmpeg + Whisper replaced by a stand-in that holds a whisper
+  slot for (media bytes / bytes per audio second) × real-time factor
+
+Usage (standalone):
+    python benchmarks/fake_upstreams.py serve --ollama-port 11435 --web-port 8089
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, quote, unquote
+
+CHARS_PER_TOKEN = 4
+TOKENS_PER_CHUNK = 4  # Ollama streams a few tokens per NDJSON line
+MALFORMED_KINDS = ("truncated", "missing_comma", "prose")
+
+FILLER_FACTS = (
+    "It is commonly examined through worked examples and numerical problems.",
+    "Standard references define it precisely and relate it to neighbouring concepts.",
+    "Misconceptions about it are frequent, so exams test the exact definition.",
+    "Its practical applications appear in medicine, engineering and everyday technology.",
+    "Safety limits and regulations exist wherever it affects people directly.",
+    "Historical experiments established the principle that is taught today.",
+)
+
+
+# ===============================
+# CANNED RESPONSES
+# ===============================
+def _words(text, minimum=7):
+    return [w for w in re.findall(r"[a-z]+", text.lower()) if len(w) >= minimum]
+
+
+def _mcq_response(prompt, rng):
+    needed = int(re.search(r"EXACTLY (\d+)", prompt).group(1))
+    keywords = _words(prompt.split("TRANSCRIPT:")[-1]) or ["concept"]
+    questions = []
+    for _ in range(needed):
+        subject = " ".join(rng.sample(keywords, min(2, len(keywords))))
+        questions.append({
+            "question": f"Which statement about {subject} is correct (variant {rng.randrange(10 ** 9)})?",
+            "options": {"A": "As explained in the lecture", "B": "It has no measurable effect",
+                        "C": "Only at absolute zero", "D": "It was disproven recently"},
+            "correct_answer": "A",
+            "explanation": f"The lecture explains {subject}.",
+        })
+    return json.dumps({"questions": questions})  # Compact, like a model told to output JSON only
+
+
+def _malform(text, rng):
+    kind = rng.choice(MALFORMED_KINDS)
+    if kind == "truncated":
+        # Generation cut off by num_predict part way through
+        return text[:int(len(text) * rng.uniform(0.6, 0.9))]
+    if kind == "missing_comma":
+        return text.replace('}, {"question"', '} {"question"', 1)
+    return f"Sure! Here are the questions:\n```json\n{text}\n```\nLet me know if you need more."
+
+
+def canned_response(prompt, rng, malformed_rate=0.0):
+    """Plausible model output for one of the pipeline's prompts"""
+    if "multiple-choice questions" in prompt:
+        text = _mcq_response(prompt, rng)
+        return _malform(text, rng) if rng.random() < malformed_rate else text
+    if prompt.startswith("Extract 5-8 key educational topics"):
+        # Most frequent two-word phrases (strict topic validation wants 2+ words)
+        words = re.findall(r"[a-z]+", prompt.split("TRANSCRIPT:")[-1].lower())
+        counts = {}
+        for first, second in zip(words, words[1:]):
+            if len(first) >= 5 and len(second) >= 5:
+                counts[f"{first} {second}"] = counts.get(f"{first} {second}", 0) + 1
+        return json.dumps(sorted(counts, key=lambda t: -counts[t])[:6])
+    if "web search queries for EACH of these topics" in prompt:
+        topics = re.findall(r'^- "(.+)"$', prompt, re.MULTILINE)
+        return json.dumps({t: [f"What is {t}?", f"How does {t} work?", f"{t} explained",
+                               f"{t} safety"] for t in topics})
+    if "web search queries for the topic" in prompt:
+        topic = re.search(r'for the topic: "(.+?)"', prompt).group(1)
+        return json.dumps([f"What is {topic}?", f"How does {topic} work?", f"{topic} explained"])
+    if "one per topic" in prompt:
+        topics = re.findall(r"^## (.+)$", prompt, re.MULTILINE)
+        return "\n\n".join(f"## {t}\n{t.capitalize()} is a key concept. " + " ".join(FILLER_FACTS)
+                           for t in topics)
+    if prompt.startswith("Summarize"):
+        return " ".join(FILLER_FACTS * 3)
+    return "OK"
+
+
+def _chunks(text):
+    size = TOKENS_PER_CHUNK * CHARS_PER_TOKEN
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+# ===============================
+# FAKE OLLAMA (HTTP)
+# ===============================
+class FakeOllama:
+    """
+    Streaming /api/chat stand-in (plus a non-streaming /api/generate for warm-up calls).
+
+    Args:
+        port: Port to listen on (0 = any free port)
+        tokens_per_sec: Generation speed
+        prompt_tokens_per_sec: Prompt processing speed (delay before the first chunk)
+        malformed_rate: Fraction of MCQ responses returned as malformed JSON
+        seed: RNG seed (same seed + same requests = same responses)
+        models: Models reported as loaded by /api/ps
+        parallel: Generations served at once (0 = unlimited); later calls wait their turn
+    """
+
+    def __init__(self, port=0, tokens_per_sec=40.0, prompt_tokens_per_sec=400.0, malformed_rate=0.0,
+                 seed=0, models=("gemma2:2b",), parallel=0):
+        self.tokens_per_sec = tokens_per_sec
+        self.prompt_tokens_per_sec = prompt_tokens_per_sec
+        self.malformed_rate = malformed_rate
+        self.models = list(models)
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.calls = 0
+        self.slots = threading.BoundedSemaphore(parallel) if parallel else None
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith("/api/ps"):
+                    self._json({"models": [{"name": m, "model": m} for m in fake.models]})
+                elif self.path.startswith("/api/tags"):
+                    self._json({"models": [{"name": m} for m in fake.models]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if self.path.startswith("/api/generate"):
+                    request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                    self._json({"model": request["model"], "response": "OK", "done": True})
+                    return
+                if not self.path.startswith("/api/chat"):
+                    self.send_error(404)
+                    return
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if fake.slots is None:
+                    self._generate(request)
+                    return
+                with fake.slots:
+                    self._generate(request)
+
+            def _generate(self, request):
+                prompt = request["messages"][-1]["content"]
+                with fake.rng_lock:
+                    fake.calls += 1
+                    text = canned_response(prompt, fake.rng, fake.malformed_rate)
+                prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+                num_predict = request.get("options", {}).get("num_predict")
+                if num_predict:
+                    text = text[:num_predict * CHARS_PER_TOKEN]
+                prompt_seconds = prompt_tokens / fake.prompt_tokens_per_sec
+                time.sleep(prompt_seconds)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                started = time.monotonic()
+                chunks = _chunks(text)
+                try:
+                    for i, chunk in enumerate(chunks):
+                        # Pace to tokens_per_sec from the start of generation
+                        due = started + (i + 1) * TOKENS_PER_CHUNK / fake.tokens_per_sec
+                        time.sleep(max(0.0, due - time.monotonic()))
+                        self._write_chunk({"model": request["model"], "message": {"content": chunk},
+                                           "done": False})
+                    eval_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+                    self._write_chunk({
+                        "model": request["model"], "message": {"content": ""}, "done": True,
+                        "prompt_eval_count": prompt_tokens,
+                        "prompt_eval_duration": int(prompt_seconds * 1e9),
+                        "eval_count": eval_tokens,
+                        "eval_duration": int((time.monotonic() - started) * 1e9),
+                    })
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Client cancelled the call
+
+            def _write_chunk(self, payload):
+                data = (json.dumps(payload) + "\n").encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def run_cli(argv):
+    """`ollama run [--flag=value] <model> <prompt>` stand-in (rates from FAKE_OLLAMA_* env vars)"""
+    argv = [arg for arg in argv if not arg.startswith("--")]
+    if len(argv) < 3 or argv[0] != "run":
+        print("usage: ollama run <model> <prompt>", file=sys.stderr)
+        return 1
+    prompt = argv[2]
+    tokens_per_sec = float(os.environ.get("FAKE_OLLAMA_TPS", "40"))
+    prompt_tokens_per_sec = float(os.environ.get("FAKE_OLLAMA_PROMPT_TPS", "400"))
+    malformed_rate = float(os.environ.get("FAKE_OLLAMA_MALFORMED_RATE", "0"))
+    rng = random.Random(f"{os.environ.get('FAKE_OLLAMA_SEED', '0')}:{prompt}")
+    text = canned_response(prompt, rng, malformed_rate)
+    time.sleep(len(prompt) / CHARS_PER_TOKEN / prompt_tokens_per_sec)
+    started = time.monotonic()
+    for i, chunk in enumerate(_chunks(text)):
+        time.sleep(max(0.0, started + (i + 1) * TOKENS_PER_CHUNK / tokens_per_sec - time.monotonic()))
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+    sys.stdout.write("\n")
+    return 0
+
+
+def write_cli_shim(directory):
+    """Create an executable `ollama` in directory that runs the fake CLI"""
+    path = os.path.join(directory, "ollama")
+    with open(path, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.abspath(__file__)}" ollama "$@"\n')
+    os.chmod(path, 0o755)
+    return path
+
+
+# ===============================
+# WEB STUB (Wikipedia / DuckDuckGo / pages / media)
+# ===============================
+class WebStub:
+    """
+    Local enrichment sources.
+
+    Args:
+        port: Port to listen on (0 = any free port)
+        texts: Paragraphs pages are built from (e.g. the transcript fixtures)
+        latency: Seconds added to every response
+        page_paragraphs: Paragraphs per article page
+        media_dir: Directory served under /media/
+        media_bytes: Size of the generated file served for a /media/ name that is not
+            in media_dir (0 = 404) - every name is a distinct "video"
+    """
+
+    def __init__(self, port=0, texts=(), latency=0.0, page_paragraphs=12, media_dir=None, media_bytes=0):
+        self.texts = list(texts) or list(FILLER_FACTS)
+        self.latency = latency
+        self.page_paragraphs = page_paragraphs
+        self.media_dir = media_dir
+        self.media_bytes = media_bytes
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="web-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def article(self, title):
+        rng = random.Random(title)
+        paragraphs = [f"<p>{title} is discussed below.</p>"] + [
+            f"<p>{rng.choice(self.texts)}</p>" for _ in range(self.page_paragraphs)
+        ]
+        return (f"<html><head><title>{title}</title><script>var x = 1;</script></head><body>"
+                f"<nav>Menu</nav><h1>{title}</h1>{''.join(paragraphs)}<footer>Footer</footer></body></html>")
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, content_type="text/html; charset=utf-8", status=200):
+                if isinstance(body, str):
+                    body = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                parsed = urlparse(self.path)
+                path = unquote(parsed.path)
+                if path.startswith("/api/rest_v1/page/summary/"):
+                    title = path.rsplit("/", 1)[-1]
+                    self._send(json.dumps({
+                        "title": title,
+                        "extract": stub.texts[0],
+                        "content_urls": {"desktop": {"page": f"{stub.url}/wiki/{quote(title)}"}},
+                    }), "application/json")
+                elif path.startswith("/wiki/") or path.startswith("/page/"):
+                    self._send(stub.article(path.rsplit("/", 1)[-1].replace("_", " ")))
+                elif path.startswith("/html"):
+                    query = parse_qs(parsed.query).get("q", [""])[0]
+                    links = "".join(
+                        f'<a class="result__a" href="{stub.url}/page/{quote(query.replace(" ", "_"))}_{i}">'
+                        f"{query} {i}</a>" for i in range(3)
+                    )
+                    self._send(f"<html><body>{links}</body></html>")
+                elif path.startswith("/media/") and (stub.media_dir or stub.media_bytes):
+                    name = os.path.basename(path)
+                    file = os.path.join(stub.media_dir, name) if stub.media_dir else None
+                    if file and os.path.isfile(file):
+                        with open(file, "rb") as f:
+                            self._send(f.read(), "application/octet-stream")
+                    elif stub.media_bytes:
+                        self._send(random.Random(name).randbytes(stub.media_bytes), "application/octet-stream")
+                    else:
+                        self._send("not found", "text/plain", 404)
+                else:
+                    self._send("not found", "text/plain", 404)
+
+        return Handler
+
+
+# ===============================
+# FAKE ASR (ffmpeg + Whisper stand-in)
+# ===============================
+def install_fake_asr(texts, realtime_factor=0.1, bytes_per_audio_second=16000):
+    """
+    Replace ffmpeg audio extraction and Whisper in the pipeline module of THIS process.
+
+    The video URL path still downloads the media (WebStub); "transcription" then holds a
+    whisper slot for (file bytes / bytes_per_audio_second) × realtime_factor seconds and
+    returns one of texts, picked by the file content (same media = same transcript).
+    """
+    import zlib
+    import youtube_quiz_generator as pipeline
+    from admission_control import resource_slot
+    from cancellation import current_token
+    from metrics import stage_timer
+
+    def transcribe_audio_file(audio_path, model_name, config=None, scheduler=None):
+        with open(audio_path, "rb") as f:
+            text = texts[zlib.crc32(f.read(4096)) % len(texts)]
+        seconds = os.path.getsize(audio_path) / bytes_per_audio_second * realtime_factor
+        token = current_token()
+        with resource_slot("whisper"), stage_timer("whisper"):
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                if token is not None:
+                    token.raise_if_cancelled()
+                time.sleep(min(0.1, max(0.0, deadline - time.monotonic())))
+        return text
+
+    pipeline.load_whisper_model = lambda name: None
+    pipeline.warm_up_whisper = lambda name: None
+    pipeline.VideoURLTranscriber.extract_audio = lambda self, video_path: video_path
+    pipeline.transcribe_audio_file = transcribe_audio_file
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "ollama":
+        sys.exit(run_cli(sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("serve",))
+    parser.add_argument("--ollama-port", type=int, default=11435)
+    parser.add_argument("--web-port", type=int, default=8089)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=400.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=0, help="Concurrent generations (0 = unlimited)")
+    parser.add_argument("--web-latency", type=float, default=0.0)
+    parser.add_argument("--media-dir")
+    parser.add_argument("--media-bytes", type=int, default=0, help="Generated media size for unknown names")
+    args = parser.parse_args()
+
+    ollama = FakeOllama(args.ollama_port, args.tokens_per_sec, args.prompt_tokens_per_sec,
+                        args.malformed_rate, parallel=args.parallel).start()
+    web = WebStub(args.web_port, latency=args.web_latency, media_dir=args.media_dir,
+                  media_bytes=args.media_bytes).start()
+    print(f"Fake Ollama: {ollama.url}   (OLLAMA_TRANSPORT=http OLLAMA_HOST={ollama.url})")
+    print(f"Web stub:    {web.url}   (WIKIPEDIA_API_URL={web.url}/api/rest_v1 "
+          f"DUCKDUCKGO_SEARCH_URL={web.url}/html/ EXTRA_APPROVED_DOMAINS=127.0.0.1)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,572 @@
+"""
+HTTP Load Test (saturation curves)
+
+How many concurrent quiz requests one node sustains, and where app/main.py falls over:
+Server under test: app.main in uvicorn (own process, WORKERS processes), upstreams faked
+   ├─ Ollama       → FakeOllama (--tokens-per-sec, --ollama-parallel generations at once)
+   ├─ Transcripts  → recorded fixtures (every video ID served, benchmarks/e2e_benchmark.py)
+   ├─ ASR          → fake Whisper: holds a whisper slot for audio seconds × --asr-rtf
+   └─ Web / media  → WebStub (enrichment pages, a generated --media-mb file per video URL)
+→ Request mix (--mix youtube=6,video=3,course=1)
+   └─ --hit-ratio of requests repeat a recent one (single-flight result cache /
+      course question bank), the rest are new videos
+→ Per configuration (--config name:ENV=value,..., e.g. MAX_ACTIVE_REQUESTS=8 or WORKERS=2),
+  per concurrency level (--concurrency 1,2,4,8): N closed-loop clients for --duration
+  seconds after --warmup (429 / 503 answers are retried after Retry-After)
+→ Throughput, p50 / p95 / p99 latency, error rate by kind, server CPU / RSS (every
+  worker process), admission queue depth
+→ Saturation point per configuration: first level where throughput grows less than
+  --knee-gain or errors exceed --max-error-rate
+→ JSON report (--output)
+
+Usage:
+    python benchmarks/load_test.py --concurrency 1,2,4,8,16 --duration 60
+    python benchmarks/load_test.py --config base: --config wide:MAX_ACTIVE_REQUESTS=8,MAX_CONCURRENT_OLLAMA=4
+    python benchmarks/load_test.py --mix youtube=1 --hit-ratio 0.5 --config two:WORKERS=2 --output load.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_upstreams import FakeOllama, WebStub, write_cli_shim, install_fake_asr  # noqa: E402
+from e2e_benchmark import load_fixtures, fixture_transcript_api, percentile, _git_commit  # noqa: E402
+
+ENDPOINTS = {
+    "youtube": "/generate-quiz",
+    "video": "/generate-quiz-from-video",
+    "course": "/generate-course-quiz",
+}
+ERROR_KINDS = {429: "rejected", 499: "cancelled", 500: "server_error", 503: "upstream_down", 504: "deadline"}
+RECENT_POOL = 50              # Repeats are drawn from the last N requests of a kind
+SERVER_START_TIMEOUT = 60.0
+MONITOR_INTERVAL = 1.0
+
+
+# ===============================
+# SERVER UNDER TEST
+# ===============================
+def create_app():
+    """uvicorn app factory: fake transcript API + fake ASR installed, then the real app.main"""
+    import youtube_transcript_api
+    fixtures = load_fixtures()
+    youtube_transcript_api.YouTubeTranscriptApi = fixture_transcript_api(
+        fixtures, float(os.environ.get("LOAD_TEST_TRANSCRIPT_LATENCY", "0.05")), any_video=True
+    )
+    install_fake_asr(
+        [" ".join(s["text"] for s in f["segments"]) for f in fixtures.values()],
+        realtime_factor=float(os.environ.get("LOAD_TEST_ASR_RTF", "0.1")),
+        bytes_per_audio_second=int(os.environ.get("LOAD_TEST_AUDIO_BYTES_PER_SECOND", "16000")),
+    )
+    from app.main import app
+    return app
+
+
+def serve(port, workers):
+    import uvicorn
+    uvicorn.run("load_test:create_app", factory=True, host="127.0.0.1", port=port, workers=workers,
+                log_level="warning")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ServerUnderTest:
+    """The API in its own process with a fresh single-flight DB, question bank and trace dir"""
+
+    def __init__(self, name, overrides, args, ollama, web, shim_dir):
+        self.name = name
+        self.workdir = tempfile.mkdtemp(prefix=f"load_{name}_")
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        overrides = dict(overrides)
+        self.workers = int(overrides.pop("WORKERS", "1"))
+        self.env = dict(os.environ)
+        self.env.update({
+            "PATH": shim_dir + os.pathsep + os.environ.get("PATH", ""),
+            "LOG_LEVEL": "WARNING",
+            "FAST_MODE": "true" if args.mode == "fast" else "false",
+            "OLLAMA_TRANSPORT": "http",
+            "OLLAMA_HOST": ollama.url,
+            "ENRICHMENT_SOURCE": args.enrichment_source,
+            "WIKIPEDIA_API_URL": f"{web.url}/api/rest_v1",
+            "DUCKDUCKGO_SEARCH_URL": f"{web.url}/html/",
+            "EXTRA_APPROVED_DOMAINS": "127.0.0.1",
+            "SINGLE_FLIGHT_DB": os.path.join(self.workdir, "single_flight.db"),
+            "SINGLE_FLIGHT_RESULT_TTL": str(args.result_ttl),
+            "QUESTION_BANK_PATH": os.path.join(self.workdir, "question_bank.db"),
+            "TRANSCRIPT_CACHE_PATH": os.path.join(self.workdir, "transcripts.db"),
+            "TRACE_FILE": os.path.join(self.workdir, "traces_{pid}.jsonl"),
+            "PROFILE_DIR": os.path.join(self.workdir, "profiles"),
+            "LOAD_TEST_TRANSCRIPT_LATENCY": str(args.transcript_latency),
+            "LOAD_TEST_ASR_RTF": str(args.asr_rtf),
+            "FAKE_OLLAMA_TPS": str(args.tokens_per_sec),  # OLLAMA_TRANSPORT=cli configurations
+            "FAKE_OLLAMA_PROMPT_TPS": str(args.prompt_tokens_per_sec),
+            "FAKE_OLLAMA_SEED": str(args.seed),
+        })
+        self.env.update(overrides)
+        self.overrides = overrides
+        self.proc = None
+        self._log = None
+
+    def start(self):
+        self._log = open(os.path.join(self.workdir, "server.log"), "w")
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(self.port),
+             "--workers", str(self.workers)],
+            env=self.env, cwd=ROOT, stdout=self._log, stderr=subprocess.STDOUT
+        )
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.proc.returncode}:\n{self.log_tail()}")
+            try:
+                # Like a load balancer: traffic only once the models are warm
+                if requests.get(f"{self.url}/ready", timeout=2).status_code == 200:
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        self.stop()
+        raise RuntimeError(f"Server not ready after {SERVER_START_TIMEOUT:.0f}s:\n{self.log_tail()}")
+
+    def log_tail(self, lines=20):
+        try:
+            with open(os.path.join(self.workdir, "server.log"), encoding="utf-8", errors="replace") as f:
+                return "".join(f.readlines()[-lines:])
+        except OSError:
+            return ""
+
+    def stop(self, keep=False):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        if self._log is not None:
+            self._log.close()
+        if not keep:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+# ===============================
+# SERVER RESOURCE MONITOR
+# ===============================
+def _process_tree(root_pid):
+    """root_pid and all its descendants (Linux /proc); empty list elsewhere"""
+    if not os.path.isdir("/proc"):
+        return []
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+def _usage(pids):
+    """(CPU seconds, RSS bytes) summed over pids"""
+    ticks, page = os.sysconf("SC_CLK_TCK"), os.sysconf("SC_PAGE_SIZE")
+    cpu, rss = 0.0, 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue  # Exited meanwhile
+        cpu += (int(fields[11]) + int(fields[12])) / ticks
+        rss += int(fields[21]) * page
+    return cpu, rss
+
+
+class ServerMonitor(threading.Thread):
+    """Samples CPU % / RSS of the server process tree and the admission queue once a second"""
+
+    def __init__(self, server):
+        super().__init__(name="server-monitor", daemon=True)
+        self.server = server
+        self.samples = []  # (time, cpu %, rss MB, active, queued)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        last_cpu, last_time = _usage(_process_tree(self.server.proc.pid))[0], time.monotonic()
+        while not self._stop_event.wait(MONITOR_INTERVAL):
+            cpu, rss = _usage(_process_tree(self.server.proc.pid))
+            now = time.monotonic()
+            active = queued = None
+            try:
+                admission = requests.get(f"{self.server.url}/stats", timeout=2).json()["admission"]
+                active, queued = admission["active"], admission["queued"]
+            except (requests.RequestException, ValueError, KeyError):
+                pass
+            self.samples.append((now, (cpu - last_cpu) / (now - last_time) * 100, rss / 1024 / 1024,
+                                 active, queued))
+            last_cpu, last_time = cpu, now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def summary(self, since):
+        samples = [s for s in self.samples if s[0] >= since]
+        if not samples:
+            return {}
+        cpu = [s[1] for s in samples]
+        active = [s[3] for s in samples if s[3] is not None]
+        queued = [s[4] for s in samples if s[4] is not None]
+        return {
+            "cpu_percent_mean": round(sum(cpu) / len(cpu), 1),
+            "cpu_percent_max": round(max(cpu), 1),
+            "rss_mb_max": round(max(s[2] for s in samples), 1),
+            "active_max": max(active) if active else None,
+            "queued_max": max(queued) if queued else None,  # One worker's view with WORKERS > 1
+        }
+
+
+# ===============================
+# LOAD GENERATION
+# ===============================
+class RequestMix:
+    """Next request: kind by weight; a repeat of a recent request of that kind with probability hit_ratio"""
+
+    def __init__(self, weights, hit_ratio, course_size, media_url, seed):
+        self.kinds = list(weights)
+        self.weights = [weights[k] for k in self.kinds]
+        self.hit_ratio = hit_ratio
+        self.course_size = course_size
+        self.media_url = media_url
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.count = 0
+        self.recent = {kind: [] for kind in self.kinds}
+
+    def next(self):
+        """(kind, JSON payload, is repeat)"""
+        with self.lock:
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            recent = self.recent[kind]
+            if recent and self.rng.random() < self.hit_ratio:
+                return kind, self.rng.choice(recent), True
+            self.count += 1
+            n = self.count
+            if kind == "youtube":
+                payload = {"url": f"https://www.youtube.com/watch?v=lt{n:09d}"}
+            elif kind == "video":
+                payload = {"video_url": f"{self.media_url}/lecture_{n}.mp4"}
+            else:
+                payload = {
+                    "course_id": f"course-{n}",
+                    "video_urls": [f"{self.media_url}/course_{n}_{i}.mp4" for i in range(self.course_size)],
+                    "use_question_bank": True,
+                }
+            recent.append(payload)
+            del recent[:-RECENT_POOL]
+            return kind, payload, False
+
+
+def _send(session, base_url, kind, payload, timeout):
+    """(status code or None, error kind or None, Retry-After seconds)"""
+    try:
+        response = session.post(base_url + ENDPOINTS[kind], json=payload, timeout=timeout)
+    except requests.Timeout:
+        return None, "timeout", 0.0
+    except requests.RequestException:
+        return None, "connection", 1.0
+    if response.status_code != 200:
+        retry_after = float(response.headers.get("Retry-After", 0) or 0)
+        return response.status_code, ERROR_KINDS.get(response.status_code, f"http_{response.status_code}"), retry_after
+    if kind == "course" and any(r.get("error") for r in response.json()["results"]):
+        return 200, "video_errors", 0.0
+    return 200, None, 0.0
+
+
+def client_loop(base_url, mix, stop_at, timeout, max_backoff, results, lock):
+    """One closed-loop client: send, wait for the answer, send the next one"""
+    session = requests.Session()
+    while time.monotonic() < stop_at:
+        kind, payload, repeat = mix.next()
+        started = time.monotonic()
+        status, error, retry_after = _send(session, base_url, kind, payload, timeout)
+        ended = time.monotonic()
+        with lock:
+            results.append({"kind": kind, "repeat": repeat, "started": started, "ended": ended,
+                            "status": status, "error": error})
+        if retry_after:
+            time.sleep(min(retry_after, max_backoff, max(0.0, stop_at - time.monotonic())))
+
+
+def _latency(values):
+    if not values:
+        return {}
+    return {
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 0.5), 3),
+        "p95": round(percentile(values, 0.95), 3),
+        "p99": round(percentile(values, 0.99), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def _p50(values):
+    return round(percentile(values, 0.5), 3) if values else None
+
+
+def run_level(server, mix, concurrency, args):
+    """
+    concurrency closed-loop clients for warmup + duration seconds.
+
+    Returns:
+        Level report dict (only requests started after the warmup are counted)
+    """
+    results, lock = [], threading.Lock()
+    monitor = ServerMonitor(server)
+    monitor.start()
+    measure_from = time.monotonic() + args.warmup
+    stop_at = measure_from + args.duration
+    clients = [
+        threading.Thread(target=client_loop, name=f"client-{i}", daemon=True,
+                         args=(server.url, mix, stop_at, args.request_timeout, args.max_backoff, results, lock))
+        for i in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    monitor.stop()
+
+    measured = [r for r in results if r["started"] >= measure_from]
+    ok = [r for r in measured if r["error"] is None]
+    elapsed = max([args.duration] + [r["ended"] - measure_from for r in measured])
+    by_kind = {}
+    for kind in mix.kinds:
+        runs = [r for r in measured if r["kind"] == kind]
+        if not runs:
+            continue
+        done = [r for r in runs if r["error"] is None]
+        by_kind[kind] = {
+            "requests": len(runs),
+            "ok": len(done),
+            "latency_seconds": _latency([r["ended"] - r["started"] for r in done]),
+            "repeat_p50": _p50([r["ended"] - r["started"] for r in done if r["repeat"]]),
+            "new_p50": _p50([r["ended"] - r["started"] for r in done if not r["repeat"]]),
+        }
+    return {
+        "concurrency": concurrency,
+        "requests": len(measured),
+        "ok": len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 3),
+        "latency_seconds": _latency([r["ended"] - r["started"] for r in ok]),
+        "error_rate": round((len(measured) - len(ok)) / len(measured), 4) if measured else 0.0,
+        "errors": dict(Counter(r["error"] for r in measured if r["error"])),
+        "by_kind": by_kind,
+        "server": monitor.summary(measure_from),
+    }
+
+
+def find_saturation(levels, knee_gain, max_error_rate):
+    """
+    First level that adds no throughput (< knee_gain over the best so far) or errors too much.
+
+    Returns:
+        {"saturated_at", "reason", "max_good_concurrency", "peak_throughput_rps"}
+    """
+    best, good = 0.0, None
+    for level in levels:
+        if level["error_rate"] > max_error_rate:
+            reason = f"error rate {level['error_rate']:.1%}"
+        elif best and level["throughput_rps"] < best * (1 + knee_gain):
+            reason = f"throughput {level['throughput_rps']:.2f} req/s (best {best:.2f})"
+        else:
+            best, good = max(best, level["throughput_rps"]), level["concurrency"]
+            continue
+        return {"saturated_at": level["concurrency"], "reason": reason,
+                "max_good_concurrency": good, "peak_throughput_rps": best}
+    return {"saturated_at": None, "reason": "not reached", "max_good_concurrency": good,
+            "peak_throughput_rps": best}
+
+
+# ===============================
+# CLI
+# ===============================
+def _parse_weights(text):
+    weights = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in ENDPOINTS:
+            raise ValueError(f"Unknown request kind {kind!r} (kinds: {', '.join(ENDPOINTS)})")
+        weights[kind] = float(weight or 1)
+    return {k: w for k, w in weights.items() if w > 0}
+
+
+def _parse_config(text):
+    name, _, assignments = text.partition(":")
+    overrides = {}
+    for part in filter(None, (p.strip() for p in assignments.split(","))):
+        key, _, value = part.partition("=")
+        overrides[key.strip()] = value.strip()
+    return name.strip() or "default", overrides
+
+
+def _print_level(name, level):
+    latency, server = level["latency_seconds"], level["server"]
+    line = f"   {name:<12} c={level['concurrency']:<4} {level['throughput_rps']:7.3f} req/s"
+    if latency:
+        line += f"  p50 {latency['p50']:7.2f}s  p95 {latency['p95']:7.2f}s  p99 {latency['p99']:7.2f}s"
+    line += f"  errors {level['error_rate']:6.1%}"
+    if server:
+        line += f"  cpu {server['cpu_percent_mean']:5.0f}%  rss {server['rss_mb_max']:6.0f} MB"
+        if server["queued_max"] is not None:
+            line += f"  queue≤{server['queued_max']}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", default=[],
+                        help="name:ENV=value,... server configuration (repeatable; WORKERS=n for processes)")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before each level")
+    parser.add_argument("--mix", default="youtube=6,video=3,course=1", help="Request kind weights")
+    parser.add_argument("--hit-ratio", type=float, default=0.2, help="Fraction of requests repeating a recent one")
+    parser.add_argument("--course-size", type=int, default=3, help="Videos per course request")
+    parser.add_argument("--mode", choices=("fast", "full"), default="fast",
+                        help="fast = FAST_MODE (no enrichment), full = Agent-03 enrichment on")
+    parser.add_argument("--enrichment-source", choices=("web", "local", "local+web"), default="web")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="Fake Ollama generation speed")
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=2000.0)
+    parser.add_argument("--ollama-parallel", type=int, default=4,
+                        help="Generations the fake Ollama serves at once (0 = unlimited)")
+    parser.add_argument("--asr-rtf", type=float, default=0.1, help="Fake Whisper seconds per audio second")
+    parser.add_argument("--media-mb", type=float, default=1.0, help="Size of each generated video file")
+    parser.add_argument("--web-latency", type=float, default=0.02)
+    parser.add_argument("--transcript-latency", type=float, default=0.05)
+    parser.add_argument("--result-ttl", type=float, default=3600.0,
+                        help="SINGLE_FLIGHT_RESULT_TTL of the server (how long repeats stay cache hits)")
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--max-backoff", type=float, default=5.0, help="Longest Retry-After a client honours")
+    parser.add_argument("--knee-gain", type=float, default=0.1,
+                        help="Saturated when a level adds less throughput than this (0.1 = 10%%)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep each server's work dir (log, traces, DBs)")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workers", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.workers)
+        return
+
+    try:
+        weights = _parse_weights(args.mix)
+        levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    except ValueError as e:
+        parser.error(str(e))
+    configs = [_parse_config(c) for c in args.config] or [("default", {})]
+
+    fixtures = load_fixtures()
+    texts = [" ".join(s["text"] for s in f["segments"][i:i + 8])
+             for f in fixtures.values() for i in range(0, len(f["segments"]), 8)]
+    ollama = FakeOllama(tokens_per_sec=args.tokens_per_sec, prompt_tokens_per_sec=args.prompt_tokens_per_sec,
+                        seed=args.seed, parallel=args.ollama_parallel).start()
+    web = WebStub(texts=texts, latency=args.web_latency, media_bytes=int(args.media_mb * 1024 * 1024)).start()
+    shim_dir = tempfile.mkdtemp(prefix="load_ollama_")
+    write_cli_shim(shim_dir)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "settings": {k: v for k, v in vars(args).items()
+                     if k not in ("output", "keep", "serve", "port", "workers", "config")},
+        "configs": {},
+    }
+    print(f"🏋 Load test: {', '.join(name for name, _ in configs)} × concurrency {levels} "
+          f"({args.duration:.0f}s each, mix {args.mix}, {args.hit_ratio:.0%} repeats)")
+    for name, overrides in configs:
+        server = ServerUnderTest(name, overrides, args, ollama, web, shim_dir)
+        print(f"\n▶ {name}: WORKERS={server.workers} "
+              + " ".join(f"{k}={v}" for k, v in server.overrides.items()))
+        try:
+            server.start()
+        except RuntimeError as e:
+            print(f"   ❌ {e}")
+            report["configs"][name] = {"error": str(e)[:1000]}
+            server.stop(keep=args.keep)
+            continue
+        mix = RequestMix(weights, args.hit_ratio, args.course_size, f"{web.url}/media", args.seed)
+        results = []
+        try:
+            for concurrency in levels:
+                level = run_level(server, mix, concurrency, args)
+                results.append(level)
+                _print_level(name, level)
+        finally:
+            server.stop(keep=args.keep)
+            if args.keep:
+                print(f"   Server files kept in {server.workdir}")
+        saturation = find_saturation(results, args.knee_gain, args.max_error_rate)
+        report["configs"][name] = {
+            "workers": server.workers, "env": server.overrides, "levels": results, "saturation": saturation,
+        }
+
+    ollama.stop()
+    web.stop()
+    shutil.rmtree(shim_dir, ignore_errors=True)
+
+    print("\n📈 Saturation")
+    for name, config in report["configs"].items():
+        if "error" in config:
+            print(f"   {name:<12} failed to start")
+            continue
+        saturation = config["saturation"]
+        where = (f"saturated at c={saturation['saturated_at']} ({saturation['reason']})"
+                 if saturation["saturated_at"] else "not saturated in the tested range")
+        print(f"   {name:<12} peak {saturation['peak_throughput_rps']:.3f} req/s at "
+              f"c={saturation['max_good_concurrency']}, {where}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
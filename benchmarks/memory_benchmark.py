@@ -0,0 +1,264 @@
+"""
+Multi-Worker Memory Benchmark
+
+What each additional API worker costs in memory, per server mode:
+Server modes
+   ├─ spawn    `uvicorn --workers N`: every worker imports the app and loads its own model
+   └─ prefork  prefork_server.py: the parent loads the model, workers share it copy-on-write
+→ Model: fake Whisper weights (--fake-model-mb of random float64, "inference" reads them
+  all) or the real Whisper model (--fake-model-mb 0)
+→ Per mode, per worker count (--workers 1,2,4): server started, every worker warm
+  (/ready), then the process tree measured from /proc/<pid>/smaps_rollup
+   ├─ RSS  resident pages, shared ones counted in every process (overstates the total)
+   ├─ PSS  shared pages split between the processes sharing them (sums to the real total)
+   └─ USS  pages private to the process (freed if it exits)
+→ Memory per additional worker: least-squares slope of total PSS over the worker count
+→ --max-extra-worker-mb: exit 1 when the prefork slope exceeds it
+→ JSON report (--output)
+
+Linux only (/proc).
+
+Usage:
+    python benchmarks/memory_benchmark.py
+    python benchmarks/memory_benchmark.py --workers 1,2,4,8 --fake-model-mb 512 --output memory.json
+    python benchmarks/memory_benchmark.py --modes prefork --max-extra-worker-mb 150
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import threading
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import _process_tree, _free_port  # noqa: E402
+from e2e_benchmark import _git_commit  # noqa: E402
+
+MB = 1024 * 1024
+MODES = ("spawn", "prefork")
+SERVER_START_TIMEOUT = 120.0
+SETTLE_SECONDS = 1.0
+
+
+# ===============================
+# SERVER UNDER TEST
+# ===============================
+def install_fake_whisper(model_mb):
+    """Whisper stand-in of THIS process: model_mb of weights per model, read in full per inference"""
+    import numpy as np
+    import youtube_quiz_generator as pipeline
+
+    models, lock = {}, threading.Lock()
+
+    def load_whisper_model(name):
+        with lock:
+            if name not in models:
+                models[name] = np.random.default_rng(0).random(model_mb * MB // 8)
+            return models[name]
+
+    def warm_up_whisper(name):
+        float(load_whisper_model(name).sum())
+
+    pipeline.load_whisper_model = load_whisper_model
+    pipeline.warm_up_whisper = warm_up_whisper
+
+
+def create_app():
+    """uvicorn app factory for the spawn mode (fake model installed in every worker)"""
+    model_mb = int(os.environ.get("MEMORY_BENCH_MODEL_MB", "0"))
+    if model_mb:
+        install_fake_whisper(model_mb)
+    from app.main import app
+    return app
+
+
+def serve(mode, port, workers):
+    if mode == "prefork":
+        model_mb = int(os.environ.get("MEMORY_BENCH_MODEL_MB", "0"))
+        if model_mb:
+            install_fake_whisper(model_mb)
+        import prefork_server
+        prefork_server.main(["--workers", str(workers), "--host", "127.0.0.1", "--port", str(port),
+                             "--log-level", "warning"])
+    else:
+        import uvicorn
+        uvicorn.run("memory_benchmark:create_app", factory=True, host="127.0.0.1", port=port,
+                    workers=workers, log_level="warning")
+
+
+def _memory(pid):
+    """RSS / PSS / USS bytes of one process (/proc/<pid>/smaps_rollup), None once it exited"""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _wait_all_ready(url, workers, process):
+    """/ready answered 200 by every worker: 200 on 4 × workers polls in a row"""
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    streak = 0
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            ok = requests.get(f"{url}/ready", timeout=5).status_code == 200
+        except requests.RequestException:
+            ok = False
+        streak = streak + 1 if ok else 0
+        if streak >= 4 * workers:
+            return
+        time.sleep(0.05 if ok else 0.25)
+    raise RuntimeError(f"Workers not ready after {SERVER_START_TIMEOUT:.0f}s")
+
+
+def measure(mode, workers, args, workdir):
+    """Start a server, wait until every worker is warm, measure its process tree"""
+    port = _free_port()
+    env = dict(os.environ, **{
+        "MEMORY_BENCH_MODEL_MB": str(args.fake_model_mb),
+        "WARMUP_BACKENDS": "whisper",
+        "TRACING_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+        "SINGLE_FLIGHT_DB": os.path.join(workdir, "single_flight.db"),
+        "TRANSCRIPT_CACHE_PATH": os.path.join(workdir, "transcripts.db"),
+        "QUESTION_BANK_PATH": os.path.join(workdir, "question_bank.db"),
+    })
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", mode, "--port", str(port),
+         "--server-workers", str(workers)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_all_ready(f"http://127.0.0.1:{port}", workers, process)
+        time.sleep(SETTLE_SECONDS)
+        processes = []
+        for pid in _process_tree(process.pid):
+            memory = _memory(pid)
+            if memory is not None:
+                processes.append({"pid": pid, **memory})
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    total = {key: sum(p[key] for p in processes) for key in ("rss", "pss", "uss")}
+    return {
+        "workers": workers,
+        "processes": len(processes),
+        "total_rss_mb": round(total["rss"] / MB, 1),
+        "total_pss_mb": round(total["pss"] / MB, 1),
+        "total_uss_mb": round(total["uss"] / MB, 1),
+        "per_process": [{"pid": p["pid"], "rss_mb": round(p["rss"] / MB, 1), "pss_mb": round(p["pss"] / MB, 1),
+                         "uss_mb": round(p["uss"] / MB, 1)} for p in processes],
+    }
+
+
+def _slope(points):
+    """Least-squares slope of y over x"""
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var if var else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated server modes")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--fake-model-mb", type=int, default=256,
+                        help="Size of the fake Whisper weights (0 = the real configured Whisper model)")
+    parser.add_argument("--max-extra-worker-mb", type=float,
+                        help="Fail when an additional prefork worker costs more than this")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--serve", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--server-workers", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.server_workers)
+        return
+    if not os.path.isdir("/proc"):
+        sys.exit("memory_benchmark needs Linux /proc")
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    counts = sorted({int(n) for n in args.workers.split(",") if n.strip()})
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "settings": {"workers": counts, "fake_model_mb": args.fake_model_mb},
+        "modes": {},
+    }
+    print(f"🧠 Memory benchmark: {', '.join(modes)} × {counts} worker(s), "
+          f"model {'real Whisper' if not args.fake_model_mb else f'{args.fake_model_mb} MB fake'}")
+    for mode in modes:
+        levels = []
+        for workers in counts:
+            workdir = tempfile.mkdtemp(prefix=f"mem_{mode}_")
+            try:
+                level = measure(mode, workers, args, workdir)
+            except RuntimeError as e:
+                print(f"   {mode:<8} {workers:>2} worker(s)  ERROR {e}")
+                continue
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            levels.append(level)
+            print(f"   {mode:<8} {workers:>2} worker(s)  PSS {level['total_pss_mb']:8.1f} MB  "
+                  f"RSS {level['total_rss_mb']:8.1f} MB  USS {level['total_uss_mb']:8.1f} MB  "
+                  f"({level['processes']} processes)")
+        slope = _slope([(level["workers"], level["total_pss_mb"]) for level in levels])
+        report["modes"][mode] = {
+            "levels": levels,
+            "extra_worker_mb": round(slope, 1) if slope is not None else None,
+        }
+
+    print("\n📈 Memory per additional worker (total PSS slope)")
+    for mode, result in report["modes"].items():
+        extra = result["extra_worker_mb"]
+        print(f"   {mode:<8} {'n/a' if extra is None else f'{extra:.1f} MB'}")
+
+    failed = False
+    prefork = report["modes"].get("prefork", {}).get("extra_worker_mb")
+    if args.max_extra_worker_mb is not None and prefork is not None and prefork > args.max_extra_worker_mb:
+        print(f"❌ prefork: {prefork:.1f} MB per worker > {args.max_extra_worker_mb:.1f} MB")
+        failed = True
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Text Hot-Path Micro-Benchmarks
+
+The pure-Python text functions that see untrusted sizes (LLM output, long captions):
+Generated inputs (seeded, adversarial, sized by --scale)
+   ├─ repair_json                huge truncated MCQ JSON, malformed options, unclosed strings
+   ├─ fallback_topic_extraction  1 MB transcript, one word repeated
+   ├─ clean_transcript           1 MB transcript, caption stutter, unclosed "[" tags
+   └─ deduplicate                thousands of near-duplicate questions, very long questions
+→ Each case in its own worker process (killed after --case-timeout: a regex that
+  backtracks cannot be interrupted from inside)
+→ Best / median time over --repeat runs, tracemalloc peak of one extra run
+→ Absolute budgets per case (CASES, scaled with --scale) catch blow-ups - backtracking,
+  quadratic rescans - on any machine
+→ --baseline compares with an earlier report and fails when a case got slower or
+  allocates more than --max-regression
+→ Exit 1 on a timeout, budget breach or regression
+
+Usage:
+    python benchmarks/micro_benchmark.py --output micro.json
+    python benchmarks/micro_benchmark.py --baseline micro.json --max-regression 0.5
+    python benchmarks/micro_benchmark.py --cases repair_json --scale 0.25
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+MIN_REGRESSION_SECONDS = 0.025   # Ignore slowdowns smaller than this (timer noise)
+MIN_REGRESSION_MB = 1.0          # Ignore allocation growth smaller than this
+
+# ===============================
+# INPUT GENERATORS
+# ===============================
+SYLLABLES = ("ra", "di", "on", "ex", "po", "sure", "do", "si", "me", "ter", "shiel", "ding",
+             "pho", "to", "syn", "the", "sis", "chlo", "ro", "phyll", "pro", "to", "col", "net")
+FILLER = ("the", "and", "is", "of", "you", "know", "so", "basically", "um", "this", "that")
+
+
+def _vocabulary(rng, size=2000):
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def make_transcript(rng, size):
+    """Caption-like text: content words, filler, sentence ends, occasional [Music] tags"""
+    vocab = _vocabulary(rng)
+    parts, length = [], 0
+    while length < size:
+        sentence = [rng.choice(FILLER) if rng.random() < 0.4 else rng.choice(vocab)
+                    for _ in range(rng.randint(6, 20))]
+        if rng.random() < 0.05:
+            sentence.insert(rng.randrange(len(sentence)), rng.choice(("[Music]", "[Applause]", "[Laughter]")))
+        text = " ".join(sentence) + rng.choice((". ", "? ", " ", " "))
+        parts.append(text)
+        length += len(text)
+    return "".join(parts)[:size]
+
+
+def make_stutter(rng, size):
+    """Auto-caption stutter: phrases of 1-4 words repeated 2-5 times in a row"""
+    vocab = _vocabulary(rng, 300)
+    parts, length = [], 0
+    while length < size:
+        phrase = " ".join(rng.choice(vocab) for _ in range(rng.randint(1, 4)))
+        text = " ".join([phrase] * rng.randint(2, 5)) + " "
+        parts.append(text)
+        length += len(text)
+    return "".join(parts)[:size]
+
+
+def _question(rng, vocab, i):
+    subject = " ".join(rng.sample(vocab, 3))
+    return {
+        "question": f"Which statement about {subject} is correct ({i})?",
+        "options": {letter: " ".join(rng.sample(vocab, 4)) for letter in "ABCD"},
+        "correct_answer": rng.choice("ABCD"),
+        "explanation": f"The lecture explains {subject} in detail.",
+    }
+
+
+def make_truncated_json(rng, count):
+    """One huge MCQ answer cut off by num_predict in the middle of a string"""
+    vocab = _vocabulary(rng, 500)
+    text = json.dumps({"questions": [_question(rng, vocab, i) for i in range(count)]}, indent=2)
+    return text[:int(len(text) * 0.97)]
+
+
+def make_malformed_options(rng, count):
+    """Objects whose options never match: too many options, wide whitespace, bad answer letter"""
+    objects = []
+    for i in range(count):
+        options = "".join(f'"{rng.choice("ABCD")}": "option {j}"' + " " * rng.randint(8, 24) for j in range(12))
+        objects.append(f'{{"question": "Question {i}?", "options": {{{options}}}, "correct_answer": "E"}}')
+    return "[" + ", ".join(objects) + "]"
+
+
+def make_unclosed_strings(rng, size):
+    """Question objects whose strings never close and are full of escapes"""
+    chunk = '{"question": "' + "".join(rng.choice(('\\"', "\\\\", "ab", " ")) for _ in range(size // 40))
+    return chunk * 20
+
+
+def make_questions(rng, count, duplicate_rate=0.5, words=12):
+    """Question dicts; duplicate_rate of them re-use an earlier question with other case / punctuation"""
+    vocab = _vocabulary(rng, 1000)
+    questions = []
+    for i in range(count):
+        if questions and rng.random() < duplicate_rate:
+            original = rng.choice(questions)["question"]
+            variant = original.upper() if rng.random() < 0.5 else original.replace("?", " ?!").replace(" ", "  ")
+            questions.append({"question": variant, "options": {}})
+        else:
+            text = " ".join(rng.choice(vocab) for _ in range(words))
+            questions.append({"question": f"What is {text} ({i})?", "options": {}})
+    return questions
+
+
+# ===============================
+# CASES
+# ===============================
+def _functions():
+    from youtube_quiz_generator import repair_json, fallback_topic_extraction, clean_transcript, deduplicate
+    return {
+        "repair_json": repair_json,
+        "fallback_topic_extraction": fallback_topic_extraction,
+        "clean_transcript": clean_transcript,
+        "deduplicate": deduplicate,
+    }
+
+
+MB = 1024 * 1024
+
+# name → (function, input generator(rng, scale), budget seconds, budget peak MB)
+# Budgets are ~10x a 1-core laptop run: far above noise, far below any blow-up
+CASES = {
+    "repair_json/truncated_5000": (
+        "repair_json", lambda rng, scale: make_truncated_json(rng, int(5000 * scale)), 2.0, 60),
+    "repair_json/malformed_options": (
+        "repair_json", lambda rng, scale: make_malformed_options(rng, int(2000 * scale)), 0.5, 30),
+    "repair_json/unclosed_strings": (
+        "repair_json", lambda rng, scale: make_unclosed_strings(rng, int(MB * scale)), 0.5, 30),
+    "fallback_topic_extraction/transcript_1mb": (
+        "fallback_topic_extraction", lambda rng, scale: make_transcript(rng, int(MB * scale)), 4.0, 300),
+    "fallback_topic_extraction/one_word": (
+        "fallback_topic_extraction", lambda rng, scale: "radiation " * int(MB * scale / 10), 1.0, 150),
+    "clean_transcript/transcript_1mb": (
+        "clean_transcript", lambda rng, scale: make_transcript(rng, int(MB * scale)), 6.0, 200),
+    "clean_transcript/stutter_1mb": (
+        "clean_transcript", lambda rng, scale: make_stutter(rng, int(MB * scale)), 6.0, 200),
+    "clean_transcript/unclosed_tags": (
+        "clean_transcript", lambda rng, scale: "[ caption word " * int(60000 * scale), 3.0, 100),
+    "deduplicate/questions_10000": (
+        "deduplicate", lambda rng, scale: make_questions(rng, int(10000 * scale)), 0.5, 30),
+    "deduplicate/long_questions": (
+        "deduplicate", lambda rng, scale: make_questions(rng, int(2000 * scale), 0.3, 200), 2.0, 60),
+}
+
+
+def _input_size(value):
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return sum(len(q["question"]) for q in value)
+
+
+def run_worker(case, scale, repeat, seed):
+    """Measure one case in this process and print its result as one JSON line"""
+    import logging
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    function_name, make_input, _, _ = CASES[case]
+    fn = _functions()[function_name]
+    value = make_input(random.Random(seed), scale)
+
+    fn(value)  # Warm-up (compiled regexes, tokenizer caches, NumPy)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(value)
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn(value)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times.sort()
+    print(json.dumps({
+        "input_bytes": _input_size(value),
+        "best_seconds": round(times[0], 5),
+        "median_seconds": round(times[len(times) // 2], 5),
+        "peak_mb": round(peak / MB, 2),
+    }))
+
+
+# ===============================
+# DRIVER
+# ===============================
+def run_case(case, args, env):
+    """Run one case in a worker process; a result dict, or {"error": ...}"""
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", case,
+           "--scale", str(args.scale), "--repeat", str(args.repeat), "--seed", str(args.seed)]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, env=env, timeout=args.case_timeout)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {args.case_timeout:.0f}s"}
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["worker failed"])[-1][:300]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def check_budgets(report, scale):
+    """Cases over their absolute time / memory budget, as printable lines"""
+    breaches = []
+    for case, result in report["cases"].items():
+        if "error" in result:
+            breaches.append(f"{case}: {result['error']}")
+            continue
+        _, _, budget_seconds, budget_mb = CASES[case]
+        if result["median_seconds"] > budget_seconds * scale:
+            breaches.append(f"{case}: {result['median_seconds']:.3f}s over budget {budget_seconds * scale:.3f}s")
+        if result["peak_mb"] > budget_mb * scale:
+            breaches.append(f"{case}: peak {result['peak_mb']:.1f} MB over budget {budget_mb * scale:.1f} MB")
+    return breaches
+
+
+def compare(report, baseline, max_regression):
+    """
+    Regressions beyond max_regression, as printable lines. Time is compared on the best
+    run (least disturbed by the rest of the machine); cases whose generated input changed
+    are skipped.
+    """
+    regressions = []
+    for case, result in report["cases"].items():
+        old = baseline.get("cases", {}).get(case)
+        if not old or "error" in result or "error" in old or old["input_bytes"] != result["input_bytes"]:
+            continue
+        new, before = result["best_seconds"], old["best_seconds"]
+        if new > before * (1 + max_regression) and new - before > MIN_REGRESSION_SECONDS:
+            regressions.append(f"{case}: best {before:.4f}s → {new:.4f}s (+{(new / before - 1) * 100:.0f}%)")
+        new, before = result["peak_mb"], old["peak_mb"]
+        if new > before * (1 + max_regression) and new - before > MIN_REGRESSION_MB:
+            regressions.append(f"{case}: peak {before:.1f} MB → {new:.1f} MB")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", default="",
+                        help="Comma-separated case names or prefixes (e.g. repair_json); default all")
+    parser.add_argument("--scale", type=float, default=1.0, help="Input size multiplier (budgets scale too)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--case-timeout", type=float, default=60.0, help="Seconds before a case counts as hung")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.5,
+                        help="Allowed slowdown / allocation growth vs. the baseline (0.5 = 50%%)")
+    parser.add_argument("--worker", choices=sorted(CASES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.scale, args.repeat, args.seed)
+        return
+
+    prefixes = [c.strip() for c in args.cases.split(",") if c.strip()]
+    cases = [c for c in CASES if not prefixes or any(c.startswith(p) for p in prefixes)]
+    if not cases:
+        parser.error(f"No case matches {args.cases!r} (cases: {', '.join(CASES)})")
+
+    # Tracing off: clean_transcript is a pipeline stage and would export a span per call
+    env = dict(os.environ, TRACING_ENABLED="false")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "settings": {"scale": args.scale, "repeat": args.repeat, "seed": args.seed},
+        "cases": {},
+    }
+    print(f"🔬 Micro-benchmarks: {len(cases)} case(s), scale {args.scale}, {args.repeat} repeat(s)")
+    for case in cases:
+        result = run_case(case, args, env)
+        report["cases"][case] = result
+        if "error" in result:
+            print(f"   {case:<42} ERROR {result['error']}")
+        else:
+            print(f"   {case:<42} {result['input_bytes'] / MB:7.2f} MB  median {result['median_seconds']:8.4f}s  "
+                  f"best {result['best_seconds']:8.4f}s  peak {result['peak_mb']:7.1f} MB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Report written to {args.output}")
+
+    failures = check_budgets(report, args.scale)
+    if failures:
+        print(f"\n❌ {len(failures)} case(s) over budget:")
+        for line in failures:
+            print(f"   {line}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        changed = sorted(k for k, v in report["settings"].items() if baseline.get("settings", {}).get(k) != v)
+        if changed:
+            print(f"\n⚠ Baseline was run with different settings: {', '.join(changed)}")
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {args.baseline}:")
+            for line in regressions:
+                print(f"   {line}")
+            failures += regressions
+        else:
+            print(f"\n✓ No regressions vs {args.baseline}")
+
+    if failures:
+        sys.exit(1)
+    print("\n✓ All cases within budget")
+
+
+if __name__ == "__main__":
+    main()
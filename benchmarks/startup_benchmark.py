@@ -0,0 +1,228 @@
+"""
+Startup Benchmark (import cost + worker boot)
+
+What a fresh API worker pays before it can answer, measured in clean processes:
+Import time per module (--modules, median of --runs fresh interpreters)
+   └─ heavy-module check: after `import app.main` none of bs4 / whisper / yt_dlp / torch
+      may be loaded (they are imported where used)
+→ Heaviest imports below app.main (-X importtime, self time summed per top-level package)
+→ Worker boot: `uvicorn app.main:app` started until GET /health answers (median of --runs)
+Every process runs with a PATH holding no `ollama` binary and the HTTP transport:
+the Ollama CLI is looked up on first use, so a node without one must still boot.
+Model warm-up is off (it runs in the background and is reported by /ready, not /health).
+→ Budgets (--max-import-seconds, --max-boot-seconds), exit 1 on a breach
+→ JSON report (--output)
+
+Usage:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 10 --max-boot-seconds 0.8 --output startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import subprocess
+import urllib.error
+import urllib.request
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from e2e_benchmark import percentile, _git_commit  # noqa: E402
+
+DEFAULT_MODULES = "youtube_quiz_generator,app.services.quiz_service,app.main"
+HEAVY_MODULES = ("bs4", "whisper", "yt_dlp", "torch")
+BOOT_TIMEOUT = 30.0
+HEALTH_POLL_INTERVAL = 0.01
+
+IMPORT_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _path_without_ollama():
+    """PATH minus every directory that holds an `ollama` executable"""
+    keep = [d for d in os.environ.get("PATH", "").split(os.pathsep)
+            if d and not os.access(os.path.join(d, "ollama"), os.X_OK)]
+    return os.pathsep.join(keep)
+
+
+def _env():
+    return dict(
+        os.environ,
+        PATH=_path_without_ollama(),
+        PYTHONPATH=ROOT,
+        OLLAMA_TRANSPORT="http",
+        TRACING_ENABLED="false",
+        WARMUP_ENABLED="false",
+    )
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ===============================
+# IMPORT COST
+# ===============================
+def import_cost(module, runs, env):
+    """Median / best import time of one module over fresh interpreters, plus heavy modules it loaded"""
+    samples, heavy = [], set()
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+        if result.returncode != 0:
+            return {"error": (result.stderr.strip().splitlines() or ["exit %d" % result.returncode])[-1]}
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+        heavy.update(probe["heavy"])
+    return {
+        "median_seconds": round(percentile(samples, 0.5), 4),
+        "best_seconds": round(min(samples), 4),
+        "heavy_loaded": sorted(heavy),
+    }
+
+
+def heaviest_imports(module, env, top):
+    """Self import time per top-level package while importing module (-X importtime)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    per_package = Counter()
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].split(":")[1])
+        except ValueError:
+            continue  # Header line
+        per_package[parts[2].strip().split(".")[0]] += self_us
+    return [{"package": name, "seconds": round(us / 1e6, 4)} for name, us in per_package.most_common(top)]
+
+
+# ===============================
+# WORKER BOOT
+# ===============================
+def boot_time(env):
+    """Seconds from spawning a uvicorn worker until GET /health answers 200"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        while time.perf_counter() - started < BOOT_TIMEOUT:
+            if process.poll() is not None:
+                raise RuntimeError(f"Worker exited with {process.returncode}: "
+                                   f"{(process.stderr.read().strip().splitlines() or [''])[-1]}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                pass
+            time.sleep(HEALTH_POLL_INTERVAL)
+        raise RuntimeError(f"/health not answering after {BOOT_TIMEOUT:.0f}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        process.stderr.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure module import cost and API worker boot time")
+    parser.add_argument("--modules", default=DEFAULT_MODULES, help="Comma-separated modules to time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest packages to report")
+    parser.add_argument("--max-import-seconds", type=float, default=1.0,
+                        help="Budget for the median import time of each module")
+    parser.add_argument("--max-boot-seconds", type=float, default=1.0,
+                        help="Budget for the median worker boot time (spawn → /health)")
+    parser.add_argument("--skip-boot", action="store_true", help="Only measure imports")
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    env = _env()
+    modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "settings": {"runs": args.runs},
+        "imports": {},
+    }
+    breaches = []
+
+    print(f"🚀 Startup benchmark: {len(modules)} module(s), {args.runs} run(s) each")
+    for module in modules:
+        result = import_cost(module, args.runs, env)
+        report["imports"][module] = result
+        if "error" in result:
+            print(f"   import {module:<34} ERROR {result['error']}")
+            breaches.append(f"import {module} failed: {result['error']}")
+            continue
+        print(f"   import {module:<34} median {result['median_seconds']:.3f}s  best {result['best_seconds']:.3f}s")
+        if result["median_seconds"] > args.max_import_seconds:
+            breaches.append(f"import {module}: {result['median_seconds']:.3f}s > {args.max_import_seconds:.3f}s")
+        if result["heavy_loaded"]:
+            breaches.append(f"import {module} loads {', '.join(result['heavy_loaded'])}")
+
+    report["heaviest_imports"] = heaviest_imports(modules[-1], env, args.top) if modules else []
+    print("   heaviest packages: " + ", ".join(
+        f"{p['package']} {p['seconds'] * 1000:.0f}ms" for p in report["heaviest_imports"]))
+
+    if not args.skip_boot:
+        samples, error = [], None
+        for _ in range(args.runs):
+            try:
+                samples.append(boot_time(env))
+            except RuntimeError as e:
+                error = str(e)
+                break
+        if error:
+            report["boot"] = {"error": error}
+            breaches.append(f"worker boot failed: {error}")
+            print(f"   worker boot ERROR {error}")
+        else:
+            median = percentile(samples, 0.5)
+            report["boot"] = {"median_seconds": round(median, 4), "best_seconds": round(min(samples), 4),
+                              "max_seconds": round(max(samples), 4)}
+            print(f"   worker boot (spawn → /health)      median {median:.3f}s  best {min(samples):.3f}s")
+            if median > args.max_boot_seconds:
+                breaches.append(f"worker boot: {median:.3f}s > {args.max_boot_seconds:.3f}s")
+
+    report["breaches"] = breaches
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.output}")
+    for breach in breaches:
+        print(f"❌ {breach}")
+    if breaches:
+        sys.exit(1)
+    print("✅ Within budget")
+
+
+if __name__ == "__main__":
+    main()
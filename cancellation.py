@@ -0,0 +1,234 @@
+"""
+Cooperative Cancellation
+
+Stops the work of abandoned requests (client disconnected, deadline passed):
+Request
+→ CancellationToken (cancelled by the API on disconnect, or by its deadline)
+→ Bound to the request's threads (cancel_scope / current_token, copied into Agent-03)
+→ Checked at every blocking stage
+   ├─ ffmpeg / `ollama run` children   whole process tree killed (run_process)
+   ├─ Video / audio downloads          aborted between chunks
+   ├─ Whisper                          stopped between audio segments
+   ├─ Ollama HTTP                      stream closed (Ollama stops generating)
+   └─ Web search / retries             skipped
+→ Freed capacity counted (get_cancellation_stats, exposed on /stats)
+"""
+
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+import contextvars
+from contextlib import contextmanager
+
+POLL_INTERVAL = 0.25  # Seconds between cancellation checks while a child process runs
+
+
+class OperationCancelled(RuntimeError):
+    """The request was cancelled (client disconnected or deadline exceeded)"""
+
+
+class CancellationToken:
+    """
+    Thread-safe cancellation flag for one request.
+
+    A token with a deadline (deadline_scheduler.Deadline) cancels itself the first
+    time it is checked after the deadline has passed.
+    """
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        if not self._event.is_set() and self.deadline is not None and self.deadline.expired():
+            self.cancel("deadline exceeded")
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        """Cancel the request and run the registered callbacks (once)"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        cancellation_stats.record("cancelled_requests")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback):
+        """Run callback on cancellation (immediately if already cancelled); returns an unregister function"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._callbacks.remove(callback) if callback in self._callbacks else None
+        callback()
+        return lambda: None
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise OperationCancelled(f"Request cancelled: {self.reason}")
+
+
+# ===============================
+# FREED CAPACITY STATS
+# ===============================
+class CancellationStats:
+    """Counters of cancelled work and the estimated worker-seconds it freed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {
+            "cancelled_requests": 0,
+            "killed_processes": 0,
+            "aborted_downloads": 0,
+            "stopped_transcriptions": 0,
+            "aborted_llm_calls": 0,
+        }
+        self._freed_seconds = 0.0
+
+    def record(self, event, freed_seconds=0.0):
+        with self._lock:
+            self._counts[event] = self._counts.get(event, 0) + 1
+            self._freed_seconds += max(0.0, freed_seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts, freed_seconds=round(self._freed_seconds, 1))
+
+
+cancellation_stats = CancellationStats()
+
+
+def get_cancellation_stats():
+    """Cancelled work on this process and the worker time it freed"""
+    return cancellation_stats.snapshot()
+
+
+# ===============================
+# REQUEST SCOPE
+# ===============================
+_current_token = contextvars.ContextVar("cancellation_token", default=None)
+
+
+@contextmanager
+def cancel_scope(token):
+    """Bind token to the current thread/context (None leaves the work uncancellable)"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def current_token():
+    return _current_token.get()
+
+
+def child_token(parent=None):
+    """Token for a sub-task: cancelled with parent, but cancelling it leaves parent running"""
+    if parent is None:
+        return CancellationToken()
+    token = CancellationToken(deadline=parent.deadline)
+    parent.on_cancel(lambda: token.cancel(parent.reason))
+    return token
+
+
+def check_cancelled():
+    """Raise OperationCancelled if the current request was cancelled"""
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+# ===============================
+# CANCELLABLE CHILD PROCESSES
+# ===============================
+def _new_process_group_kwargs():
+    if sys.platform == "win32":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(proc):
+    """Kill a child started by run_process together with everything it spawned"""
+    if proc.poll() is not None:
+        return
+    try:
+        if sys.platform == "win32":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False
+            )
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)  # start_new_session: pgid == pid
+    except (ProcessLookupError, PermissionError, OSError):
+        proc.kill()
+
+
+def run_process(args, timeout=None, stage="process", cpus=None, **kwargs):
+    """
+    subprocess.run replacement that never leaves children behind.
+
+    The child runs in its own process group; on timeout or cancellation of the
+    current request the whole group is killed, not just the direct child.
+
+    Args:
+        args: Command line
+        timeout: Seconds before the process tree is killed (None = no limit)
+        stage: Name used in log messages
+        cpus: Cores to pin the child to (Linux; inherited by its own children)
+        **kwargs: Passed to subprocess.Popen (stdout/stderr default to PIPE)
+
+    Returns:
+        subprocess.CompletedProcess
+
+    Raises:
+        subprocess.TimeoutExpired: Timeout reached (process tree killed)
+        OperationCancelled: Request cancelled (process tree killed)
+    """
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+    kwargs.setdefault("stdout", subprocess.PIPE)
+    kwargs.setdefault("stderr", subprocess.PIPE)
+    proc = subprocess.Popen(args, **_new_process_group_kwargs(), **kwargs)
+    started = time.monotonic()
+    try:
+        if cpus and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(proc.pid, cpus)
+            except OSError:
+                pass  # Child already exited
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                elapsed = time.monotonic() - started
+                if token is not None and token.cancelled:
+                    kill_process_tree(proc)
+                    proc.communicate()
+                    cancellation_stats.record(
+                        "killed_processes", (timeout - elapsed) if timeout else 0.0
+                    )
+                    raise OperationCancelled(f"{stage} cancelled: {token.reason}")
+                if timeout is not None and elapsed >= timeout:
+                    kill_process_tree(proc)
+                    proc.communicate()
+                    raise subprocess.TimeoutExpired(args, timeout)
+    except BaseException:
+        # KeyboardInterrupt etc. - never leak the child
+        kill_process_tree(proc)
+        raise
+    return subprocess.CompletedProcess(args, proc.returncode, stdout, stderr)
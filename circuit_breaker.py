@@ -0,0 +1,217 @@
+"""
+Circuit Breakers for Upstream Services
+
+Fails fast instead of waiting out timeouts against an upstream that is down or throttling:
+Upstream call (transcript API, Wikipedia, DuckDuckGo, web pages, each Ollama endpoint)
+→ Rolling window of outcomes (BREAKER_WINDOW_SECONDS)
+→ closed     calls pass; error rate ≥ BREAKER_FAILURE_RATE over ≥ BREAKER_MIN_CALLS calls → open
+→ open       calls rejected immediately (CircuitOpen) → caller skips or falls back
+→ half_open  after BREAKER_OPEN_SECONDS one probe call passes
+             success → closed, failure → open again
+→ State, error rate and rejected calls per upstream exported (get_breaker_stats)
+"""
+
+import os
+import logging
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from cancellation import OperationCancelled
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# BREAKER CONFIG
+# ===============================
+BREAKER_WINDOW_SECONDS = float(os.environ.get("BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_MIN_CALLS = int(os.environ.get("BREAKER_MIN_CALLS", "5"))          # No verdict on fewer calls
+BREAKER_FAILURE_RATE = float(os.environ.get("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.environ.get("BREAKER_OPEN_SECONDS", "30"))  # Before a half-open probe
+BREAKER_HALF_OPEN_PROBES = 1
+# Registry cap (breakers are also metric labels); further names share OVERFLOW_BREAKER
+BREAKER_MAX_COUNT = int(os.environ.get("BREAKER_MAX_COUNT", "64"))
+OVERFLOW_BREAKER = "overflow"
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}  # Numeric state for metrics
+
+
+class CircuitOpen(RuntimeError):
+    """The upstream's breaker is open; the call was not attempted"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"Circuit open for {name}: skipping for {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Thread-safe breaker over a rolling window of call outcomes"""
+
+    def __init__(self, name, window_seconds=BREAKER_WINDOW_SECONDS, min_calls=BREAKER_MIN_CALLS,
+                 failure_rate=BREAKER_FAILURE_RATE, open_seconds=BREAKER_OPEN_SECONDS):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (monotonic time, ok)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _trim(self, now):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def _error_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def _open(self, now):
+        if self._state != OPEN:
+            self.times_opened += 1
+            logger.warning(f"⚡ Circuit opened for {self.name} (skipping calls for {self.open_seconds:.0f}s)")
+        self._state = OPEN
+        self._opened_at = now
+        self._probes = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def available(self):
+        """Would a call be let through right now (without reserving a probe)?"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                return time.monotonic() - self._opened_at >= self.open_seconds
+            return self._probes < BREAKER_HALF_OPEN_PROBES
+
+    def allow(self):
+        """Admit one call; in half-open state only BREAKER_HALF_OPEN_PROBES at a time"""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+                self._state = HALF_OPEN
+                self._probes = 0
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < BREAKER_HALF_OPEN_PROBES:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_in(self):
+        with self._lock:
+            return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                logger.info(f"✓ Circuit closed for {self.name}")
+                self._state = CLOSED
+                self._outcomes.clear()
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._open(now)
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            if (self._state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and self._error_rate() >= self.failure_rate):
+                self._open(now)
+
+    def release_probe(self):
+        """Give back a half-open probe whose call ended without a verdict (e.g. cancelled)"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    @contextmanager
+    def guard(self, is_failure=None):
+        """
+        Run the block as one call through the breaker.
+
+        Exceptions count as failures (unless is_failure(exc) says otherwise);
+        cancellations count as neither.
+
+        Raises:
+            CircuitOpen: The breaker is open (the block does not run)
+        """
+        if not self.allow():
+            raise CircuitOpen(self.name, self.retry_in())
+        try:
+            yield self
+        except OperationCancelled:
+            self.release_probe()
+            raise
+        except Exception as e:
+            if is_failure is None or is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+
+    def snapshot(self):
+        state = self.state
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "state": state,
+                "state_code": STATE_CODES[state],
+                "calls": len(self._outcomes),
+                "error_rate": round(self._error_rate(), 3),
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """
+    Process-wide breaker for an upstream (created with the BREAKER_* defaults).
+
+    Once BREAKER_MAX_COUNT breakers exist, new names get the shared
+    OVERFLOW_BREAKER so the registry and the metric labels stay bounded.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            if len(_breakers) >= BREAKER_MAX_COUNT:
+                breaker = _breakers.get(OVERFLOW_BREAKER)
+                if breaker is None:
+                    logger.warning(f"⚠ {BREAKER_MAX_COUNT} circuit breakers registered, "
+                                   f"sharing '{OVERFLOW_BREAKER}' for new upstreams (first: {name})")
+                    breaker = _breakers[OVERFLOW_BREAKER] = CircuitBreaker(OVERFLOW_BREAKER)
+                return breaker
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def get_breaker_stats():
+    """State and rolling error rate of every upstream breaker on this process"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.snapshot() for name, breaker in sorted(breakers.items())}
@@ -0,0 +1,228 @@
+"""
+CPU Partitioning
+
+Splits the host's cores between the CPU-heavy stages so they stop oversubscribing each other:
+Deployment profile (CPU_PROFILE)
+→ Share of the available cores per stage
+   ├─ whisper  PyTorch intra-op threads (torch.set_num_threads)
+   ├─ ffmpeg   `-threads N` on audio extraction / decoding
+   └─ ollama   `num_thread` option on every call (HTTP transport; the CLI cannot set it)
+→ Explicit thread counts override the profile (WHISPER_THREADS, FFMPEG_THREADS, OLLAMA_NUM_THREAD)
+→ Optional CPU affinity (CPU_AFFINITY=true, Linux): Whisper on the first cores, Ollama's
+  share kept free at the end, ffmpeg children pinned inside the Whisper side
+→ benchmarks/cpu_partition_benchmark.py measures the throughput-optimal split for a host
+"""
+
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# PARTITION CONFIG
+# ===============================
+# "off" keeps library defaults (every stage uses all cores), or a named profile below,
+# or explicit shares such as "whisper=0.6,ollama=0.4,ffmpeg=0.2"
+CPU_PROFILE = os.environ.get("CPU_PROFILE", "off")
+CPU_AFFINITY = os.environ.get("CPU_AFFINITY", "false").lower() == "true"
+
+# Share of the available cores per stage. Whisper and Ollama get disjoint cores;
+# ffmpeg runs inside the Whisper side (decoding always precedes transcription)
+CPU_PROFILES = {
+    "off": None,
+    "balanced": {"whisper": 0.5, "ollama": 0.5, "ffmpeg": 0.25},
+    "asr_heavy": {"whisper": 0.75, "ollama": 0.25, "ffmpeg": 0.25},
+    "llm_heavy": {"whisper": 0.25, "ollama": 0.75, "ffmpeg": 0.125},
+}
+
+STAGES = ("whisper", "ffmpeg", "ollama")
+
+# Explicit per-stage thread counts (win over the profile)
+THREAD_OVERRIDES = {
+    "whisper": os.environ.get("WHISPER_THREADS"),
+    "ffmpeg": os.environ.get("FFMPEG_THREADS"),
+    "ollama": os.environ.get("OLLAMA_NUM_THREAD"),
+}
+
+
+@dataclass(frozen=True)
+class CpuPartition:
+    """Thread budget (None = library default) and optional core set per stage"""
+    profile: str
+    whisper_threads: int = None
+    ffmpeg_threads: int = None
+    ollama_threads: int = None
+    whisper_cpus: tuple = None
+    ffmpeg_cpus: tuple = None
+    ollama_cpus: tuple = None
+    affinity: bool = False
+
+    def threads(self, stage):
+        return getattr(self, f"{stage}_threads")
+
+    def cpus(self, stage):
+        """Cores to pin stage to, or None when affinity is disabled"""
+        return getattr(self, f"{stage}_cpus") if self.affinity else None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def available_cpus():
+    """Cores this process may run on (honours taskset / cgroup cpusets on Linux)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_profile(profile):
+    """
+    Resolve a profile name or "stage=share,..." string to per-stage core shares.
+
+    Returns:
+        dict of stage → share of the cores, or None for "off"
+
+    Raises:
+        ValueError: Unknown profile name or malformed share list
+    """
+    if profile in CPU_PROFILES:
+        return CPU_PROFILES[profile]
+    if "=" not in profile:
+        raise ValueError(
+            f"Unknown CPU profile: {profile}. Available: {', '.join(sorted(CPU_PROFILES))} "
+            f"or shares like 'whisper=0.6,ollama=0.4'"
+        )
+    shares = {}
+    for part in profile.split(","):
+        stage, _, value = part.partition("=")
+        stage = stage.strip()
+        if stage not in STAGES:
+            raise ValueError(f"Unknown CPU stage '{stage}'. Expected one of: {', '.join(STAGES)}")
+        try:
+            shares[stage] = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid CPU share for {stage}: {value!r}")
+        if not 0 < shares[stage] <= 1:
+            raise ValueError(f"CPU share for {stage} must be in (0, 1], got {shares[stage]}")
+    if shares.get("whisper", 0) + shares.get("ollama", 0) > 1:
+        raise ValueError("CPU shares of whisper and ollama must not add up to more than 1")
+    return shares
+
+
+def build_partition(profile=CPU_PROFILE, cpus=None, affinity=CPU_AFFINITY, overrides=None):
+    """
+    Assign thread budgets and core sets for profile on the given cores.
+
+    Args:
+        profile: Profile name or share string (see CPU_PROFILE)
+        cpus: Core IDs to split (default: cores available to this process)
+        affinity: Pin stages to their core sets
+        overrides: stage → thread count, taking precedence over the profile
+
+    Returns:
+        CpuPartition
+
+    Raises:
+        ValueError: Invalid profile or thread override
+    """
+    cpus = list(cpus) if cpus is not None else available_cpus()
+    shares = parse_profile(profile) or {}
+    overrides = THREAD_OVERRIDES if overrides is None else overrides
+
+    threads = {}
+    for stage in STAGES:
+        value = overrides.get(stage)
+        if value not in (None, ""):
+            try:
+                threads[stage] = int(value)
+            except ValueError:
+                raise ValueError(f"Invalid thread count for {stage}: {value!r}")
+            if threads[stage] < 1:
+                raise ValueError(f"Thread count for {stage} must be at least 1")
+        elif stage in shares:
+            threads[stage] = max(1, int(round(len(cpus) * shares[stage])))
+        else:
+            threads[stage] = None
+
+    # Whisper from the front, Ollama from the back, ffmpeg within the Whisper cores
+    n_whisper = min(len(cpus), threads["whisper"] or len(cpus))
+    n_ollama = min(len(cpus), threads["ollama"] or len(cpus))
+    n_ffmpeg = min(n_whisper, threads["ffmpeg"] or n_whisper)
+    return CpuPartition(
+        profile=profile,
+        whisper_threads=threads["whisper"],
+        ffmpeg_threads=threads["ffmpeg"],
+        ollama_threads=threads["ollama"],
+        whisper_cpus=tuple(cpus[:n_whisper]),
+        ffmpeg_cpus=tuple(cpus[:n_ffmpeg]),
+        ollama_cpus=tuple(cpus[len(cpus) - n_ollama:]),
+        affinity=affinity and hasattr(os, "sched_setaffinity") and bool(shares or any(threads.values())),
+    )
+
+
+_partition = None
+_partition_lock = threading.Lock()
+_torch_configured = False
+
+
+def get_cpu_partition():
+    """Process-wide partition from CPU_PROFILE / CPU_AFFINITY / *_THREADS"""
+    global _partition
+    with _partition_lock:
+        if _partition is None:
+            _partition = build_partition()
+        return _partition
+
+
+# ===============================
+# PER-STAGE HELPERS
+# ===============================
+def configure_torch_threads():
+    """Limit PyTorch intra-op threads to the Whisper budget (once per process)"""
+    global _torch_configured
+    threads = get_cpu_partition().whisper_threads
+    if _torch_configured or threads is None:
+        return
+    import torch
+    torch.set_num_threads(threads)
+    _torch_configured = True
+    logger.info(f"🧮 Whisper limited to {threads} CPU thread(s)")
+
+
+def ffmpeg_thread_args():
+    """`-threads N` for ffmpeg command lines ([] = ffmpeg default)"""
+    threads = get_cpu_partition().ffmpeg_threads
+    return ["-threads", str(threads)] if threads else []
+
+
+def ollama_thread_options():
+    """Extra Ollama options limiting generation threads ({} = Ollama default)"""
+    threads = get_cpu_partition().ollama_threads
+    return {"num_thread": threads} if threads else {}
+
+
+def process_cpus(stage):
+    """Core set a child process of stage should be pinned to (None = unpinned)"""
+    return get_cpu_partition().cpus(stage)
+
+
+@contextmanager
+def pinned(stage):
+    """
+    Pin the calling thread to stage's cores for the duration of the block.
+
+    Threads the block starts (PyTorch's intra-op pool on first use) inherit the mask.
+    """
+    cpus = get_cpu_partition().cpus(stage)
+    if cpus is None:
+        yield
+        return
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cpus)
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, previous)
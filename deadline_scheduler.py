@@ -0,0 +1,251 @@
+"""
+Deadline-Aware Pipeline Scheduling
+
+Meets a per-request latency budget by degrading the pipeline instead of timing out:
+Request deadline (seconds)
+→ Stage cost estimates from live measurements
+   ├─ Transcript fetch / media download   (EWMA seconds)
+   ├─ Whisper real-time factor per model  (EWMA seconds per audio second)
+   ├─ Agent-03 enrichment                 (EWMA seconds)
+   └─ Ollama prompt/eval tokens per second (token_budget.throughput)
+→ Degradations, applied in order of least quality loss until the plan fits
+   1. skip_enrichment          transcript-only MCQs
+   2. whisper_tiny             fastest Whisper model
+   3. reduced_question_count   fewer MCQs (never below MIN_QUESTION_COUNT)
+   4. chunk_sampling           transcribe evenly spaced audio chunks only
+→ Applied degradations reported back to the client
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import replace
+
+from token_budget import throughput
+from metrics import stage_timer, record_degradation
+from tracing import set_attributes
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# SCHEDULER CONFIG
+# ===============================
+# Fraction of the remaining time the plan may use (rest absorbs estimation error)
+DEADLINE_SAFETY_FACTOR = float(os.environ.get("DEADLINE_SAFETY_FACTOR", "0.8"))
+
+MIN_QUESTION_COUNT = 5        # Cutting the quiz further makes it useless
+FAST_WHISPER_MODEL = "tiny"
+SAMPLE_CHUNK_SECONDS = 30.0   # Whisper works on 30-second windows
+MIN_SAMPLED_AUDIO_SECONDS = 60.0
+
+# MCQ prompt overhead (instructions + format) and retry allowance
+MCQ_PROMPT_OVERHEAD_TOKENS = 400
+MCQ_RETRY_FACTOR = 1.3
+
+# Share of questions generated after enrichment lands (speculative pipeline)
+ENRICHED_QUESTION_SHARE = 0.3
+
+# Priors used until a stage has been measured on this host
+DEFAULT_STAGE_SECONDS = {
+    "transcript_fetch": 3.0,
+    "media_download": 20.0,
+    "enrichment": 90.0,
+}
+DEFAULT_WHISPER_RTF = {  # Seconds of CPU work per second of audio
+    "tiny": 0.15, "tiny.en": 0.15,
+    "base": 0.3, "base.en": 0.3,
+    "small": 0.8, "small.en": 0.8,
+}
+DEFAULT_WHISPER_RTF_FALLBACK = 2.0
+
+EWMA_ALPHA = 0.3
+
+
+# ===============================
+# STAGE MEASUREMENT
+# ===============================
+class StageTimings:
+    """Thread-safe EWMA of stage durations and Whisper real-time factors"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seconds = {}
+        self._whisper_rtf = {}
+
+    @staticmethod
+    def _ewma(old, new):
+        return new if old is None else (1 - EWMA_ALPHA) * old + EWMA_ALPHA * new
+
+    def record_stage(self, stage, seconds):
+        with self._lock:
+            self._seconds[stage] = self._ewma(self._seconds.get(stage), seconds)
+
+    def record_whisper(self, model, audio_seconds, elapsed):
+        if audio_seconds <= 0:
+            return
+        with self._lock:
+            self._whisper_rtf[model] = self._ewma(self._whisper_rtf.get(model), elapsed / audio_seconds)
+
+    def stage_seconds(self, stage):
+        with self._lock:
+            measured = self._seconds.get(stage)
+        return measured if measured is not None else DEFAULT_STAGE_SECONDS.get(stage, 0.0)
+
+    def whisper_rtf(self, model):
+        with self._lock:
+            measured = self._whisper_rtf.get(model)
+        if measured is not None:
+            return measured
+        return DEFAULT_WHISPER_RTF.get(model, DEFAULT_WHISPER_RTF_FALLBACK)
+
+    def snapshot(self):
+        with self._lock:
+            return {"stage_seconds": dict(self._seconds), "whisper_rtf": dict(self._whisper_rtf)}
+
+
+stage_timings = StageTimings()
+
+
+def get_stage_stats():
+    """Measured stage durations / Whisper real-time factors on this host"""
+    return stage_timings.snapshot()
+
+
+class timed_stage(stage_timer):
+    """stage_timer that also feeds successful run durations into the scheduler's estimates"""
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            stage_timings.record_stage(self.stage, time.monotonic() - self.started)
+        return super().__exit__(exc_type, exc, tb)
+
+
+# ===============================
+# DEADLINE SCHEDULER
+# ===============================
+class Deadline:
+    """Absolute monotonic deadline for one request"""
+
+    def __init__(self, seconds):
+        self.seconds = float(seconds)
+        self.expires_at = time.monotonic() + self.seconds
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def estimate_mcq_seconds(model, question_count, context_tokens, tokens_per_mcq):
+    """Expected Ollama time to generate question_count MCQs over context_tokens of context"""
+    stats = throughput.get(model)
+    prompt_tokens = context_tokens + MCQ_PROMPT_OVERHEAD_TOKENS
+    output_tokens = tokens_per_mcq * question_count + 150
+    seconds = prompt_tokens / stats["prompt_tps"] + output_tokens / stats["eval_tps"]
+    return seconds * MCQ_RETRY_FACTOR
+
+
+class DeadlineScheduler:
+    """
+    Per-request scheduler consulted at stage boundaries.
+
+    The pipeline asks it how to run the next stage (Whisper model, audio sampling,
+    enrichment, question count) given the time left; every degradation it applies
+    is recorded in `degradations` for the response.
+    """
+
+    def __init__(self, deadline_seconds, question_count=20, tokens_per_mcq=110):
+        self.deadline = Deadline(deadline_seconds)
+        self.question_count = question_count
+        self.tokens_per_mcq = tokens_per_mcq
+        self.degradations = []
+
+    def _budget(self):
+        return max(0.0, self.deadline.remaining() * DEADLINE_SAFETY_FACTOR)
+
+    def degrade(self, name):
+        """Record (once) that a degradation was applied to this request"""
+        if name not in self.degradations:
+            logger.info(f"⏱ Deadline: applying degradation '{name}' ({self.deadline.remaining():.0f}s left)")
+            record_degradation(name)
+            set_attributes(**{f"degradation.{name}": True})
+            self.degradations.append(name)
+
+    def _mcq_seconds(self, config, question_count, context_tokens=None):
+        if context_tokens is None:
+            context_tokens = config.max_transcript_tokens
+        return estimate_mcq_seconds(config.ollama_model, question_count, context_tokens,
+                                    self.tokens_per_mcq)
+
+    def plan_transcription(self, config, audio_seconds):
+        """
+        Choose the Whisper model and audio sampling for audio_seconds of audio.
+
+        The MCQ stage (transcript-only) is reserved first; if even the smallest quiz
+        does not leave room for full transcription with the tiny model, only evenly
+        spaced chunks are transcribed.
+
+        Returns:
+            (whisper model name, seconds of audio to transcribe or None for all of it)
+        """
+        budget = self._budget()
+        model = config.whisper_model
+        reserve = self._mcq_seconds(config, self.question_count)
+        if audio_seconds * stage_timings.whisper_rtf(model) + reserve <= budget:
+            return model, None
+
+        if model != FAST_WHISPER_MODEL:
+            model = FAST_WHISPER_MODEL
+            self.degrade("whisper_tiny")
+        rtf = stage_timings.whisper_rtf(model)
+        if audio_seconds * rtf + reserve <= budget:
+            return model, None
+
+        # Later question-count cuts free up time for transcription
+        available = budget - self._mcq_seconds(config, MIN_QUESTION_COUNT)
+        if audio_seconds * rtf <= available:
+            return model, None
+
+        sampled = max(MIN_SAMPLED_AUDIO_SECONDS, available / rtf)
+        if sampled >= audio_seconds:
+            return model, None
+        self.degrade("chunk_sampling")
+        return model, sampled
+
+    def plan_generation(self, config, context_tokens):
+        """
+        Decide enrichment and question count for the MCQ stage.
+
+        Returns:
+            (PipelineConfig, question count)
+        """
+        budget = self._budget()
+        count = self.question_count
+        mcq_seconds = self._mcq_seconds(config, count, context_tokens)
+
+        if not config.fast_mode:
+            # Enrichment overlaps the transcript-grounded share of MCQ generation
+            enrichment = stage_timings.stage_seconds("enrichment")
+            overlapped = mcq_seconds * (1 - ENRICHED_QUESTION_SHARE)
+            if max(enrichment, overlapped) + mcq_seconds * ENRICHED_QUESTION_SHARE > budget:
+                config = replace(config, fast_mode=True)
+                self.degrade("skip_enrichment")
+
+        if mcq_seconds > budget:
+            # MCQ time is linear in the question count: fixed prompt cost + per question
+            fixed = self._mcq_seconds(config, 0, context_tokens)
+            per_question = (mcq_seconds - fixed) / count
+            affordable = int((budget - fixed) / per_question)
+            reduced = max(MIN_QUESTION_COUNT, min(count, affordable))
+            if reduced < count:
+                count = reduced
+                self.degrade("reduced_question_count")
+
+        self.question_count = count
+        return config, count
+
+    def enrichment_wait(self, config, remaining_questions):
+        """Seconds the speculative pipeline may still wait for enrichment"""
+        return max(0.0, self._budget() - self._mcq_seconds(config, remaining_questions))
@@ -0,0 +1,289 @@
+"""
+Offline Knowledge Index (BM25, memory-mapped postings)
+
+Local replacement for live web search in Agent-03 (air-gapped nodes, no rate limits):
+Document dump (JSONL Wikipedia extracts, .txt/.md course notes)
+→ Passage chunking (~PASSAGE_WORDS words per passage)
+→ Tokenize + stopword removal (text_analysis.tokenize)
+→ On-disk inverted index
+   ├─ terms.json          term → [postings offset, document frequency]
+   ├─ postings_docs.u32   passage ids, concatenated per term   (np.memmap)
+   ├─ postings_tf.u16     term frequencies, same layout         (np.memmap)
+   ├─ doc_lens.u32        passage lengths in tokens             (np.memmap)
+   ├─ docs.jsonl          passage title/url/text
+   └─ doc_offsets.u64     byte offset of each passage in docs.jsonl
+→ BM25 query (vectorized score accumulation, top-k in milliseconds)
+
+Usage:
+    python knowledge_index.py build <index_dir> <dump.jsonl | notes_dir> [...]
+    python knowledge_index.py search <index_dir> "ionizing radiation"
+"""
+
+import os
+import logging
+import sys
+import json
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from text_analysis import tokenize, STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# INDEX CONFIG
+# ===============================
+# Directory of a built index; empty = no local knowledge store configured
+KNOWLEDGE_INDEX_DIR = os.environ.get("KNOWLEDGE_INDEX_DIR", "")
+
+PASSAGE_WORDS = 300   # Passage size used when chunking long documents
+BM25_K1 = 1.2
+BM25_B = 0.75
+INDEX_VERSION = 1
+
+
+def _index_terms(text):
+    return [t for t in tokenize(text) if t not in STOPWORDS and len(t) > 1]
+
+
+def _chunk_words(text, size=PASSAGE_WORDS):
+    words = text.split()
+    for i in range(0, len(words), size):
+        yield " ".join(words[i:i + size])
+
+
+def iter_documents(path):
+    """
+    Yield {"title", "url", "text"} documents from a dump file or notes directory.
+
+    Supported sources:
+        *.jsonl  one JSON object per line with "text" and optional "title"/"url"
+        *.txt / *.md  plain text; title is the file name
+        directory  walked recursively for the file types above
+    """
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.endswith((".jsonl", ".txt", ".md")):
+                    yield from iter_documents(os.path.join(root, name))
+        return
+
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    doc = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(doc, dict) and doc.get("text"):
+                    yield {
+                        "title": doc.get("title", ""),
+                        "url": doc.get("url", ""),
+                        "text": doc["text"],
+                    }
+        return
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if text.strip():
+        title = os.path.splitext(os.path.basename(path))[0].replace("_", " ")
+        yield {"title": title, "url": "file://" + os.path.abspath(path), "text": text}
+
+
+# ===============================
+# BUILD
+# ===============================
+def build_index(index_dir, sources):
+    """
+    Build an on-disk BM25 index from document dumps / notes directories.
+
+    Args:
+        index_dir: Output directory (created if missing, files overwritten)
+        sources: List of .jsonl files, text files or directories
+
+    Returns:
+        dict: index metadata (passage count, term count, average length)
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    postings = defaultdict(list)   # term → [(passage_id, tf), ...] in passage order
+    doc_lens = []
+    doc_offsets = []
+
+    with open(os.path.join(index_dir, "docs.jsonl"), "wb") as docs_file:
+        for source in sources:
+            for doc in iter_documents(source):
+                for passage in _chunk_words(doc["text"]):
+                    terms = _index_terms(passage)
+                    if not terms:
+                        continue
+                    passage_id = len(doc_lens)
+                    counts = defaultdict(int)
+                    for term in terms:
+                        counts[term] += 1
+                    for term, tf in counts.items():
+                        postings[term].append((passage_id, min(tf, 65535)))
+                    doc_lens.append(len(terms))
+                    doc_offsets.append(docs_file.tell())
+                    record = {"title": doc["title"], "url": doc["url"], "text": passage}
+                    docs_file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    terms = {}
+    offset = 0
+    total = sum(len(p) for p in postings.values())
+    docs_arr = np.empty(total, dtype=np.uint32)
+    tf_arr = np.empty(total, dtype=np.uint16)
+    for term in sorted(postings):
+        plist = postings[term]
+        n = len(plist)
+        docs_arr[offset:offset + n] = [p[0] for p in plist]
+        tf_arr[offset:offset + n] = [p[1] for p in plist]
+        terms[term] = [offset, n]
+        offset += n
+
+    docs_arr.tofile(os.path.join(index_dir, "postings_docs.u32"))
+    tf_arr.tofile(os.path.join(index_dir, "postings_tf.u16"))
+    np.asarray(doc_lens, dtype=np.uint32).tofile(os.path.join(index_dir, "doc_lens.u32"))
+    np.asarray(doc_offsets, dtype=np.uint64).tofile(os.path.join(index_dir, "doc_offsets.u64"))
+    with open(os.path.join(index_dir, "terms.json"), "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "n_docs": len(doc_lens),
+        "n_terms": len(terms),
+        "avg_doc_len": float(np.mean(doc_lens)) if doc_lens else 0.0,
+    }
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+# ===============================
+# QUERY
+# ===============================
+def _memmap(path, dtype):
+    # np.memmap refuses zero-length files; an empty index simply has no postings
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class KnowledgeIndex:
+    """Read-only BM25 index opened from a directory written by build_index"""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise RuntimeError(f"Unsupported knowledge index version in {index_dir}, rebuild it")
+        with open(os.path.join(index_dir, "terms.json"), "r", encoding="utf-8") as f:
+            self.terms = json.load(f)
+
+        self.postings_docs = _memmap(os.path.join(index_dir, "postings_docs.u32"), np.uint32)
+        self.postings_tf = _memmap(os.path.join(index_dir, "postings_tf.u16"), np.uint16)
+        self.doc_lens = _memmap(os.path.join(index_dir, "doc_lens.u32"), np.uint32)
+        self.doc_offsets = _memmap(os.path.join(index_dir, "doc_offsets.u64"), np.uint64)
+        self.n_docs = self.meta["n_docs"]
+        self.avg_doc_len = self.meta["avg_doc_len"] or 1.0
+        self._docs_lock = threading.Lock()
+        self._docs_file = open(os.path.join(index_dir, "docs.jsonl"), "rb")
+
+    def close(self):
+        self._docs_file.close()
+
+    def _read_doc(self, passage_id):
+        with self._docs_lock:
+            self._docs_file.seek(int(self.doc_offsets[passage_id]))
+            return json.loads(self._docs_file.readline())
+
+    def search(self, query, k=3):
+        """
+        Rank passages for a query with BM25.
+
+        Returns:
+            List of {"title", "url", "text", "score", "coverage"} dicts, best first
+            (coverage: share of the query's terms found in the passage)
+        """
+        query_terms = sorted(set(_index_terms(query)))
+        doc_parts, score_parts = [], []
+        for term in query_terms:
+            entry = self.terms.get(term)
+            if not entry:
+                continue
+            offset, df = entry
+            docs = np.asarray(self.postings_docs[offset:offset + df])
+            tf = np.asarray(self.postings_tf[offset:offset + df], dtype=np.float32)
+            idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lens[docs] / self.avg_doc_len)
+            doc_parts.append(docs)
+            score_parts.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+
+        if not doc_parts:
+            return []
+
+        docs = np.concatenate(doc_parts)
+        scores = np.concatenate(score_parts)
+        uniq, inverse = np.unique(docs, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores)
+        matched = np.bincount(inverse)  # Query terms per passage (one posting per term and passage)
+
+        k = min(k, len(uniq))
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.lexsort((uniq[top], -totals[top]))]  # score desc, passage id asc
+
+        results = []
+        for i in top:
+            doc = self._read_doc(int(uniq[i]))
+            doc["score"] = float(totals[i])
+            doc["coverage"] = round(int(matched[i]) / len(query_terms), 3)
+            results.append(doc)
+        return results
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_knowledge_index():
+    """Process-wide index at KNOWLEDGE_INDEX_DIR, or None if not configured/built"""
+    global _default_index
+    if not KNOWLEDGE_INDEX_DIR:
+        return None
+    with _default_index_lock:
+        if _default_index is None:
+            if not os.path.exists(os.path.join(KNOWLEDGE_INDEX_DIR, "meta.json")):
+                logger.warning(f"⚠ Knowledge index not found at {KNOWLEDGE_INDEX_DIR}")
+                return None
+            _default_index = KnowledgeIndex(KNOWLEDGE_INDEX_DIR)
+        return _default_index
+
+
+# ===============================
+# CLI
+# ===============================
+def main():
+    if len(sys.argv) < 4 or sys.argv[1] not in ("build", "search"):
+        print("Usage:")
+        print("  python knowledge_index.py build <index_dir> <dump.jsonl | notes_dir> [...]")
+        print("  python knowledge_index.py search <index_dir> \"query\"")
+        sys.exit(1)
+
+    command, index_dir = sys.argv[1], sys.argv[2]
+    if command == "build":
+        meta = build_index(index_dir, sys.argv[3:])
+        print(f"✓ Indexed {meta['n_docs']} passages, {meta['n_terms']} terms → {index_dir}")
+    else:
+        index = KnowledgeIndex(index_dir)
+        for hit in index.search(" ".join(sys.argv[3:]), k=5):
+            print(f"{hit['score']:.2f}  {hit['title']}  {hit['url']}")
+            print(f"      {hit['text'][:160]}...")
+
+
+if __name__ == "__main__":
+    main()
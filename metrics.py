@@ -0,0 +1,275 @@
+"""
+Pipeline Metrics (Prometheus)
+
+Where a quiz spends its time and what the pipeline did along the way:
+→ quiz_stage_duration_seconds   histogram per pipeline stage and outcome (ok / error / cancelled)
+→ quiz_pipeline_duration_seconds end-to-end per source (youtube / video_url)
+→ ollama_call_duration_seconds  per model / pool, ollama_tokens_total (prompt / eval)
+→ quiz_retries_total            retry attempts per stage
+→ mcq_json_parse_total          JSON repair outcomes of MCQ generations
+→ quiz_cache_requests_total     hits / misses (question bank, Whisper models, single-flight)
+→ http_request_duration_seconds API latency per route and status
+→ Scrape-time gauges            admission queue depth, resource slots, circuit breakers,
+                                Ollama endpoint load, warm-up readiness (read from the live objects)
+→ Every stage / pipeline timer also opens a trace span (tracing.py) and, for a
+  profiled request, takes CPU samples / memory snapshots (profiling.py)
+Exposed by the API at GET /metrics. With several worker processes set
+PROMETHEUS_MULTIPROC_DIR so the scrape aggregates every worker.
+"""
+
+import os
+import time
+import logging
+import functools
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from cancellation import OperationCancelled
+from tracing import span
+from profiling import current_session
+
+logger = logging.getLogger(__name__)
+
+# Stages range from sub-second (cleanup) to many minutes (Whisper on long lectures)
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1200)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+STAGE_SECONDS = Histogram(
+    "quiz_stage_duration_seconds", "Duration of one pipeline stage run",
+    ["stage", "outcome"], buckets=STAGE_BUCKETS
+)
+PIPELINE_SECONDS = Histogram(
+    "quiz_pipeline_duration_seconds", "End-to-end quiz generation time",
+    ["source", "outcome"], buckets=STAGE_BUCKETS
+)
+OLLAMA_CALL_SECONDS = Histogram(
+    "ollama_call_duration_seconds", "Duration of one Ollama generation",
+    ["model", "pool", "outcome"], buckets=STAGE_BUCKETS
+)
+OLLAMA_TOKENS = Counter(
+    "ollama_tokens", "Tokens processed by Ollama", ["model", "kind"]
+)
+OLLAMA_PROMPT_TOKENS = Histogram(
+    "ollama_prompt_tokens", "Prompt size of Ollama calls", ["model"], buckets=TOKEN_BUCKETS
+)
+RETRIES = Counter(
+    "quiz_retries", "Retry attempts of a pipeline stage", ["stage", "reason"]
+)
+JSON_PARSE = Counter(
+    "mcq_json_parse", "Outcome of parsing the MCQ JSON returned by Ollama", ["outcome"]
+)
+CACHE_REQUESTS = Counter(
+    "quiz_cache_requests", "Cache lookups", ["cache", "result"]
+)
+DEGRADATIONS = Counter(
+    "quiz_degradations", "Deadline degradations applied", ["degradation"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "API request latency", ["method", "path", "status"],
+    buckets=STAGE_BUCKETS
+)
+
+
+def _outcome(exc_type):
+    if exc_type is None:
+        return "ok"
+    if issubclass(exc_type, OperationCancelled):
+        return "cancelled"
+    return "error"
+
+
+class stage_timer:
+    """
+    Context manager / decorator observing quiz_stage_duration_seconds for one stage,
+    traced as a span named after the stage (`.span`, None when tracing is off).
+
+        with stage_timer("whisper") as timer: ...
+
+        @stage_timer("clean_transcript")
+        def clean_transcript(...): ...
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._span = span(self.stage, kind="stage")
+        self.span = self._span.__enter__()
+        self._profile = current_session()
+        if self._profile is not None:
+            self._profile.enter_stage(self.stage)
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.monotonic() - self.started
+        STAGE_SECONDS.labels(self.stage, _outcome(exc_type)).observe(elapsed)
+        logger.debug("stage %s finished in %.2fs (%s)", self.stage, elapsed, _outcome(exc_type))
+        if self._profile is not None:
+            self._profile.exit_stage(self.stage)
+        self._span.__exit__(exc_type, exc, tb)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(self.stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class pipeline_timer:
+    """Context manager observing quiz_pipeline_duration_seconds for one quiz (traced as "pipeline")"""
+
+    def __init__(self, source, **attributes):
+        self.source = source
+        self.attributes = attributes
+
+    def __enter__(self):
+        self._span = span("pipeline", source=self.source, **self.attributes)
+        self.span = self._span.__enter__()
+        self._profile = current_session()
+        if self._profile is not None:
+            self._profile.enter_stage("pipeline")  # Samples code between the stages too
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        PIPELINE_SECONDS.labels(self.source, _outcome(exc_type)).observe(time.monotonic() - self.started)
+        if self._profile is not None:
+            self._profile.exit_stage("pipeline")
+        self._span.__exit__(exc_type, exc, tb)
+        return False
+
+
+def record_ollama_call(model, pool, seconds, outcome="ok", prompt_tokens=0, eval_tokens=0):
+    OLLAMA_CALL_SECONDS.labels(model, pool, outcome).observe(seconds)
+    if prompt_tokens:
+        OLLAMA_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+        OLLAMA_PROMPT_TOKENS.labels(model).observe(prompt_tokens)
+    if eval_tokens:
+        OLLAMA_TOKENS.labels(model, "eval").inc(eval_tokens)
+
+
+def record_retry(stage, reason):
+    RETRIES.labels(stage, reason).inc()
+
+
+def record_json_parse(outcome):
+    JSON_PARSE.labels(outcome).inc()
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_degradation(name):
+    DEGRADATIONS.labels(name).inc()
+
+
+def record_http_request(method, path, status, seconds):
+    HTTP_REQUEST_SECONDS.labels(method, path, str(status)).observe(seconds)
+
+
+# ===============================
+# SCRAPE-TIME GAUGES
+# ===============================
+class RuntimeStateCollector:
+    """Reads queue depth, slot usage, breaker and endpoint state at scrape time"""
+
+    def describe(self):
+        # Without describe() the registry calls collect() at register time, i.e. at
+        # import: that would import the modules below (circular with single_flight)
+        # and create the SQLite flight store before a pre-fork server forks
+        return []
+
+    def collect(self):
+        from admission_control import get_admission_stats
+        from circuit_breaker import get_breaker_stats
+        from ollama_pool import get_ollama_pool_stats
+        from single_flight import get_single_flight_stats
+        from warmup import get_readiness
+
+        admission = get_admission_stats()
+        requests_gauge = GaugeMetricFamily(
+            "quiz_admission_requests", "Pipelines running / waiting for a slot", labels=["state"]
+        )
+        requests_gauge.add_metric(["active"], admission["active"])
+        requests_gauge.add_metric(["queued"], admission["queued"])
+        yield requests_gauge
+
+        rejected = GaugeMetricFamily("quiz_admission_rejected", "Requests rejected with 429 (since start)")
+        rejected.add_metric([], admission["rejected"])
+        yield rejected
+
+        slots = GaugeMetricFamily(
+            "quiz_resource_slots", "Per-resource slot usage", labels=["resource", "state"]
+        )
+        for name, pool in admission["resources"].items():
+            slots.add_metric([name, "limit"], pool["limit"])
+            slots.add_metric([name, "in_use"], pool["in_use"])
+            slots.add_metric([name, "waiting"], pool["waiting"])
+        yield slots
+
+        breakers = GaugeMetricFamily(
+            "upstream_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+            labels=["upstream"]
+        )
+        error_rate = GaugeMetricFamily(
+            "upstream_error_rate", "Error rate over the breaker's rolling window", labels=["upstream"]
+        )
+        for name, breaker in get_breaker_stats().items():
+            breakers.add_metric([name], breaker["state_code"])
+            error_rate.add_metric([name], breaker["error_rate"])
+        yield breakers
+        yield error_rate
+
+        outstanding = GaugeMetricFamily(
+            "ollama_endpoint_outstanding", "In-flight calls per Ollama endpoint", labels=["pool", "endpoint"]
+        )
+        healthy = GaugeMetricFamily(
+            "ollama_endpoint_healthy", "1 if the endpoint is in rotation", labels=["pool", "endpoint"]
+        )
+        for pool, endpoints in get_ollama_pool_stats().items():
+            for url, endpoint in endpoints.items():
+                outstanding.add_metric([pool, url], endpoint["outstanding"])
+                healthy.add_metric([pool, url], 1 if endpoint["healthy"] else 0)
+        yield outstanding
+        yield healthy
+
+        in_flight = GaugeMetricFamily("quiz_single_flight_in_flight", "Coalesced generations running")
+        in_flight.add_metric([], get_single_flight_stats()["in_flight"])
+        yield in_flight
+
+        ready = GaugeMetricFamily("backend_ready", "1 once the backend is warmed up", labels=["backend"])
+        warmup_seconds = GaugeMetricFamily(
+            "backend_warmup_seconds", "Duration of the successful warm-up", labels=["backend"]
+        )
+        for name, backend in get_readiness()["backends"].items():
+            ready.add_metric([name], 1 if backend["state"] == "ready" else 0)
+            if backend["seconds"] is not None:
+                warmup_seconds.add_metric([name], backend["seconds"])
+        yield ready
+        yield warmup_seconds
+
+
+REGISTRY.register(RuntimeStateCollector())
+
+
+def render_metrics():
+    """
+    Prometheus text exposition of this process (or of every worker in multiprocess mode).
+
+    Returns:
+        (body bytes, content type)
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(RuntimeStateCollector())  # Live state of the scraped worker
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,284 @@
+"""
+Ollama Endpoint Pools
+
+Spreads LLM calls (HTTP transport) over several Ollama servers:
+OLLAMA_ENDPOINTS="http://gpu1:11434=4,http://gpu2:11434=2"   (URL=slots)
+→ Separate pools per call type (OLLAMA_MCQ_ENDPOINTS / OLLAMA_ENRICHMENT_ENDPOINTS,
+  both default to OLLAMA_ENDPOINTS, which defaults to OLLAMA_HOST)
+→ Routing per call
+   ├─ Only healthy endpoints with a free slot
+   ├─ Model affinity: endpoints that already have the model loaded first (no cold load)
+   └─ Least outstanding requests (relative to the endpoint's slots)
+→ Health checking
+   ├─ Background probe of GET /api/ps (liveness + loaded models) every HEALTH_CHECK_INTERVAL
+   ├─ EJECT_AFTER_FAILURES consecutive probe/connection failures → ejected
+   └─ Ejected endpoints rejoin after a successful probe
+→ Per-endpoint circuit breaker: endpoints with an open breaker are skipped
+→ Connection failures fail over to the next endpoint within the same call
+"""
+
+import os
+import logging
+import time
+import threading
+from contextlib import contextmanager
+
+from admission_control import RESOURCE_LIMITS
+from cancellation import current_token
+from circuit_breaker import CircuitOpen, get_breaker
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# POOL CONFIG
+# ===============================
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+
+# Comma-separated "URL" or "URL=slots" (slots default: MAX_CONCURRENT_OLLAMA)
+OLLAMA_ENDPOINTS = os.environ.get("OLLAMA_ENDPOINTS", "")
+POOL_ENDPOINTS = {
+    "mcq": os.environ.get("OLLAMA_MCQ_ENDPOINTS", ""),
+    "enrichment": os.environ.get("OLLAMA_ENRICHMENT_ENDPOINTS", ""),
+}
+
+HEALTH_CHECK_INTERVAL = float(os.environ.get("OLLAMA_HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_CHECK_TIMEOUT = 3.0
+EJECT_AFTER_FAILURES = int(os.environ.get("OLLAMA_EJECT_AFTER_FAILURES", "3"))
+POLL_INTERVAL = 0.25  # Seconds between cancellation checks while every slot is busy
+
+
+def _normalize_url(url):
+    url = url.strip().rstrip("/")
+    return url if url.startswith("http") else "http://" + url
+
+
+def _model_key(model):
+    """Ollama reports "llama3:latest" for a model requested as "llama3" """
+    return model if ":" in model else model + ":latest"
+
+
+def parse_endpoints(spec, default_slots):
+    """
+    Parse "URL[=slots],..." into (url, slots) pairs.
+
+    Raises:
+        ValueError: Malformed slot count
+    """
+    endpoints = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        url, _, slots = item.rpartition("=") if "=" in item else (item, "", "")
+        try:
+            slots = int(slots) if slots else default_slots
+        except ValueError:
+            raise ValueError(f"Invalid slot count in Ollama endpoint {item!r}")
+        endpoints.append((_normalize_url(url), max(1, slots)))
+    return endpoints
+
+
+class Endpoint:
+    """One Ollama server: slots, outstanding calls, health and loaded models"""
+
+    def __init__(self, url, slots):
+        self.url = url
+        self.slots = slots
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected = False
+        self.loaded_models = set()
+        self.requests = 0
+        self.last_error = None
+        self.breaker = get_breaker(f"ollama:{url}")
+
+    def healthy(self):
+        return not self.ejected and self.breaker.available()
+
+    def available(self):
+        return self.healthy() and self.outstanding < self.slots
+
+    def snapshot(self):
+        return {
+            "slots": self.slots,
+            "outstanding": self.outstanding,
+            "healthy": not self.ejected,
+            "breaker": self.breaker.state,
+            "failures": self.failures,
+            "loaded_models": sorted(self.loaded_models),
+            "requests": self.requests,
+            "last_error": self.last_error,
+        }
+
+
+# ===============================
+# ENDPOINT REGISTRY + HEALTH CHECKS
+# ===============================
+class EndpointRegistry:
+    """
+    Endpoints shared by all pools, so a server listed in both the MCQ and the
+    enrichment pool has one slot count (its first listing wins) and one health state.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.endpoints = {}
+        self._checker = None
+
+    def get(self, url, slots):
+        with self.condition:
+            endpoint = self.endpoints.get(url)
+            if endpoint is None:
+                endpoint = self.endpoints[url] = Endpoint(url, slots)
+            return endpoint
+
+    def record_success(self, endpoint, model=None, loaded_models=None):
+        with self.condition:
+            if endpoint.ejected:
+                logger.info(f"✓ Ollama endpoint {endpoint.url} healthy again")
+            endpoint.failures = 0
+            endpoint.ejected = False
+            if loaded_models is not None:
+                endpoint.loaded_models = set(loaded_models)
+            if model:
+                endpoint.loaded_models.add(_model_key(model))
+            self.condition.notify_all()
+
+    def record_failure(self, endpoint, error):
+        with self.condition:
+            endpoint.failures += 1
+            endpoint.last_error = str(error)[:200]
+            if not endpoint.ejected and endpoint.failures >= EJECT_AFTER_FAILURES:
+                endpoint.ejected = True
+                endpoint.loaded_models.clear()
+                logger.warning(f"⚠ Ollama endpoint {endpoint.url} ejected after {endpoint.failures} failures")
+            self.condition.notify_all()
+
+    def probe(self, endpoint):
+        """GET /api/ps: liveness plus the models currently loaded on the server"""
+        import requests
+        try:
+            response = requests.get(f"{endpoint.url}/api/ps", timeout=HEALTH_CHECK_TIMEOUT)
+            response.raise_for_status()
+            models = [m.get("model") or m.get("name", "") for m in response.json().get("models", [])]
+        except (requests.RequestException, ValueError) as e:
+            self.record_failure(endpoint, e)
+            return False
+        self.record_success(endpoint, loaded_models=[_model_key(m) for m in models if m])
+        return True
+
+    def _check_loop(self):
+        while True:
+            with self.condition:
+                endpoints = list(self.endpoints.values())
+            for endpoint in endpoints:
+                self.probe(endpoint)
+            time.sleep(HEALTH_CHECK_INTERVAL)
+
+    def start_health_checks(self):
+        with self.condition:
+            if self._checker is not None:
+                return
+            self._checker = threading.Thread(target=self._check_loop, name="ollama-health", daemon=True)
+        self._checker.start()
+
+
+registry = EndpointRegistry()
+
+
+# ===============================
+# POOLS
+# ===============================
+class OllamaPool:
+    """Routes calls for one purpose (MCQ / enrichment) over its endpoints"""
+
+    def __init__(self, name, endpoints, registry=registry):
+        if not endpoints:
+            raise ValueError(f"Ollama pool '{name}' has no endpoints")
+        self.name = name
+        self.registry = registry
+        self.endpoints = [registry.get(url, slots) for url, slots in endpoints]
+
+    def _pick(self, model, exclude):
+        key = _model_key(model)
+        candidates = [e for e in self.endpoints if e.available() and e.url not in exclude]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda e: (key not in e.loaded_models, e.outstanding / e.slots, e.outstanding))
+
+    @contextmanager
+    def lease(self, model, exclude=()):
+        """
+        Hold a slot on the best endpoint for model until the block exits.
+
+        Raises:
+            RuntimeError: Every endpoint of the pool is ejected (or excluded)
+            CircuitOpen: Every remaining endpoint's breaker is open
+            OperationCancelled: The current request was cancelled while waiting
+        """
+        token = current_token()
+        condition = self.registry.condition
+        with condition:
+            while True:
+                endpoint = self._pick(model, exclude)
+                if endpoint is not None:
+                    break
+                remaining = [e for e in self.endpoints if not e.ejected and e.url not in exclude]
+                if not remaining:
+                    raise RuntimeError(
+                        f"No healthy Ollama endpoint in pool '{self.name}': "
+                        f"{', '.join(e.url for e in self.endpoints)}"
+                    )
+                if not any(e.healthy() for e in remaining):
+                    raise CircuitOpen(
+                        f"ollama pool '{self.name}'", min(e.breaker.retry_in() for e in remaining)
+                    )
+                condition.wait(POLL_INTERVAL)
+                if token is not None:
+                    token.raise_if_cancelled()
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        try:
+            yield endpoint
+        finally:
+            with condition:
+                endpoint.outstanding -= 1
+                condition.notify_all()
+
+    def report_success(self, endpoint, model):
+        self.registry.record_success(endpoint, model=model)
+
+    def report_failure(self, endpoint, error):
+        self.registry.record_failure(endpoint, error)
+
+    def snapshot(self):
+        with self.registry.condition:
+            return {e.url: e.snapshot() for e in self.endpoints}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_ollama_pool(purpose="mcq"):
+    """
+    Endpoint pool for a call type ("mcq" or "enrichment"), built on first use.
+
+    Raises:
+        ValueError: Unknown purpose or malformed endpoint list
+    """
+    if purpose not in POOL_ENDPOINTS:
+        raise ValueError(f"Unknown Ollama pool: {purpose}. Available: {', '.join(POOL_ENDPOINTS)}")
+    with _pools_lock:
+        pool = _pools.get(purpose)
+        if pool is None:
+            spec = POOL_ENDPOINTS[purpose] or OLLAMA_ENDPOINTS or OLLAMA_HOST
+            pool = _pools[purpose] = OllamaPool(purpose, parse_endpoints(spec, RESOURCE_LIMITS["ollama"]))
+            registry.start_health_checks()
+        return pool
+
+
+def get_ollama_pool_stats():
+    """Per-pool endpoint load, health and loaded models on this process"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: pool.snapshot() for name, pool in pools.items()}
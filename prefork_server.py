@@ -0,0 +1,202 @@
+"""
+Pre-Fork Multi-Worker Server
+
+`uvicorn --workers N` spawns fresh interpreters: every worker imports the app and loads
+its own copy of the Whisper weights (N × model RSS). Here one parent does that once:
+Parent process
+→ imports app.main, loads the Whisper weights (warmup.warmup_whisper_models) and the
+  OLLAMA_TOKENIZER tokenizer
+→ gc.freeze(): preloaded objects leave the collector's generations, so collections in
+  the workers don't write to their headers (a write copies the whole page)
+→ binds the listening socket, fork()s WORKERS children
+   └─ each child serves the inherited socket with uvicorn; its warm-up (warmup.py) finds
+      the weights already loaded → pages shared copy-on-write (inference only reads them)
+→ supervises: a worker that dies is re-forked; SIGTERM / SIGINT stops every worker
+Per-process outputs are split before app.main is imported: each worker writes its own
+trace file (TRACE_FILE with {pid}) and, unless PROMETHEUS_MULTIPROC_DIR is set, metrics
+go to a fresh multiprocess directory so /metrics aggregates every worker.
+Caches shared by the workers live on disk (SQLite, WAL): transcripts (transcript_cache.py),
+quiz results (single_flight.py), the course question bank (question_bank.py).
+Linux / macOS only (fork). Measure with benchmarks/memory_benchmark.py.
+
+Usage:
+    python prefork_server.py --workers 4 --port 8000
+    WORKERS=4 PORT=8000 python prefork_server.py
+"""
+
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# PRE-FORK CONFIG
+# ===============================
+WORKERS = int(os.environ.get("WORKERS", "2"))
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "8000"))
+RESPAWN_DELAY = 1.0     # Seconds before re-forking a worker that died right after start
+MIN_WORKER_LIFE = 5.0   # A worker dying sooner than this counts as a crash loop
+STOP_TIMEOUT = 30.0     # Seconds workers get to finish in-flight requests on shutdown
+
+
+def preload_models():
+    """Load what every worker needs read-only (Whisper weights, tokenizer) in the parent"""
+    import youtube_quiz_generator as pipeline
+    from warmup import warmup_whisper_models
+    from token_budget import count_tokens
+
+    # With an ASR service (ASR_SERVICE) the weights live in its worker processes
+    models = [] if pipeline.ASR_SERVICE else warmup_whisper_models()
+    if models:
+        try:
+            import torch
+            from cpu_partition import configure_torch_threads
+            configure_torch_threads()
+            threads = torch.get_num_threads()
+            # No OpenMP thread pool in the parent: a child forked after one exists can
+            # hang in its first parallel op
+            torch.set_num_threads(1)
+        except ImportError:
+            torch = None
+        try:
+            for model in models:
+                started = time.monotonic()
+                pipeline.load_whisper_model(model)
+                logger.info(f"📦 Whisper '{model}' preloaded for all workers in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            logger.warning(f"⚠ Whisper preload failed, workers load their own copy: {e}")
+        finally:
+            if torch is not None:
+                torch.set_num_threads(threads)
+    count_tokens("preload")  # Loads OLLAMA_TOKENIZER, if configured
+
+
+def configure_worker_environment(workers):
+    """Give each worker its own trace file and a shared metrics directory (before app.main is imported)"""
+    if workers < 2:
+        return
+    trace_file = os.environ.get("TRACE_FILE")
+    if trace_file is None:
+        os.environ["TRACE_FILE"] = os.path.join(tempfile.gettempdir(), "quiz_traces.{pid}.jsonl")
+    elif "{pid}" not in trace_file:
+        # One RotatingFileHandler per process on a single file interleaves and loses rotations
+        sys.exit(f"TRACE_FILE={trace_file} would be shared by {workers} workers: "
+                 "add {pid} to the path (e.g. /var/log/quiz/traces.{pid}.jsonl)")
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="quiz_metrics_")
+        logger.info(f"📈 Worker metrics aggregated in {os.environ['PROMETHEUS_MULTIPROC_DIR']}")
+
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, log_level):
+    """Child process: serve the inherited socket until SIGTERM / SIGINT"""
+    import uvicorn
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level, timeout_graceful_shutdown=STOP_TIMEOUT))
+    server.run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks the workers and keeps WORKERS of them alive"""
+
+    def __init__(self, app, sock, workers, log_level):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.log_level = log_level
+        self.children = {}   # pid → fork time
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.log_level)
+            except BaseException:
+                logger.exception("❌ Worker crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        logger.info(f"👷 Worker {pid} started")
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"🛑 Stopping {len(self.children)} worker(s)")
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self, pid):
+        self.children.pop(pid, None)
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(pid)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.get(pid)
+            self._reap(pid)
+            if self.stopping:
+                continue
+            logger.warning(f"⚠ Worker {pid} exited ({os.waitstatus_to_exitcode(status)}), restarting")
+            if started is not None and time.monotonic() - started < MIN_WORKER_LIFE:
+                time.sleep(RESPAWN_DELAY)
+            if not self.stopping:
+                self.spawn()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve app.main with pre-forked workers sharing loaded models")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "info").lower())
+    args = parser.parse_args(argv)
+    if not hasattr(os, "fork"):
+        sys.exit("prefork_server needs fork() (Linux / macOS); use `uvicorn --workers N` instead")
+
+    configure_worker_environment(args.workers)
+    from app.main import app
+    preload_models()
+    sock = bind_socket(args.host, args.port)
+    # Everything allocated so far is shared with the workers: keep the collector off it
+    gc.collect()
+    gc.freeze()
+    logger.info(f"🚀 Serving on http://{args.host}:{args.port} with {args.workers} pre-forked worker(s)")
+    Supervisor(app, sock, max(1, args.workers), args.log_level).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
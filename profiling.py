@@ -0,0 +1,270 @@
+"""
+On-Demand Request Profiling
+
+Profiles ONE request in production, opt-in per request:
+Admin sends X-Profile: <PROFILE_ADMIN_TOKEN> (or ?profile=<token>)
+→ Profile session bound to the request (contextvar, follows it into worker / flight threads)
+→ Per pipeline stage (metrics.stage_timer hooks)
+   ├─ Sampling CPU profile: a sampler thread walks the stacks of the threads running
+   │  a stage every PROFILE_SAMPLE_INTERVAL (folded stacks, flamegraph / speedscope ready)
+   └─ tracemalloc snapshot before / after: net allocation, peak, top allocation sites
+→ Written to PROFILE_DIR/<time>_<trace id>/ (summary.json, cpu.folded, memory.json)
+→ GET /admin/profiles lists them, GET /admin/profiles/<name>/<file> downloads
+Without a session the stage hooks cost one contextvar lookup; nothing else runs.
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import logging
+import tempfile
+import threading
+import tracemalloc
+import contextvars
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# PROFILING CONFIG
+# ===============================
+# Empty = on-demand profiling disabled (and /admin/profiles refuses every request)
+PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "quiz_profiles"))
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.005"))  # Seconds
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "50"))  # Oldest profiles deleted beyond this
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 15
+MAX_STACK_DEPTH = 64
+
+PROFILE_FILES = ("summary.json", "cpu.folded", "memory.json")
+
+
+def is_authorized(token):
+    """Does token match PROFILE_ADMIN_TOKEN (always False while profiling is disabled)?"""
+    if not PROFILE_ADMIN_TOKEN or not token:
+        return False
+    # Compare bytes: compare_digest rejects non-ASCII str with TypeError (a 500 instead of a 403)
+    return hmac.compare_digest(token.encode("utf-8"), PROFILE_ADMIN_TOKEN.encode("utf-8"))
+
+
+# ===============================
+# TRACEMALLOC (shared by concurrent sessions)
+# ===============================
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+
+# ===============================
+# PROFILE SESSION
+# ===============================
+class ProfileSession:
+    """CPU samples and memory snapshots of one request"""
+
+    def __init__(self, label, trace_id=None):
+        self.label = label
+        self.trace_id = trace_id
+        self.started = time.time()
+        self.samples = Counter()        # folded stack → sample count
+        self.stage_samples = Counter()  # stage → sample count
+        self.memory = []                # one record per finished stage run
+        self._stacks = {}               # thread ident → [(stage, snapshot, started)]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        _acquire_tracemalloc()
+        self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def _snapshot(self):
+        # A flight thread can outlive its request: no-op once the session has finished
+        if self._stop.is_set():
+            return None
+        try:
+            return tracemalloc.take_snapshot()
+        except RuntimeError:
+            return None  # tracemalloc stopped meanwhile
+
+    # Stage hooks (called from metrics.stage_timer on the thread running the stage)
+    def enter_stage(self, stage):
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return
+        with self._lock:
+            self._stacks.setdefault(threading.get_ident(), []).append((stage, snapshot, time.monotonic()))
+
+    def exit_stage(self, stage):
+        after = self._snapshot()
+        if after is None:
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            stack = self._stacks.get(threading.get_ident())
+            if not stack:
+                return
+            _, before, started = stack.pop()
+            path = "/".join(s for s, _, _ in stack + [(stage, None, None)])
+            if not stack:
+                del self._stacks[threading.get_ident()]
+        diff = after.compare_to(before, "lineno")
+        self.memory.append({
+            "stage": path,
+            "seconds": round(time.monotonic() - started, 3),
+            "net_bytes": sum(d.size_diff for d in diff),
+            "process_peak_bytes": peak,
+            "top_allocations": [
+                {"where": str(d.traceback), "size_diff": d.size_diff, "count_diff": d.count_diff}
+                for d in diff[:TOP_ALLOCATIONS] if d.size_diff > 0
+            ],
+        })
+
+    def _sample_loop(self):
+        while not self._stop.wait(PROFILE_SAMPLE_INTERVAL):
+            with self._lock:
+                active = {ident: "/".join(s for s, _, _ in stack) for ident, stack in self._stacks.items()}
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, stage in active.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                calls = []
+                while frame is not None and len(calls) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join([stage] + calls[::-1])] += 1
+                self.stage_samples[stage] += 1
+
+    def finish(self, status_code=None):
+        """
+        Stop sampling and write the profile directory.
+
+        Returns:
+            Name of the profile (directory under PROFILE_DIR)
+        """
+        self._stop.set()
+        self._sampler.join()
+        _release_tracemalloc()
+
+        name = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started)) + "_" + (
+            self.trace_id or os.urandom(8).hex()
+        )
+        directory = os.path.join(PROFILE_DIR, name)
+        os.makedirs(directory, exist_ok=True)
+        memory_per_stage = Counter()
+        for record in self.memory:
+            memory_per_stage[record["stage"]] += record["net_bytes"]
+        summary = {
+            "request": self.label,
+            "trace_id": self.trace_id,
+            "status_code": status_code,
+            "started": self.started,
+            "seconds": round(time.time() - self.started, 3),
+            "sample_interval": PROFILE_SAMPLE_INTERVAL,
+            "samples_per_stage": dict(self.stage_samples.most_common()),
+            "memory_per_stage": dict(memory_per_stage),
+        }
+        with open(os.path.join(directory, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        with open(os.path.join(directory, "cpu.folded"), "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(directory, "memory.json"), "w", encoding="utf-8") as f:
+            json.dump(self.memory, f, indent=2)
+        _prune_profiles()
+        logger.info(f"🔬 Profile written: {directory} ({sum(self.stage_samples.values())} samples)")
+        return name
+
+
+_current_session = contextvars.ContextVar("profile_session", default=None)
+
+
+def current_session():
+    return _current_session.get()
+
+
+def start_session(label, trace_id=None):
+    """
+    Profile everything the current context (and contexts copied from it) runs.
+
+    Returns:
+        (session, reset token for end_session)
+    """
+    session = ProfileSession(label, trace_id).start()
+    return session, _current_session.set(session)
+
+
+def end_session(reset):
+    """Unbind the session from the current context (then call session.finish)"""
+    _current_session.reset(reset)
+
+
+# ===============================
+# PROFILE LISTING
+# ===============================
+def _prune_profiles():
+    names = sorted(os.listdir(PROFILE_DIR))
+    for name in names[:max(0, len(names) - PROFILE_KEEP)]:
+        directory = os.path.join(PROFILE_DIR, name)
+        for file in PROFILE_FILES:
+            try:
+                os.remove(os.path.join(directory, file))
+            except OSError:
+                pass
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+
+def list_profiles():
+    """Summaries of the stored profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        try:
+            with open(os.path.join(PROFILE_DIR, name, "summary.json"), encoding="utf-8") as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles.append({"name": name, **summary, "files": list(PROFILE_FILES)})
+    return profiles
+
+
+def profile_file_path(name, file):
+    """
+    Path of one stored profile file.
+
+    Raises:
+        FileNotFoundError: Unknown profile or file
+    """
+    if file not in PROFILE_FILES or os.path.basename(name) != name or name.startswith("."):
+        raise FileNotFoundError(f"{name}/{file}")
+    path = os.path.join(PROFILE_DIR, name, file)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"{name}/{file}")
+    return path
@@ -0,0 +1,279 @@
+"""
+Course Question Bank (SQLite + FTS5)
+
+Persistent store for generated MCQs so a course quiz is built once and reused:
+Course video URLs
+→ Canonical video ID (YouTube ID / URL without query string)
+→ Bank lookup (already covered videos are served from SQLite, no LLM call)
+→ Ollama generation ONLY for uncovered videos
+→ Cross-video dedup on insert
+   ├─ Exact: UNIQUE (course_id, question_key) index on normalized text
+   └─ Near-duplicate: FTS5 candidate lookup + token overlap check
+→ Questions stored with source video, timestamp and model metadata
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+
+from youtube_quiz_generator import normalize_question_text
+
+# ===============================
+# QUESTION BANK CONFIG
+# ===============================
+QUESTION_BANK_PATH = os.environ.get(
+    "QUESTION_BANK_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "question_bank.db")
+)
+
+# Two questions whose word sets overlap at least this much (Jaccard) are duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Number of FTS candidates checked for near-duplicates per inserted question
+NEAR_DUPLICATE_CANDIDATES = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    course_id TEXT NOT NULL DEFAULT '',
+    video_id TEXT NOT NULL,
+    video_url TEXT NOT NULL,
+    model TEXT,
+    question_count INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (course_id, video_id)
+);
+
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    course_id TEXT NOT NULL DEFAULT '',
+    video_id TEXT NOT NULL,
+    question_key TEXT NOT NULL,
+    question TEXT NOT NULL,
+    options TEXT NOT NULL,
+    correct_answer TEXT NOT NULL,
+    explanation TEXT,
+    source_timestamp REAL,
+    model TEXT,
+    created_at REAL NOT NULL,
+    UNIQUE (course_id, question_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_questions_video ON questions (course_id, video_id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    question, explanation, content='questions', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS questions_ai AFTER INSERT ON questions BEGIN
+    INSERT INTO questions_fts (rowid, question, explanation)
+    VALUES (new.id, new.question, new.explanation);
+END;
+
+CREATE TRIGGER IF NOT EXISTS questions_ad AFTER DELETE ON questions BEGIN
+    INSERT INTO questions_fts (questions_fts, rowid, question, explanation)
+    VALUES ('delete', old.id, old.question, old.explanation);
+END;
+"""
+
+_FTS_TOKEN_RE = re.compile(r"\w+")
+
+
+def _fts_query(text):
+    """Build an FTS5 OR-query from the words of a question (quoted, injection-safe)"""
+    words = sorted({w for w in _FTS_TOKEN_RE.findall(text.lower()) if len(w) > 2})
+    return " OR ".join(f'"{w}"' for w in words)
+
+
+def _jaccard(a, b):
+    set_a, set_b = set(a.split()), set(b.split())
+    if not set_a or not set_b:
+        return 0.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+
+class QuestionBank:
+    """
+    SQLite-backed question bank shared by all course quiz requests.
+
+    A new connection is opened per operation so the bank can be used from the
+    FastAPI thread pool without sharing connections across threads.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or QUESTION_BANK_PATH
+        self.has_fts = True
+        self._write_lock = threading.Lock()
+        self._init_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_schema(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(FTS_SCHEMA)
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: exact dedup still works via the UNIQUE index
+                self.has_fts = False
+
+    # -------------------------------
+    # Lookup
+    # -------------------------------
+    def has_video(self, course_id, video_id):
+        """True if questions for this video were already generated for the course"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM videos WHERE course_id = ? AND video_id = ?",
+                (course_id or "", video_id)
+            ).fetchone()
+        return row is not None
+
+    def get_video_questions(self, course_id, video_id):
+        """Return banked MCQs for a video in insertion order"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT question, options, correct_answer, explanation FROM questions "
+                "WHERE course_id = ? AND video_id = ? ORDER BY id",
+                (course_id or "", video_id)
+            ).fetchall()
+        return [
+            {
+                "question": row["question"],
+                "options": json.loads(row["options"]),
+                "correct_answer": row["correct_answer"],
+                "explanation": row["explanation"] or "No explanation provided",
+            }
+            for row in rows
+        ]
+
+    def search(self, query, course_id=None, limit=20):
+        """Full-text search over banked questions (best matches first)"""
+        if not self.has_fts:
+            return []
+        match = _fts_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT q.course_id, q.video_id, q.question, q.options, q.correct_answer, "
+            "q.explanation, q.source_timestamp, q.model FROM questions_fts "
+            "JOIN questions q ON q.id = questions_fts.rowid "
+            "WHERE questions_fts MATCH ?"
+        )
+        params = [match]
+        if course_id is not None:
+            sql += " AND q.course_id = ?"
+            params.append(course_id)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [
+            {
+                "course_id": row["course_id"],
+                "video_id": row["video_id"],
+                "question": row["question"],
+                "options": json.loads(row["options"]),
+                "correct_answer": row["correct_answer"],
+                "explanation": row["explanation"],
+                "source_timestamp": row["source_timestamp"],
+                "model": row["model"],
+            }
+            for row in rows
+        ]
+
+    # -------------------------------
+    # Insert with cross-video dedup
+    # -------------------------------
+    def _is_near_duplicate(self, conn, course_id, question_text, question_key):
+        if not self.has_fts:
+            return False
+        match = _fts_query(question_text)
+        if not match:
+            return False
+        rows = conn.execute(
+            "SELECT q.question_key FROM questions_fts "
+            "JOIN questions q ON q.id = questions_fts.rowid "
+            "WHERE questions_fts MATCH ? AND q.course_id = ? ORDER BY rank LIMIT ?",
+            (match, course_id, NEAR_DUPLICATE_CANDIDATES)
+        ).fetchall()
+        return any(
+            _jaccard(question_key, row["question_key"]) >= NEAR_DUPLICATE_THRESHOLD
+            for row in rows
+        )
+
+    def add_questions(self, course_id, video_id, video_url, questions,
+                      model=None, source_timestamp=None):
+        """
+        Bank questions generated for one video.
+
+        Questions that duplicate (exactly or nearly) a question already banked
+        for ANY video of the same course are dropped.
+
+        Args:
+            course_id: Course identifier ("" for ad-hoc batches)
+            video_id: Canonical video ID (see canonical_video_id)
+            video_url: Original video URL
+            questions: List of MCQ dicts
+            model: Ollama model that generated the questions
+            source_timestamp: Optional offset (seconds) into the source video
+
+        Returns:
+            List of the MCQ dicts that were actually stored
+        """
+        course_id = course_id or ""
+        stored = []
+        now = time.time()
+
+        with self._write_lock, self._connect() as conn:
+            for q in questions:
+                question_text = (q.get("question") or "").strip()
+                question_key = normalize_question_text(question_text)
+                if not question_key:
+                    continue
+                if self._is_near_duplicate(conn, course_id, question_text, question_key):
+                    continue
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO questions (course_id, video_id, question_key, question, "
+                    "options, correct_answer, explanation, source_timestamp, model, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        course_id, video_id, question_key, question_text,
+                        json.dumps(q.get("options", {}), ensure_ascii=False),
+                        q.get("correct_answer", "A"), q.get("explanation"),
+                        source_timestamp, model, now,
+                    )
+                )
+                if cursor.rowcount:
+                    stored.append(q)
+
+            conn.execute(
+                "INSERT INTO videos (course_id, video_id, video_url, model, question_count, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (course_id, video_id) DO UPDATE SET "
+                "question_count = question_count + excluded.question_count, model = excluded.model",
+                (course_id, video_id, video_url, model, len(stored), now)
+            )
+
+        return stored
+
+
+_default_bank = None
+_default_bank_lock = threading.Lock()
+
+
+def get_question_bank():
+    """Process-wide QuestionBank at QUESTION_BANK_PATH (created on first use)"""
+    global _default_bank
+    with _default_bank_lock:
+        if _default_bank is None:
+            _default_bank = QuestionBank()
+        return _default_bank
@@ -0,0 +1,312 @@
+"""
+Single-Flight Request Coalescing
+
+Identical concurrent quiz requests (same video + same pipeline profile) share ONE run:
+Request key (canonical video ID + pipeline config fingerprint)
+→ In-process flight table
+   ├─ First request starts the pipeline in a flight thread (leader)
+   └─ Later requests attach and wait for the same result (followers)
+→ Cross-process flight table (SQLite, one file per host, WAL)
+   ├─ One worker process claims the key (row insert), others poll for its result
+   ├─ Leader heartbeats; a stale claim (crashed worker) is taken over
+   └─ Results kept RESULT_TTL seconds so requests arriving just after completion reuse them
+→ A flight is cancelled only when EVERY attached request was cancelled
+"""
+
+import os
+import logging
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+import contextvars
+
+from cancellation import CancellationToken
+from metrics import record_cache
+from tracing import current_trace_id, set_attributes
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# SINGLE-FLIGHT CONFIG
+# ===============================
+# Coalesce across uvicorn workers on this host (SQLite file shared by all workers)
+SINGLE_FLIGHT_CROSS_PROCESS = os.environ.get("SINGLE_FLIGHT_CROSS_PROCESS", "true").lower() == "true"
+SINGLE_FLIGHT_DB = os.environ.get(
+    "SINGLE_FLIGHT_DB", os.path.join(tempfile.gettempdir(), "quiz_single_flight.db")
+)
+
+POLL_INTERVAL = 0.5       # Seconds between result checks of a waiting request
+HEARTBEAT_SECONDS = 5.0   # Leader refreshes its claim this often
+STALE_SECONDS = 30.0      # Claim without heartbeat for this long = leader died
+RESULT_TTL = float(os.environ.get("SINGLE_FLIGHT_RESULT_TTL", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flights (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    heartbeat REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS flight_results (
+    key TEXT PRIMARY KEY,
+    result TEXT,
+    error TEXT,
+    error_type TEXT,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"leaders": 0, "followers": 0, "cross_process_followers": 0, "takeovers": 0}
+
+    def record(self, event):
+        with self._lock:
+            self.counts[event] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+_stats = _Stats()
+
+
+# ===============================
+# CROSS-PROCESS (SQLITE)
+# ===============================
+class SQLiteFlightStore:
+    """Claims and results shared by all worker processes on one host"""
+
+    def __init__(self, path=None):
+        self.path = path or SINGLE_FLIGHT_DB
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @property
+    def owner(self):
+        """Claim owner, read at use: a store inherited through fork() gets the child's pid"""
+        return f"{os.getpid()}:{id(self)}"
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _fresh_result(self, conn, key):
+        return conn.execute(
+            "SELECT result, error, error_type FROM flight_results WHERE key = ? AND finished_at >= ?",
+            (key, time.time() - RESULT_TTL)
+        ).fetchone()
+
+    def _try_claim(self, conn, key):
+        now = time.time()
+        # Drop a claim whose leader stopped heartbeating (worker crashed or was killed)
+        stale = conn.execute(
+            "DELETE FROM flights WHERE key = ? AND heartbeat < ?", (key, now - STALE_SECONDS)
+        ).rowcount
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO flights (key, owner, heartbeat) VALUES (?, ?, ?)",
+            (key, self.owner, now)
+        )
+        if cursor.rowcount and stale:
+            _stats.record("takeovers")
+        return cursor.rowcount == 1
+
+    def _heartbeat(self, key, stop):
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "UPDATE flights SET heartbeat = ? WHERE key = ? AND owner = ?",
+                        (time.time(), key, self.owner)
+                    )
+            except sqlite3.Error:
+                pass
+
+    def _finish(self, key, result=None, error=None):
+        with self._connect() as conn:
+            now = time.time()
+            if error is None or isinstance(error, ValueError):
+                # Only results and invalid-input errors are shared; after a cancelled,
+                # rejected (429) or failed run a waiting process takes the key over
+                conn.execute(
+                    "INSERT OR REPLACE INTO flight_results (key, result, error, error_type, finished_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        json.dumps(result) if error is None else None,
+                        str(error) if error is not None else None,
+                        type(error).__name__ if error is not None else None,
+                        now,
+                    )
+                )
+            conn.execute("DELETE FROM flights WHERE key = ? AND owner = ?", (key, self.owner))
+            conn.execute("DELETE FROM flight_results WHERE finished_at < ?", (now - RESULT_TTL,))
+
+    @staticmethod
+    def _raise_stored(row):
+        raise ValueError(row["error"])
+
+    def run(self, key, fn, token):
+        """Return the result for key: from another worker's run, or by running fn here"""
+        followed = False
+        while True:
+            token.raise_if_cancelled()
+            with self._connect() as conn:
+                row = self._fresh_result(conn, key)
+                if row is not None:
+                    record_cache("single_flight_results", True)
+                    if row["error"] is not None:
+                        self._raise_stored(row)
+                    return json.loads(row["result"])
+                claimed = self._try_claim(conn, key)
+            if claimed:
+                break
+            if not followed:
+                followed = True
+                _stats.record("cross_process_followers")
+            time.sleep(POLL_INTERVAL)
+
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(key, stop), daemon=True).start()
+        try:
+            result = fn()
+        except BaseException as e:
+            stop.set()
+            self._finish(key, error=e)
+            raise
+        stop.set()
+        self._finish(key, result=result)
+        return result
+
+
+# ===============================
+# IN-PROCESS
+# ===============================
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.token = CancellationToken()  # Cancelled when every attached request is gone
+        self.attached = 0
+        self.result = None
+        self.error = None
+        self.trace_id = current_trace_id()  # Leader's trace, where the work shows up
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    Every participant (including the first) waits on the flight with its own
+    cancellation token, so one client disconnecting never aborts the work the
+    others are waiting for.
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def _run(self, key, flight, fn):
+        try:
+            if self.store is not None:
+                flight.result = self.store.run(key, lambda: fn(flight.token), flight.token)
+            else:
+                flight.result = fn(flight.token)
+        except BaseException as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    self._flights.pop(key)
+            flight.done.set()
+
+    def _detach(self, key, flight):
+        with self._lock:
+            flight.attached -= 1
+            abandoned = flight.attached == 0 and not flight.done.is_set()
+            if abandoned and self._flights.get(key) is flight:
+                # Unpublish before cancelling so that no new caller joins a dying flight
+                self._flights.pop(key)
+        if abandoned:
+            flight.token.cancel("all requests cancelled")
+
+    def do(self, key, fn, cancel_token=None):
+        """
+        Run fn(flight_token) once per key among concurrent callers and return its result.
+
+        Args:
+            key: Coalescing key (e.g. canonical video ID + pipeline fingerprint)
+            fn: Callable taking the flight's CancellationToken
+            cancel_token: The caller's token; cancelling it detaches this caller only
+
+        Raises:
+            OperationCancelled: This caller was cancelled while waiting
+            Exception: Whatever fn raised (shared by all callers)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            # An abandoned flight is being torn down; its result will never arrive
+            leader = flight is None or flight.token.cancelled
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+            flight.attached += 1
+        _stats.record("leaders" if leader else "followers")
+        record_cache("single_flight", not leader)
+        if leader:
+            # Copied context: the flight's spans nest under the leader's trace
+            threading.Thread(
+                target=contextvars.copy_context().run, args=(self._run, key, flight, fn),
+                name="single-flight", daemon=True
+            ).start()
+        else:
+            logger.info(f"🔗 Joining in-flight quiz generation for {key}")
+            set_attributes(coalesced_into_trace=flight.trace_id)
+
+        while not flight.done.wait(POLL_INTERVAL):
+            if cancel_token is not None and cancel_token.cancelled:
+                self._detach(key, flight)
+                cancel_token.raise_if_cancelled()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+
+def _default_store():
+    if not SINGLE_FLIGHT_CROSS_PROCESS:
+        return None
+    try:
+        return SQLiteFlightStore()
+    except sqlite3.Error as e:
+        logger.warning(f"⚠ Cross-process single-flight unavailable ({e}), coalescing in-process only")
+        return None
+
+
+_quiz_flights = None
+_quiz_flights_lock = threading.Lock()
+
+
+def get_quiz_flights():
+    """Process-wide SingleFlight for quiz generation (cross-process store if enabled)"""
+    global _quiz_flights
+    with _quiz_flights_lock:
+        if _quiz_flights is None:
+            _quiz_flights = SingleFlight(_default_store())
+        return _quiz_flights
+
+
+def get_single_flight_stats():
+    """Coalescing counters for this worker process"""
+    return dict(_stats.snapshot(), in_flight=get_quiz_flights().in_flight())
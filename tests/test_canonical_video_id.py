@@ -0,0 +1,24 @@
+"""canonical_video_id keys the question bank, single-flight and transcript cache"""
+
+from youtube_quiz_generator import canonical_video_id
+
+
+def test_query_selecting_the_file_is_kept():
+    first = canonical_video_id("https://drive.google.com/uc?id=AAA&export=download")
+    second = canonical_video_id("https://drive.google.com/uc?id=BBB&export=download")
+    assert first != second
+    assert first == "url:drive.google.com/uc?export=download&id=AAA"
+
+
+def test_signature_params_are_dropped():
+    signed = ("https://bucket.s3.amazonaws.com/lecture.mp4?X-Amz-Algorithm=AWS4-HMAC-SHA256"
+              "&X-Amz-Credential=abc&X-Amz-Date=20260101T000000Z&X-Amz-Expires=3600&X-Amz-Signature={}")
+    assert canonical_video_id(signed.format("aaa")) == canonical_video_id(signed.format("bbb"))
+    assert canonical_video_id(signed.format("aaa")) == "url:bucket.s3.amazonaws.com/lecture.mp4"
+    cloudfront = "https://cdn.example.com/v.mp4?Expires=1&Signature=x&Key-Pair-Id=k"
+    assert canonical_video_id(cloudfront) == "url:cdn.example.com/v.mp4"
+
+
+def test_youtube_ids():
+    assert canonical_video_id("https://www.youtube.com/watch?v=abc123&t=30") == "youtube:abc123"
+    assert canonical_video_id("https://youtu.be/abc123?si=x") == "youtube:abc123"
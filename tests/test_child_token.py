@@ -0,0 +1,21 @@
+"""child_token scopes cancellation of speculative sub-tasks"""
+
+from cancellation import CancellationToken, child_token
+
+
+def test_child_is_cancelled_with_parent():
+    parent = CancellationToken()
+    child = child_token(parent)
+    parent.cancel("client disconnected")
+    assert child.cancelled and child.reason == "client disconnected"
+
+
+def test_cancelling_child_leaves_parent_running():
+    parent = CancellationToken()
+    child = child_token(parent)
+    child.cancel("enrichment result discarded")
+    assert not parent.cancelled
+
+
+def test_child_without_parent():
+    assert not child_token(None).cancelled
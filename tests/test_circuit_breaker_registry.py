@@ -0,0 +1,25 @@
+"""The breaker registry (and its metric labels) must stay bounded"""
+
+import circuit_breaker
+from circuit_breaker import OVERFLOW_BREAKER, get_breaker
+
+
+def test_registry_is_capped(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(circuit_breaker, "BREAKER_MAX_COUNT", 3)
+    named = [get_breaker(f"upstream-{i}") for i in range(3)]
+    assert get_breaker("upstream-0") is named[0]
+
+    overflow = get_breaker("upstream-3")
+    assert overflow.name == OVERFLOW_BREAKER
+    assert get_breaker("upstream-4") is overflow
+    assert len(circuit_breaker.get_breaker_stats()) == 4
+
+
+def test_web_breakers_only_for_named_sites(monkeypatch):
+    from youtube_quiz_generator import _web_breaker
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    assert _web_breaker("https://en.wikipedia.org/wiki/ATP").name == "wikipedia"
+    assert _web_breaker("https://www.nih.gov/page").name == "web:nih.gov"
+    assert _web_breaker("https://cs.some-college.edu/a").name == "web:other"
+    assert _web_breaker("https://another-college.edu/b").name == "web:other"
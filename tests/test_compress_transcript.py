@@ -0,0 +1,27 @@
+"""compress_transcript must only ever remove text when the budget requires it"""
+
+from text_analysis import compress_transcript, estimate_tokens
+
+
+def test_transcript_within_budget_is_unchanged():
+    text = "Hi everyone. Okay. Mitochondria make ATP. So, um, that's it."
+    assert compress_transcript(text, estimate_tokens(text)) == text
+
+
+def test_short_factual_sentences_survive_pruning():
+    facts = ("Mitochondria make ATP. Cells use ATP for energy. "
+             "Mitochondria have their own DNA. ATP synthase spins to make ATP. ")
+    padding = "Okay. Right. So yeah. " * 20
+    text = padding + facts + padding
+    compressed = compress_transcript(text, estimate_tokens(facts) + 4)
+    assert "Mitochondria make ATP." in compressed
+    assert "Okay." not in compressed
+
+
+def test_pruning_prefers_central_sentences():
+    text = ("TCP uses port 80 for HTTP. TCP guarantees ordered delivery. "
+            "TCP retransmits lost segments. My cat likes boxes. "
+            "TCP opens connections with a handshake.")
+    compressed = compress_transcript(text, estimate_tokens(text) // 2)
+    assert "My cat likes boxes." not in compressed
+    assert "TCP" in compressed
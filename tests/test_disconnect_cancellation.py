@@ -0,0 +1,113 @@
+"""
+A client disconnect must cancel the request's CancellationToken through the full
+middleware stack of app.main (a BaseHTTPMiddleware would hide http.disconnect).
+"""
+
+import os
+import time
+import asyncio
+
+import pytest
+
+os.environ.setdefault("WARMUP_ENABLED", "false")
+os.environ.setdefault("TRACING_ENABLED", "false")
+
+from fastapi import Request  # noqa: E402
+
+import app.main as api  # noqa: E402
+from cancellation import CancellationToken  # noqa: E402
+
+outcome = {}
+
+
+def slow_work(cancel_token):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if cancel_token.cancelled:
+            outcome["result"] = cancel_token.reason
+            return
+        time.sleep(0.01)
+    outcome["result"] = "ran to end"
+
+
+async def slow_endpoint(request: Request):
+    await api.run_cancellable(request, CancellationToken(), slow_work)
+    return {"done": True}
+
+
+@pytest.fixture
+def slow_route():
+    """/_test/slow on the real app (its middleware stack is what's under test), removed afterwards"""
+    api.app.add_api_route("/_test/slow", slow_endpoint, methods=["GET"])
+    route = api.app.router.routes[-1]
+    yield route.path
+    api.app.router.routes.remove(route)
+
+
+async def _call_and_disconnect(path, disconnect_after):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+    }
+    started = time.monotonic()
+    sent_request = False
+
+    async def receive():
+        nonlocal sent_request
+        if not sent_request:
+            sent_request = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Like uvicorn: once the client is gone, receive() answers without awaiting
+        remaining = disconnect_after - (time.monotonic() - started)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    await api.app(scope, receive, send)
+    return time.monotonic() - started
+
+
+def test_client_disconnect_cancels_token(monkeypatch, slow_route):
+    monkeypatch.setattr(api, "DISCONNECT_POLL_SECONDS", 0.05)
+    outcome.clear()
+    elapsed = asyncio.run(_call_and_disconnect(slow_route, disconnect_after=0.2))
+    assert outcome["result"] == "client disconnected"
+    assert elapsed < 2
+
+
+def test_rejected_profile_token_is_recorded(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(api, "record_http_request", lambda *args: recorded.append(args))
+    monkeypatch.setattr(api, "is_authorized", lambda token: False)
+    monkeypatch.setattr(api, "UNTRACED_PATHS", set())
+
+    async def call():
+        messages = []
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/health", "raw_path": b"/health", "query_string": b"",
+            "root_path": "", "headers": [(b"host", b"testserver"), (b"x-profile", b"wrong")],
+            "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        await api.app(scope, receive, send)
+        return messages
+
+    messages = asyncio.run(call())
+    assert messages[0]["status"] == 403
+    assert [(method, status) for method, _, status, _ in recorded] == [("GET", 403)]
+
+
+def test_test_route_is_not_left_on_the_app():
+    assert "/_test/slow" not in {getattr(route, "path", None) for route in api.app.router.routes}
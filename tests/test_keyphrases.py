@@ -0,0 +1,16 @@
+"""extract_keyphrases candidates stay inside one sentence/clause"""
+
+from text_analysis import extract_keyphrases
+
+
+def test_phrases_do_not_cross_sentence_punctuation():
+    text = ("Plants absorb carbon dioxide. Light drives photosynthesis. "
+            "Plants absorb carbon dioxide. Light drives photosynthesis, chlorophyll captures light.")
+    phrases = extract_keyphrases(text, top_k=20)
+    assert "carbon dioxide" in phrases or "absorb carbon dioxide" in phrases
+    assert not any("dioxide light" in p or "photosynthesis chlorophyll" in p for p in phrases)
+
+
+def test_hyphenated_words_are_not_clause_breaks():
+    phrases = extract_keyphrases("Deep-learning models need labelled data-sets. " * 2, top_k=20)
+    assert any("deep-learning" in p for p in phrases)
@@ -0,0 +1,23 @@
+"""The profiling admin token check must reject, not crash on, any header value"""
+
+import profiling
+
+
+def test_is_authorized(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "s3cret")
+    assert profiling.is_authorized("s3cret")
+    assert not profiling.is_authorized("wrong")
+    assert not profiling.is_authorized("")
+    assert not profiling.is_authorized(None)
+
+
+def test_non_ascii_token_is_rejected(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "s3cret")
+    assert not profiling.is_authorized("sécret")
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "sécret")
+    assert profiling.is_authorized("sécret")
+
+
+def test_disabled_without_admin_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "")
+    assert not profiling.is_authorized("anything")
@@ -0,0 +1,51 @@
+"""SingleFlight must never hand a caller a flight that has already been abandoned"""
+
+import threading
+
+from cancellation import CancellationToken, OperationCancelled
+from single_flight import SingleFlight, _Flight
+
+
+def test_caller_does_not_join_a_cancelled_flight():
+    flights = SingleFlight()
+    # The window inside _detach: the last caller left and the flight's token is cancelled
+    stale = _Flight()
+    stale.token.cancel("all requests cancelled")
+    flights._flights["video"] = stale
+
+    assert flights.do("video", lambda token: "fresh") == "fresh"
+    assert not stale.done.is_set()
+
+
+def test_new_caller_after_abandonment_starts_a_new_flight():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    first_token = CancellationToken()
+    runs = []
+
+    def work(token):
+        runs.append(token)
+        if len(runs) == 1:
+            started.set()
+            release.wait(5)
+            token.raise_if_cancelled()
+        return len(runs)
+
+    errors = []
+
+    def first_caller():
+        try:
+            flights.do("video", work, cancel_token=first_token)
+        except OperationCancelled as e:
+            errors.append(e)
+
+    caller = threading.Thread(target=first_caller)
+    caller.start()
+    assert started.wait(5)
+    first_token.cancel("client disconnected")
+    caller.join(5)
+    assert errors and runs[0].cancelled
+
+    assert flights.do("video", work) == 2
+    release.set()
+    assert not runs[1].cancelled
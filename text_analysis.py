@@ -0,0 +1,294 @@
+"""
+Local Text Analysis (NumPy, no LLM)
+
+Fast, deterministic text utilities used by the quiz pipeline:
+Transcript text
+→ Tokenizer (single precompiled regex)
+→ Stopword / generic-word masks (precompiled vocab lookups)
+→ Keyphrase extraction (term-frequency salience × phrase frequency over 2-3-grams)
+→ Ranked topics (score desc, then first occurrence - stable across runs)
+"""
+
+import re
+
+import numpy as np
+
+# ===============================
+# TOKENIZATION
+# ===============================
+_WORD_RE = re.compile(r"[a-z][a-z0-9]*(?:[-'][a-z0-9]+)*")
+
+# Sentence / clause punctuation: a keyphrase never spans one ("...carbon dioxide. Light...")
+_CLAUSE_BREAK_RE = re.compile(r"[.!?;:,()\[\]{}\"\u2013\u2014\u2026]|\s-+\s")
+
+STOPWORDS = frozenset("""
+a about above after again against all almost also although always am among an and
+another any anyone anything are around as at back be became because become becomes
+been before being below between both but by can cannot could did do does doing done
+down during each either else enough even ever every everyone everything few first
+for from further get gets getting go goes going gone got gotta gonna had has have
+having he her here hers herself him himself his how however i if in into is isn it
+its itself just kind know last least less let like lot lots made make makes making
+many may me might more most much must my myself need needs never new next no nor
+not now of off often okay ok on once one only or other others our ours ourselves
+out over own part per perhaps please pretty quite rather really right said same say
+says see seem seems shall she should since so some something sometimes still such
+sure take than thank thanks that the their theirs them themselves then there these
+they thing things think this those though through thus to today together too toward
+under until up upon us use used uses using very via want wanna was way ways we well
+were what whatever when where whether which while who whom whose why will with
+within without would yeah yes yet you your yours yourself yourselves actually
+basically called gonna guys hello hey hi im ive youre dont doesnt didnt cant wont
+isnt arent thats theres lets uh um oh video videos channel subscribe welcome
+give gives given giving high higher highest low lower lowest big bigger small smaller
+good better best great important different various able comes came
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens (hyphenated/apostrophe words kept whole)"""
+    return _WORD_RE.findall(text.lower())
+
+
+def _vocab_ids(tokens):
+    """Map tokens to dense integer ids; returns (ids array, id->word list)"""
+    vocab = {}
+    ids = np.fromiter(
+        (vocab.setdefault(tok, len(vocab)) for tok in tokens),
+        dtype=np.int64,
+        count=len(tokens)
+    )
+    words = [None] * len(vocab)
+    for word, idx in vocab.items():
+        words[idx] = word
+    return ids, words
+
+
+def _lookup_mask(words, lexicon):
+    """Boolean array over the vocabulary: True where the word is in lexicon"""
+    return np.fromiter((w in lexicon for w in words), dtype=bool, count=len(words))
+
+
+# ===============================
+# KEYPHRASE EXTRACTION (vectorized n-gram ranking)
+# ===============================
+def extract_keyphrases(text, top_k=8, min_words=2, max_words=3,
+                       exclude_words=frozenset(), min_count=1):
+    """
+    Rank keyphrases in text without an LLM.
+
+    Candidates are n-grams (min_words..max_words) made only of content words,
+    i.e. never spanning a stopword, number, excluded word or sentence/clause
+    punctuation. Each word gets the
+    salience log(1 + term frequency); a phrase scores the mean salience of its
+    words times the number of times the phrase occurs.
+    Ordering is fully deterministic: score desc, then first occurrence.
+
+    Args:
+        text: Source text (transcript)
+        top_k: Maximum number of phrases returned
+        min_words: Minimum phrase length in words
+        max_words: Maximum phrase length in words
+        exclude_words: Words that may not appear in a phrase (e.g. GENERIC_WORDS);
+            a 2-word phrase may still contain one (e.g. "machine learning")
+        min_count: Minimum number of occurrences of a phrase
+
+    Returns:
+        List of phrase strings, best first
+    """
+    tokens, clause_ids = [], []
+    for clause_id, clause in enumerate(_CLAUSE_BREAK_RE.split(text)):
+        clause_tokens = tokenize(clause)
+        tokens.extend(clause_tokens)
+        clause_ids.extend([clause_id] * len(clause_tokens))
+    if len(tokens) < min_words:
+        return []
+    clause_ids = np.asarray(clause_ids)
+
+    ids, words = _vocab_ids(tokens)
+    vocab_size = len(words)
+
+    word_is_content = ~_lookup_mask(words, STOPWORDS)
+    word_is_content &= np.fromiter((len(w) > 2 and not w.isdigit() for w in words),
+                                   dtype=bool, count=vocab_size)
+    word_is_excluded = _lookup_mask(words, exclude_words)
+
+    content = word_is_content[ids]
+
+    # Word salience: log term frequency of content words
+    freq = np.bincount(ids[content], minlength=vocab_size).astype(np.float64)
+    word_score = np.log1p(freq)
+
+    candidates = []  # (score, first_pos, phrase)
+    for n in range(min_words, max_words + 1):
+        if len(ids) < n:
+            break
+        windows = np.lib.stride_tricks.sliding_window_view(ids, n)
+        valid = np.lib.stride_tricks.sliding_window_view(content, n).all(axis=1)
+        clause_windows = np.lib.stride_tricks.sliding_window_view(clause_ids, n)
+        valid &= clause_windows[:, 0] == clause_windows[:, -1]
+        n_excluded = word_is_excluded[windows].sum(axis=1)
+        valid &= (n_excluded == 0) | ((n == 2) & (n_excluded < 2))
+        positions = np.flatnonzero(valid)
+        if not len(positions):
+            continue
+
+        # Encode each n-gram as a single integer key for vectorized counting
+        keys = np.zeros(len(positions), dtype=np.int64)
+        for j in range(n):
+            keys = keys * vocab_size + windows[positions, j]
+        uniq, first_idx, counts = np.unique(keys, return_index=True, return_counts=True)
+        keep = counts >= min_count
+        if not keep.any():
+            continue
+
+        grams = windows[positions[first_idx[keep]]]
+        scores = word_score[grams].mean(axis=1) * counts[keep]
+        for gram, score, pos in zip(grams, scores, positions[first_idx[keep]]):
+            candidates.append((float(score), int(pos), " ".join(words[i] for i in gram)))
+
+    candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+
+    # Skip phrases fully contained in a better-ranked one (and vice versa)
+    selected = []
+    for _, _, phrase in candidates:
+        padded = f" {phrase} "
+        if any(padded in f" {chosen} " or f" {chosen} " in padded for chosen in selected):
+            continue
+        selected.append(phrase)
+        if len(selected) >= top_k:
+            break
+    return selected
+
+
+# ===============================
+# EXTRACTIVE TRANSCRIPT COMPRESSION
+# ===============================
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Caption stutter: "the the", "you know you know" → single occurrence
+_REPEATED_PHRASE_RE = re.compile(r"\b((?:\w+\s+){0,3}\w+)(?:\s+\1\b)+", re.IGNORECASE)
+
+# Filler that never carries testable content (greetings, sponsor reads, channel plugs).
+# Sponsor codes need sponsor wording + an upper-case code: "use the code below" and
+# "the link below" are lecture content in programming / networking videos.
+_FILLER_RE = re.compile(
+    r"\b(?:(?:hello|hi|hey) (?:everyone|everybody|guys|there)|welcome (?:back )?to (?:the|my|our) channel"
+    r"|thanks? (?:you )?(?:so much )?for watching|see you (?:all )?(?:in the )?next (?:video|time)"
+    r"|(?:like|share) and subscribe|subscribe to (?:the|my|our) channel|hit the (?:notification )?bell"
+    r"|(?:this video is )?sponsored by \w+|today'?s sponsor"
+    r"|(?:promo|discount|coupon) code (?-i:[A-Z0-9]{3,})"
+    r"|use code (?-i:[A-Z0-9]{3,}) (?:for|to get) \d+ ?(?:%|percent)(?: off)?"
+    r"|link (?:is )?in the description)\b",
+    re.IGNORECASE
+)
+
+MAX_SENTENCE_WORDS = 40  # Unpunctuated captions are split into windows of this size
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) when no tokenizer is available"""
+    return (len(text) + 3) // 4
+
+
+def split_sentences(text, max_words=MAX_SENTENCE_WORDS):
+    """Split on sentence punctuation; overly long runs are cut into word windows"""
+    sentences = []
+    for sentence in _SENTENCE_SPLIT_RE.split(text):
+        words = sentence.split()
+        for i in range(0, len(words), max_words):
+            sentences.append(" ".join(words[i:i + max_words]))
+    return sentences
+
+
+def compress_transcript(text, max_tokens, count_tokens=estimate_tokens):
+    """
+    Extractive compression of a transcript into a token budget.
+
+    A transcript that already fits is returned unchanged. Otherwise:
+
+    1. Collapse repeated phrases and strip filler (greetings, sponsor reads)
+    2. Drop sentences with no content words and sentences with the same
+       content words as an earlier one
+    3. If still over budget, score sentences by TF-IDF cosine centrality to the
+       whole transcript and pack the best ones, kept in ORIGINAL order. Cosine
+       is length-normalised, so short factual sentences ("Mitochondria make
+       ATP.") compete on relevance rather than on word count.
+
+    Args:
+        text: Cleaned transcript (single-spaced)
+        max_tokens: Token budget for the output
+        count_tokens: Token counter (defaults to a ~4 chars/token estimate)
+
+    Returns:
+        Compressed transcript string
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    text = _REPEATED_PHRASE_RE.sub(r"\1", text)
+    text = re.sub(r"\s+", " ", _FILLER_RE.sub("", text)).strip()
+    sentences = split_sentences(text)
+
+    kept, term_lists, seen = [], [], set()
+    for sentence in sentences:
+        terms = [t for t in tokenize(sentence) if t not in STOPWORDS and len(t) > 2]
+        key = frozenset(terms)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        kept.append(sentence)
+        term_lists.append(terms)
+
+    if not kept:
+        # Nothing informative survived (very short transcript) - keep original head
+        return _truncate_to_tokens(text, max_tokens, count_tokens)
+
+    costs = np.fromiter((count_tokens(s) + 1 for s in kept), dtype=np.int64, count=len(kept))
+    if costs.sum() <= max_tokens:
+        return " ".join(kept)
+
+    # Sparse TF-IDF in COO form: (sentence index, term id, weight)
+    flat_terms = [t for terms in term_lists for t in terms]
+    term_ids, words = _vocab_ids(flat_terms)
+    sent_idx = np.repeat(np.arange(len(kept)), [len(terms) for terms in term_lists])
+    n_sent, vocab_size = len(kept), len(words)
+
+    pair_keys, tf = np.unique(sent_idx * vocab_size + term_ids, return_counts=True)
+    pair_sent, pair_term = pair_keys // vocab_size, pair_keys % vocab_size
+    df = np.bincount(pair_term, minlength=vocab_size)
+    idf = np.log((1 + n_sent) / (1 + df)) + 1.0
+    weight = (1 + np.log(tf)) * idf[pair_term]
+
+    centroid = np.bincount(pair_term, weights=weight, minlength=vocab_size)
+    centroid /= np.linalg.norm(centroid) or 1.0
+    dot = np.bincount(pair_sent, weights=weight * centroid[pair_term], minlength=n_sent)
+    norms = np.sqrt(np.bincount(pair_sent, weights=weight ** 2, minlength=n_sent))
+    scores = np.divide(dot, norms, out=np.zeros(n_sent), where=norms > 0)
+
+    order = np.lexsort((np.arange(n_sent), -scores))
+    chosen = np.zeros(n_sent, dtype=bool)
+    used = 0
+    for i in order:
+        if used + costs[i] <= max_tokens:
+            chosen[i] = True
+            used += costs[i]
+
+    if not chosen.any():
+        return _truncate_to_tokens(kept[int(order[0])], max_tokens, count_tokens)
+    return " ".join(kept[i] for i in np.flatnonzero(chosen))
+
+
+def _truncate_to_tokens(text, max_tokens, count_tokens):
+    """Cut text at a word boundary so that it fits max_tokens"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:  # Binary search for the longest fitting prefix
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo])
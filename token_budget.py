@@ -0,0 +1,189 @@
+"""
+Token Budgeting for Ollama Calls
+
+Replaces character budgets and fixed timeouts with per-call token plans:
+Prompt text
+→ Token count (model tokenizer if configured, else calibrated chars/token estimate)
+→ num_ctx    = prompt tokens + num_predict (rounded up, capped at OLLAMA_NUM_CTX_MAX)
+→ num_predict = expected output size for the call type
+→ timeout    = load overhead + (prompt tokens / prompt tok/s + num_predict / eval tok/s) × safety
+→ Measured tok/s per model (EWMA of Ollama prompt_eval/eval stats) fed back into the next plan
+"""
+
+import os
+import logging
+import math
+import time
+import threading
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# BUDGET CONFIG
+# ===============================
+OLLAMA_NUM_CTX_MAX = int(os.environ.get("OLLAMA_NUM_CTX_MAX", "8192"))
+
+# Priors used until the first call on this host has been measured
+DEFAULT_PROMPT_TPS = float(os.environ.get("OLLAMA_PROMPT_TPS", "150"))
+DEFAULT_EVAL_TPS = float(os.environ.get("OLLAMA_EVAL_TPS", "12"))
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+# Timeout = LOAD_OVERHEAD + expected seconds × SAFETY, clamped to [MIN, MAX]
+TIMEOUT_SAFETY_FACTOR = float(os.environ.get("OLLAMA_TIMEOUT_SAFETY", "2.0"))
+TIMEOUT_LOAD_OVERHEAD = float(os.environ.get("OLLAMA_TIMEOUT_OVERHEAD", "10"))
+MIN_TIMEOUT = 15.0
+MAX_TIMEOUT = 600.0
+
+EWMA_ALPHA = 0.3  # Weight of the newest measurement
+
+# Optional exact tokenizer (Hugging Face name/path matching the Ollama model family)
+TOKENIZER_NAME = os.environ.get("OLLAMA_TOKENIZER", "")
+
+
+@dataclass
+class CallBudget:
+    """Per-call Ollama limits derived from the prompt size and measured throughput"""
+    prompt_tokens: int
+    num_ctx: int
+    num_predict: int
+    timeout: float
+
+
+# ===============================
+# THROUGHPUT MEASUREMENT
+# ===============================
+class ThroughputTracker:
+    """Thread-safe EWMA of prompt/eval tokens per second and chars per token, per model"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _entry(self, model):
+        return self._stats.setdefault(model, {
+            "prompt_tps": DEFAULT_PROMPT_TPS,
+            "eval_tps": DEFAULT_EVAL_TPS,
+            "chars_per_token": DEFAULT_CHARS_PER_TOKEN,
+            "samples": 0,
+            "updated_at": None,
+        })
+
+    @staticmethod
+    def _ewma(old, new, first):
+        return new if first else (1 - EWMA_ALPHA) * old + EWMA_ALPHA * new
+
+    def record(self, model, prompt_tokens=0, prompt_seconds=0.0, eval_tokens=0,
+               eval_seconds=0.0, prompt_chars=0):
+        """Fold one call's measurements into the model's running estimates"""
+        with self._lock:
+            entry = self._entry(model)
+            first = entry["samples"] == 0
+            if prompt_tokens > 0 and prompt_seconds > 0:
+                entry["prompt_tps"] = self._ewma(entry["prompt_tps"], prompt_tokens / prompt_seconds, first)
+            if eval_tokens > 0 and eval_seconds > 0:
+                entry["eval_tps"] = self._ewma(entry["eval_tps"], eval_tokens / eval_seconds, first)
+            if prompt_tokens > 0 and prompt_chars > 0:
+                entry["chars_per_token"] = self._ewma(
+                    entry["chars_per_token"], prompt_chars / prompt_tokens, first
+                )
+            entry["samples"] += 1
+            entry["updated_at"] = time.time()
+
+    def get(self, model):
+        with self._lock:
+            return dict(self._entry(model))
+
+    def snapshot(self):
+        """All per-model estimates (exposed for tuning)"""
+        with self._lock:
+            return {model: dict(entry) for model, entry in self._stats.items()}
+
+
+throughput = ThroughputTracker()
+
+
+def get_throughput_stats():
+    """Measured Ollama throughput on this host, per model"""
+    return throughput.snapshot()
+
+
+# ===============================
+# TOKEN COUNTING
+# ===============================
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def _load_tokenizer():
+    global _tokenizer
+    if not TOKENIZER_NAME:
+        return None
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            try:
+                from transformers import AutoTokenizer
+                _tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+            except Exception as e:
+                logger.warning(f"⚠ Tokenizer '{TOKENIZER_NAME}' unavailable, using estimator: {e}")
+                _tokenizer = False
+    return _tokenizer or None
+
+
+def count_tokens(text, model=None):
+    """Token count for text: exact with OLLAMA_TOKENIZER, else calibrated per-model estimate"""
+    tokenizer = _load_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+    chars_per_token = throughput.get(model)["chars_per_token"] if model else DEFAULT_CHARS_PER_TOKEN
+    return int(math.ceil(len(text) / chars_per_token))
+
+
+def truncate_to_tokens(text, max_tokens, model=None):
+    """Cut text at a word boundary so that it fits max_tokens"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    tokenizer = _load_tokenizer()
+    if tokenizer is not None:
+        ids = tokenizer.encode(text, add_special_tokens=False)[:max_tokens]
+        cut = tokenizer.decode(ids)
+    else:
+        chars_per_token = throughput.get(model)["chars_per_token"] if model else DEFAULT_CHARS_PER_TOKEN
+        cut = text[:int(max_tokens * chars_per_token)]
+    space = cut.rfind(" ")
+    return cut[:space] if space > 0 else cut
+
+
+# ===============================
+# CALL PLANNING
+# ===============================
+def plan_call(prompt, model, num_predict):
+    """
+    Size num_ctx/num_predict and the timeout of one Ollama call.
+
+    Args:
+        prompt: Full prompt text
+        model: Ollama model name (selects measured throughput/calibration)
+        num_predict: Expected maximum output tokens for this call
+
+    Returns:
+        CallBudget
+    """
+    prompt_tokens = count_tokens(prompt, model)
+
+    # Never let the prompt push the output out of the context window
+    num_predict = max(64, min(num_predict, OLLAMA_NUM_CTX_MAX - prompt_tokens))
+    needed = prompt_tokens + num_predict + 64
+    num_ctx = min(OLLAMA_NUM_CTX_MAX, int(math.ceil(needed / 1024.0)) * 1024)
+
+    stats = throughput.get(model)
+    expected = prompt_tokens / stats["prompt_tps"] + num_predict / stats["eval_tps"]
+    timeout = TIMEOUT_LOAD_OVERHEAD + expected * TIMEOUT_SAFETY_FACTOR
+    timeout = max(MIN_TIMEOUT, min(MAX_TIMEOUT, timeout))
+
+    return CallBudget(
+        prompt_tokens=prompt_tokens,
+        num_ctx=num_ctx,
+        num_predict=num_predict,
+        timeout=timeout,
+    )
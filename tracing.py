@@ -0,0 +1,336 @@
+"""
+Request Tracing
+
+Shows where ONE slow request spent its time (which video, which stage, which call):
+API request (root span, trace ID returned in the X-Trace-Id header)
+→ Child spans (contextvar parent, copied into Agent-03 / single-flight threads)
+   ├─ Every pipeline stage (metrics.stage_timer)
+   ├─ Outbound calls: transcript API, each HTTP GET, each Ollama call, ffmpeg, Whisper
+   └─ Attributes: URL, bytes, tokens, attempt number, ...
+→ Finished spans appended to a rotating JSONL file (TRACE_FILE)
+→ Optional OTLP/HTTP JSON export (TRACE_OTLP_ENDPOINT) to any OpenTelemetry collector
+→ Waterfall view:
+      python tracing.py list               recent traces, slowest first
+      python tracing.py show <trace_id>    waterfall of one trace
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import tempfile
+import threading
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+
+from cancellation import OperationCancelled
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# TRACING CONFIG
+# ===============================
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+# "{pid}" in the name gives each worker process its own file (rotation is per process)
+TRACE_FILE = os.environ.get("TRACE_FILE", os.path.join(tempfile.gettempdir(), "quiz_traces.jsonl"))
+TRACE_FILE_MAX_BYTES = int(os.environ.get("TRACE_FILE_MAX_BYTES", str(20 * 1024 * 1024)))
+TRACE_FILE_BACKUPS = int(os.environ.get("TRACE_FILE_BACKUPS", "5"))
+
+# e.g. http://otel-collector:4318 - spans are also POSTed to {endpoint}/v1/traces
+TRACE_OTLP_ENDPOINT = os.environ.get("TRACE_OTLP_ENDPOINT", "").rstrip("/")
+TRACE_SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "video-mcq-generator")
+OTLP_BATCH_SIZE = 256
+OTLP_FLUSH_SECONDS = 2.0
+
+MAX_ATTRIBUTE_CHARS = 500  # Long values (prompts, page text) are cut
+
+
+class Span:
+    """One timed operation; finished spans are exported as one JSON object each"""
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "ok"
+        self.error = None
+        self.attributes = {}
+        self.set(**(attributes or {}))
+
+    def set(self, **attributes):
+        """Attach attributes (None values are skipped)"""
+        for key, value in attributes.items():
+            if value is None:
+                continue
+            if not isinstance(value, (bool, int, float)):
+                value = str(value)[:MAX_ATTRIBUTE_CHARS]
+            self.attributes[key] = value
+        return self
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+# ===============================
+# EXPORTERS
+# ===============================
+class _FileExporter:
+    """Appends finished spans to TRACE_FILE, rotating by size"""
+
+    def __init__(self, path):
+        path = path.format(pid=os.getpid())
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=TRACE_FILE_MAX_BYTES, backupCount=TRACE_FILE_BACKUPS, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger = logging.Logger("quiz.traces")  # Detached: never reaches the root handlers
+        self._logger.addHandler(handler)
+        self.path = path
+
+    def export(self, span):
+        self._logger.info(json.dumps(span.to_dict(), ensure_ascii=False))
+
+
+class _OTLPExporter:
+    """Batches spans to an OTLP/HTTP collector (JSON encoding) from a background thread"""
+
+    def __init__(self, endpoint):
+        self.url = f"{endpoint}/v1/traces"
+        self._queue = queue.Queue(maxsize=10000)
+        threading.Thread(target=self._loop, name="otlp-exporter", daemon=True).start()
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # Never block the pipeline on the collector
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": value}
+
+    def _encode(self, span):
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": self._value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 1},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    def _send(self, spans):
+        import requests
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}
+            ]},
+            "scopeSpans": [{"scope": {"name": "quiz.tracing"}, "spans": [self._encode(s) for s in spans]}],
+        }]}
+        try:
+            requests.post(self.url, json=payload, timeout=5)
+        except Exception as e:
+            logger.debug(f"OTLP export failed: {e}")
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + OTLP_FLUSH_SECONDS
+            while len(batch) < OTLP_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._send(batch)
+
+
+_exporters = None
+_exporters_lock = threading.Lock()
+
+
+def _reset_exporters_after_fork():
+    """A forked worker opens its own TRACE_FILE ({pid}) and OTLP sender thread"""
+    global _exporters, _exporters_lock
+    _exporters, _exporters_lock = None, threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_exporters_after_fork)
+
+
+def _get_exporters():
+    global _exporters
+    with _exporters_lock:
+        if _exporters is None:
+            _exporters = []
+            try:
+                _exporters.append(_FileExporter(TRACE_FILE))
+            except OSError as e:
+                logger.warning(f"⚠ Trace file unavailable ({e}), spans not written locally")
+            if TRACE_OTLP_ENDPOINT:
+                _exporters.append(_OTLPExporter(TRACE_OTLP_ENDPOINT))
+        return _exporters
+
+
+# ===============================
+# SPAN API
+# ===============================
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time the block as a span, child of the current span (a new trace if there is none).
+
+        with span("http.get", url=url) as s:
+            response = requests.get(url)
+            s.set(status_code=response.status_code, bytes=len(response.content))
+
+    Yields None when tracing is disabled - use `if s:` before setting late attributes,
+    or the helpers below which handle that.
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+    parent = _current_span.get()
+    trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+    current = Span(name, trace_id, parent.span_id if parent is not None else None, attributes)
+    reset = _current_span.set(current)
+    try:
+        yield current
+    except OperationCancelled as e:
+        current.status, current.error = "cancelled", str(e)[:MAX_ATTRIBUTE_CHARS]
+        raise
+    except BaseException as e:
+        current.status, current.error = "error", f"{type(e).__name__}: {e}"[:MAX_ATTRIBUTE_CHARS]
+        raise
+    finally:
+        _current_span.reset(reset)
+        current.end_ns = time.time_ns()
+        for exporter in _get_exporters():
+            try:
+                exporter.export(current)
+            except Exception:
+                pass
+
+
+def set_attributes(**attributes):
+    """Attach attributes to the current span (no-op without one)"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+# ===============================
+# WATERFALL VIEWER
+# ===============================
+def _trace_files(path):
+    files = [path] + [f"{path}.{i}" for i in range(1, TRACE_FILE_BACKUPS + 1)]
+    return [f for f in files if os.path.exists(f)]
+
+
+def load_spans(path=None, trace_id=None):
+    spans = []
+    for file in _trace_files(path or TRACE_FILE.format(pid=os.getpid())):
+        with open(file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if trace_id is None or record["trace_id"].startswith(trace_id):
+                    spans.append(record)
+    return spans
+
+
+def render_waterfall(spans, width=60):
+    """Text waterfall: one line per span, indented by depth, bar positioned on the trace timeline"""
+    if not spans:
+        return "No spans found"
+    start = min(s["start_ns"] for s in spans)
+    end = max(s["end_ns"] for s in spans)
+    total = max(end - start, 1)
+    children = {}
+    for s in spans:
+        children.setdefault(s["parent_id"], []).append(s)
+    ids = {s["span_id"] for s in spans}
+    roots = [s for s in spans if s["parent_id"] not in ids]
+
+    lines = [f"trace {spans[0]['trace_id']}  total {total / 1e6:.0f} ms"]
+
+    def walk(node, depth):
+        offset = int((node["start_ns"] - start) / total * width)
+        length = max(1, int((node["end_ns"] - node["start_ns"]) / total * width))
+        bar = " " * offset + "█" * min(length, width - offset)
+        mark = {"error": " ✗", "cancelled": " ⊘"}.get(node["status"], "")
+        detail = " ".join(f"{k}={v}" for k, v in list(node["attributes"].items())[:4])
+        label = ("  " * depth + node["name"])[:40]
+        lines.append(f"{label:<40} |{bar:<{width}}| {node['duration_ms']:>9.0f} ms{mark}  {detail}")
+        for child in sorted(children.get(node["span_id"], []), key=lambda s: s["start_ns"]):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda s: s["start_ns"]):
+        walk(root, 0)
+    return "\n".join(lines)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("list", "show"):
+        print("Usage:")
+        print("  python tracing.py list [trace_file]")
+        print("  python tracing.py show <trace_id> [trace_file]")
+        sys.exit(1)
+
+    if sys.argv[1] == "list":
+        spans = load_spans(sys.argv[2] if len(sys.argv) > 2 else None)
+        roots = [s for s in spans if s["parent_id"] is None]
+        for root in sorted(roots, key=lambda s: -s["duration_ms"])[:30]:
+            print(f"{root['trace_id']}  {root['duration_ms']:>10.0f} ms  {root['status']:<9} {root['name']}")
+        return
+
+    if len(sys.argv) < 3:
+        print("Usage: python tracing.py show <trace_id> [trace_file]")
+        sys.exit(1)
+    print(render_waterfall(load_spans(sys.argv[3] if len(sys.argv) > 3 else None, sys.argv[2])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Shared Transcript Cache (SQLite, one file per host)
+
+Transcripts are the expensive input of every quiz (a Whisper run can take minutes)
+and do not change, so every worker process on the host shares them on disk:
+Canonical video ID + source ("captions" / "whisper:<model>")
+→ Lookup (any worker, any request profile) → hit: no caption fetch, no Whisper run
+→ Miss: the pipeline produces the transcript and stores it
+   └─ Audio sampled or Whisper downgraded by the deadline scheduler → NOT stored
+      (a partial transcript must not outlive the request that needed it)
+→ Entries expire after TRANSCRIPT_CACHE_TTL; the file lives in the OS page cache,
+  so N workers do not hold N copies in memory
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# TRANSCRIPT CACHE CONFIG
+# ===============================
+TRANSCRIPT_CACHE_PATH = os.environ.get(
+    "TRANSCRIPT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "quiz_transcripts.db")
+)
+# Seconds a transcript is reused (0 = cache disabled)
+TRANSCRIPT_CACHE_TTL = float(os.environ.get("TRANSCRIPT_CACHE_TTL", str(7 * 24 * 3600)))
+PRUNE_EVERY = 100  # Expired rows are deleted every N stores
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    transcript TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (video_id, source)
+);
+"""
+
+
+class TranscriptCache:
+    """
+    Transcripts shared by every worker process through one SQLite file (WAL).
+
+    A new connection is opened per operation (FastAPI thread pool, forked workers).
+    """
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or TRANSCRIPT_CACHE_PATH
+        self.ttl = TRANSCRIPT_CACHE_TTL if ttl is None else ttl
+        self._stores = 0
+        self._lock = threading.Lock()
+        try:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠ Transcript cache disabled ({self.path}): {e}")
+            self.ttl = 0
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, video_id, *sources):
+        """
+        Cached transcript of the first source (in order) that has one.
+
+        Returns:
+            Transcript text, or None (miss, cache disabled or unreadable)
+        """
+        if self.ttl <= 0:
+            return None
+        placeholders = ", ".join("?" * len(sources))
+        try:
+            with self._connect() as conn:
+                rows = dict(conn.execute(
+                    f"SELECT source, transcript FROM transcripts "
+                    f"WHERE video_id = ? AND source IN ({placeholders}) AND created_at >= ?",
+                    (video_id, *sources, time.time() - self.ttl)
+                ).fetchall())
+        except sqlite3.Error as e:
+            logger.warning(f"⚠ Transcript cache unreadable: {e}")
+            return None
+        transcript = next((rows[s] for s in sources if s in rows), None)
+        record_cache("transcript", transcript is not None)
+        return transcript
+
+    def put(self, video_id, source, transcript):
+        """Store a complete transcript (errors are logged, never raised: the cache is optional)"""
+        if self.ttl <= 0 or not transcript:
+            return
+        now = time.time()
+        with self._lock:
+            self._stores += 1
+            prune = self._stores % PRUNE_EVERY == 0
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO transcripts (video_id, source, transcript, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (video_id, source, transcript, now)
+                )
+                if prune:
+                    conn.execute("DELETE FROM transcripts WHERE created_at < ?", (now - self.ttl,))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠ Transcript not cached: {e}")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_transcript_cache():
+    """Process-wide TranscriptCache at TRANSCRIPT_CACHE_PATH (created on first use)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TranscriptCache()
+        return _default_cache
@@ -0,0 +1,153 @@
+"""
+Startup Warm-Up + Readiness
+
+A fresh worker answers /health at once, but its first quiz would pay a cold Whisper
+load and a cold Ollama model load (multi-second each). At startup:
+→ One background thread per backend (the worker keeps serving /health meanwhile)
+   ├─ whisper:<model>             load the model + transcribe one second of silence
+   └─ ollama:<model>[@<endpoint>] one-token generation per model (CLI transport) or per
+                                  model and pool endpoint (HTTP transport); the call's
+                                  keep_alive (OLLAMA_KEEP_ALIVE) pins the model in memory
+→ A failed warm-up is retried every WARMUP_RETRY_SECONDS (Ollama may come up after us)
+→ GET /ready: 200 once every backend is warm, 503 before (per-backend state and
+  warm-up latency). Point the load balancer's readiness probe here; /health stays
+  the liveness probe.
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# WARM-UP CONFIG
+# ===============================
+# false = /ready answers 200 immediately (first requests pay the cold loads)
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() == "true"
+# Backends this worker needs warm before it takes traffic (drop "whisper" on nodes that
+# only serve YouTube transcripts)
+WARMUP_BACKENDS = {
+    b.strip() for b in os.environ.get("WARMUP_BACKENDS", "whisper,ollama").split(",") if b.strip()
+}
+# Whisper models to preload, comma-separated (default: the configured WHISPER_MODEL)
+WARMUP_WHISPER_MODELS = os.environ.get("WARMUP_WHISPER_MODELS", "")
+WARMUP_RETRY_SECONDS = float(os.environ.get("WARMUP_RETRY_SECONDS", "30"))
+WARMUP_TIMEOUT = float(os.environ.get("WARMUP_TIMEOUT", "300"))  # Seconds per Ollama model load
+
+
+# ===============================
+# READINESS STATE
+# ===============================
+class Readiness:
+    """Warm-up state per backend: pending → ready, or failed (and retried)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = None
+        self.backends = {}
+
+    def add(self, name):
+        with self._lock:
+            self.backends[name] = {"state": "pending", "attempts": 0, "seconds": None, "error": None}
+
+    def update(self, name, **fields):
+        with self._lock:
+            self.backends[name].update(fields)
+
+    def snapshot(self):
+        with self._lock:
+            backends = {name: dict(state) for name, state in self.backends.items()}
+        return {
+            "ready": all(b["state"] == "ready" for b in backends.values()),
+            "enabled": WARMUP_ENABLED,
+            "uptime_seconds": round(time.time() - self.started, 1) if self.started else None,
+            "backends": backends,
+        }
+
+
+readiness = Readiness()
+
+
+def warmup_whisper_models():
+    """Whisper models this worker keeps loaded ([] when Whisper is not warmed up)"""
+    if not WARMUP_ENABLED or "whisper" not in WARMUP_BACKENDS:
+        return []
+    import youtube_quiz_generator as pipeline
+    models = [m.strip() for m in (WARMUP_WHISPER_MODELS or pipeline.WHISPER_MODEL).split(",") if m.strip()]
+    return list(dict.fromkeys(models))
+
+
+def _warmup_tasks():
+    """(backend name, warm-up callable) for everything this worker needs warm"""
+    import youtube_quiz_generator as pipeline
+    tasks = []
+    for model in warmup_whisper_models():
+        # Looked up at call time: the benchmarks swap in a fake ASR
+        tasks.append((f"whisper:{model}", lambda model=model: pipeline.warm_up_whisper(model)))
+    if "ollama" in WARMUP_BACKENDS:
+        models = {"mcq": pipeline.OLLAMA_MODEL, "enrichment": pipeline.OLLAMA_ENRICHMENT_MODEL}
+        seen = set()
+        for purpose, model in models.items():
+            if pipeline.OLLAMA_TRANSPORT != "http":
+                if model not in seen:
+                    seen.add(model)
+                    tasks.append((f"ollama:{model}", lambda model=model: pipeline.warm_up_ollama(
+                        model, timeout=WARMUP_TIMEOUT)))
+                continue
+            from ollama_pool import get_ollama_pool
+            pool = get_ollama_pool(purpose)
+            for endpoint in pool.endpoints:
+                if (model, endpoint.url) in seen:
+                    continue
+                seen.add((model, endpoint.url))
+
+                def warm(pool=pool, endpoint=endpoint, model=model):
+                    pipeline.warm_up_ollama(model, endpoint.url, timeout=WARMUP_TIMEOUT)
+                    pool.report_success(endpoint, model)  # Routing prefers endpoints with the model loaded
+                tasks.append((f"ollama:{model}@{endpoint.url}", warm))
+    return tasks
+
+
+def _run(name, warm):
+    while True:
+        attempts = readiness.backends[name]["attempts"] + 1
+        readiness.update(name, state="warming", attempts=attempts)
+        started = time.monotonic()
+        try:
+            warm()
+        except Exception as e:
+            readiness.update(name, state="failed", error=f"{type(e).__name__}: {e}"[:300])
+            logger.warning(f"⚠ Warm-up of {name} failed (attempt {attempts}), retrying in "
+                           f"{WARMUP_RETRY_SECONDS:.0f}s: {e}")
+            time.sleep(WARMUP_RETRY_SECONDS)
+            continue
+        seconds = round(time.monotonic() - started, 3)
+        readiness.update(name, state="ready", seconds=seconds, error=None)
+        logger.info(f"🔥 {name} warm in {seconds:.2f}s")
+        return
+
+
+def start_warmup():
+    """Start warming every configured backend in the background (call once per worker)"""
+    readiness.started = time.time()
+    if not WARMUP_ENABLED:
+        return
+    try:
+        tasks = _warmup_tasks()
+    except Exception as e:
+        # Misconfigured pool: never ready rather than silently routable
+        readiness.add("config")
+        readiness.update("config", state="failed", error=f"{type(e).__name__}: {e}")
+        logger.error(f"❌ Warm-up not started: {e}")
+        return
+    for name, warm in tasks:
+        readiness.add(name)
+    for name, warm in tasks:
+        threading.Thread(target=_run, args=(name, warm), name=f"warmup-{name}", daemon=True).start()
+
+
+def get_readiness():
+    """Readiness of this worker: overall flag plus state / warm-up seconds per backend"""
+    return readiness.snapshot()
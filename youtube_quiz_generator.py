@@ -3,31 +3,79 @@ YouTube URL → MCQ Generator (FAST + UNIQUE, 100% FREE, Windows Safe)
 
 Pipeline:
 YouTube URL
+→ Shared transcript cache (SQLite, every worker on the host, transcript_cache.py)
 → YouTube Transcript API (auto-translate if needed)
 → Whisper (ONLY if captions unavailable)
+   └─ In-process, or on the dedicated ASR worker processes (ASR_SERVICE, asr_service.py)
+→ Transcript Compression (filler removal + TF-IDF sentence packing into the prompt budget)
 → Agent-03: Web Knowledge Enrichment
-   ├─ Topic Extraction (Ollama llama3:8b)
+   ├─ Topic Extraction (Ollama llama3:8b, or local keyphrase ranking)
    ├─ Topic Validation (remove generic words)
-   ├─ Query Generation (Ollama llama3:8b)
-   ├─ Controlled Web Search (approved domains only)
+   ├─ Query Generation (Ollama llama3:8b, one batched call for all topics)
+   ├─ Controlled Web Search (approved domains only) and/or offline BM25 knowledge index
    ├─ Content Fetching & Cleaning
-   └─ Knowledge Synthesis (Ollama llama3:8b)
+   └─ Knowledge Synthesis (Ollama llama3:8b, one batched call for all topics)
 → Merged Context (Transcript + Enriched Knowledge)
-→ Ollama Binary (direct execution, no HTTP)
+   └─ Overlapped: transcript-grounded MCQs start while Agent-03 runs; enrichment fills the rest
+→ Ollama Binary (direct execution, no HTTP) or native HTTP API (OLLAMA_TRANSPORT=http)
+   ├─ HTTP: load-balanced over OLLAMA_ENDPOINTS (separate MCQ / enrichment pools)
+   └─ Token budgets: num_ctx/num_predict and timeouts sized per call from measured tokens/sec
 → 20 UNIQUE MCQs (valid JSON) 
+   └─ Optional request deadline: stages degrade (skip enrichment, tiny Whisper,
+      fewer questions, audio chunk sampling) to finish in time
+→ Cancellation: client disconnect / deadline kills ffmpeg + Ollama children,
+  aborts downloads and stops Whisper between segments
+→ Admission control: bounded Whisper / Ollama / ffmpeg / outbound HTTP slots
+→ CPU partitioning: per-stage thread budgets / core pinning (CPU_PROFILE)
+→ Circuit breakers: transcript API / Wikipedia / DuckDuckGo / web pages / each Ollama
+  endpoint skipped or failed fast while their breaker is open
+→ Observability: leveled logging + Prometheus stage histograms, Ollama tokens, retries,
+  JSON repair outcomes and cache hits (metrics.py, GET /metrics)
+  └─ Per-request trace: span per stage and per outbound call (tracing.py, rotating JSONL)
 """
 
 import os
 import re
 import json
 import sys
+import logging
+import hashlib
 import tempfile
 import subprocess
-import requests
+import time
 import platform
 import shutil
-from urllib.parse import urlparse, parse_qs
-from bs4 import BeautifulSoup
+import threading
+import contextvars
+from dataclasses import dataclass, replace, asdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from urllib.parse import urlparse, parse_qs, parse_qsl, quote, urlencode
+import numpy as np
+# requests, bs4, whisper, yt_dlp and torch are imported where they are used: a worker
+# must boot and answer /health fast (see benchmarks/startup_benchmark.py)
+
+from text_analysis import extract_keyphrases, compress_transcript
+from knowledge_index import get_knowledge_index
+from deadline_scheduler import stage_timings, timed_stage, SAMPLE_CHUNK_SECONDS
+from cancellation import (
+    OperationCancelled, cancel_scope, current_token, check_cancelled,
+    child_token, run_process, cancellation_stats
+)
+from admission_control import resource_slot
+from cpu_partition import (
+    configure_torch_threads, ffmpeg_thread_args, ollama_thread_options, process_cpus, pinned
+)
+from ollama_pool import get_ollama_pool
+from circuit_breaker import CircuitOpen, get_breaker
+from metrics import (
+    stage_timer, pipeline_timer, record_ollama_call, record_retry, record_json_parse, record_cache
+)
+from tracing import span, set_attributes
+from token_budget import plan_call, count_tokens, truncate_to_tokens, throughput
+from transcript_cache import get_transcript_cache
+from asr_service import ASR_SERVICE, RemoteWhisperModel
+
+logger = logging.getLogger(__name__)
 
 # ===============================
 # ENVIRONMENT CONFIG
@@ -43,52 +91,80 @@ FAST_MODE = os.environ.get("FAST_MODE", "true").lower() == "true"  # Default: en
 # ===============================
 # OLLAMA CONFIG (FAST + STABLE)
 # ===============================
-# Auto-detect Ollama path (OS-aware)
-# First try PATH detection (most portable)
-OLLAMA_CMD = shutil.which("ollama")
+# Ollama executable for the CLI transport. Found on the first CLI call, not at import:
+# nodes using a remote Ollama over HTTP have no local binary and must still start.
+# Set OLLAMA_CMD to skip the search.
+OLLAMA_CMD = os.environ.get("OLLAMA_CMD") or None
 
-# If not in PATH, use OS-specific default paths
-if not OLLAMA_CMD:
+
+def find_ollama_cmd():
+    """
+    Path of the Ollama executable: PATH first, then the OS default install locations.
+
+    Raises:
+        FileNotFoundError: Ollama is not installed
+    """
+    global OLLAMA_CMD
+    if OLLAMA_CMD:
+        return OLLAMA_CMD
+    candidates = []
     if platform.system() == "Windows":
-        # Windows default installation path
-        windows_path = r"C:\Users\Hp\AppData\Local\Programs\Ollama\ollama.exe"
-        if os.path.exists(windows_path):
-            OLLAMA_CMD = windows_path
-        else:
-            # Try common Windows locations
-            alt_paths = [
-                os.path.expanduser(r"~\AppData\Local\Programs\Ollama\ollama.exe"),
-                r"C:\Program Files\Ollama\ollama.exe",
-            ]
-            for alt_path in alt_paths:
-                if os.path.exists(alt_path):
-                    OLLAMA_CMD = alt_path
-                    break
-    
-    if not OLLAMA_CMD:
-        # Linux/macOS default paths
-        linux_paths = [
-            "/usr/local/bin/ollama",
-            "/usr/bin/ollama",
-            os.path.expanduser("~/bin/ollama"),
+        candidates += [
+            r"C:\Users\Hp\AppData\Local\Programs\Ollama\ollama.exe",
+            os.path.expanduser(r"~\AppData\Local\Programs\Ollama\ollama.exe"),
+            r"C:\Program Files\Ollama\ollama.exe",
         ]
-        for linux_path in linux_paths:
-            if os.path.exists(linux_path):
-                OLLAMA_CMD = linux_path
-                break
+    # Linux/macOS default paths
+    candidates += ["/usr/local/bin/ollama", "/usr/bin/ollama", os.path.expanduser("~/bin/ollama")]
+    found = shutil.which("ollama") or next((p for p in candidates if os.path.exists(p)), None)
+    if not found:
+        raise FileNotFoundError(
+            "Ollama not found. Please install Ollama from https://ollama.com "
+            "or ensure 'ollama' is in your PATH (or set OLLAMA_CMD)."
+        )
+    OLLAMA_CMD = found
+    return found
 
-# Final check: raise error if Ollama not found
-if not OLLAMA_CMD:
-    raise RuntimeError(
-        "Ollama not found. Please install Ollama from https://ollama.com\n"
-        "Or ensure 'ollama' is in your PATH."
-    )
 
 OLLAMA_MODEL = "gemma2:2b"  # Fast model, good for MCQs. Alternatives: "llama3", "mistral"
 OLLAMA_ENRICHMENT_MODEL = "gemma2:2b"  # Fast model for enrichment (faster than mistral:7b, avoids timeouts)
-MAX_TRANSCRIPT_CHARS = 2000 if FAST_MODE else 3000   # Reduced for faster processing in fast mode
+MAX_TRANSCRIPT_TOKENS = 500 if FAST_MODE else 750   # Transcript budget in model tokens (smaller in fast mode)
+MAX_TRANSCRIPT_CHARS = MAX_TRANSCRIPT_TOKENS * 4   # Legacy character budget (~4 chars/token)
+ENRICHED_CONTEXT_TOKENS = 1500  # Extra room for enriched knowledge in the MCQ prompt
+MAX_CONTEXT_TOKENS = MAX_TRANSCRIPT_TOKENS + ENRICHED_CONTEXT_TOKENS  # Transcript + enriched knowledge
 WHISPER_MODEL = "tiny" if FAST_MODE else "base"  # Faster model in fast mode
 
+# "cli"  → `ollama run` subprocess (default; timeouts adapt, num_ctx/num_predict use model defaults)
+# "http" → native /api/chat on OLLAMA_HOST (per-call num_ctx/num_predict + exact token stats),
+#          or on the endpoint pools from OLLAMA_ENDPOINTS (see ollama_pool.py)
+OLLAMA_TRANSPORT = os.environ.get("OLLAMA_TRANSPORT", "cli").lower()
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434").rstrip("/")
+if not OLLAMA_HOST.startswith("http"):
+    OLLAMA_HOST = "http://" + OLLAMA_HOST
+
+# How long Ollama keeps a model loaded after a call, sent with EVERY call (a call without
+# it resets the model to the server default of 5 minutes, and the next request after an
+# idle spell pays the model load again). Duration ("30m", "24h"), negative = never
+# unload, empty = server default
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "24h").strip()
+if OLLAMA_KEEP_ALIVE.lstrip("-").isdigit():
+    OLLAMA_KEEP_ALIVE += "s"  # Bare seconds (the Ollama server's own env format)
+# Seconds to establish the HTTP connection to an Ollama endpoint; a blackholed
+# endpoint fails over after this instead of after the whole call budget
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "5"))
+
+# Expected output size per call type (tokens) - drives num_predict and timeouts
+TOKENS_PER_MCQ = 110
+TOPIC_EXTRACTION_TOKENS = 200
+QUERY_GENERATION_TOKENS = 150
+SYNTHESIS_TOKENS = 450
+TOPIC_TRANSCRIPT_TOKENS = 500   # Transcript excerpt used for topic extraction
+SYNTHESIS_SOURCE_TOKENS = 750   # Web source text per topic used for synthesis
+
+# Set TRANSCRIPT_COMPRESSION=false to go back to plain head truncation of the transcript
+# (compression keeps the most informative sentences, in order, within the same budget)
+TRANSCRIPT_COMPRESSION = os.environ.get("TRANSCRIPT_COMPRESSION", "true").lower() == "true"
+
 # ===============================
 # AGENT-03: WEB SEARCH CONFIG
 # ===============================
@@ -103,6 +179,12 @@ APPROVED_DOMAINS = [
     "gov",  # Government sites
     "org"   # Non-profit organizations (trusted ones)
 ]
+# Extra trusted domains, comma-separated (internal mirrors, the offline benchmark's web stub)
+APPROVED_DOMAINS += [d.strip() for d in os.environ.get("EXTRA_APPROVED_DOMAINS", "").split(",") if d.strip()]
+
+# Search backends (overridable for mirrors / the offline benchmark's web stub)
+WIKIPEDIA_API_URL = os.environ.get("WIKIPEDIA_API_URL", "https://en.wikipedia.org/api/rest_v1").rstrip("/")
+DUCKDUCKGO_SEARCH_URL = os.environ.get("DUCKDUCKGO_SEARCH_URL", "https://html.duckduckgo.com/html/")
 
 GENERIC_WORDS = {
     "machine", "device", "system", "technology",
@@ -117,13 +199,286 @@ GENERIC_WORDS = {
 # Set to False for strict exam-grade validation - good for production/exams
 FETCH_ALL_TOPICS = False  # 🔥 Set to False for production (faster, exam-safe)
 
+# Full mode overlaps enrichment with MCQ generation: transcript-grounded questions start
+# immediately, and ENRICHMENT_QUOTA questions are generated from the enriched context
+# once it lands. Enrichment still running ENRICHMENT_DEADLINE seconds after the start
+# is dropped (the quota is then filled from the transcript).
+SPECULATIVE_PIPELINE = os.environ.get("SPECULATIVE_PIPELINE", "true").lower() == "true"
+ENRICHMENT_QUOTA = 6
+ENRICHMENT_DEADLINE = float(os.environ.get("ENRICHMENT_DEADLINE", "120"))
+
+# Audio transcribed per Whisper call when the request is cancellable; the
+# cancellation token is checked between segments
+WHISPER_SEGMENT_SECONDS = float(os.environ.get("WHISPER_SEGMENT_SECONDS", "60"))
+WHISPER_SAMPLE_RATE = 16000  # whisper.audio.SAMPLE_RATE (no whisper import where ASR runs remotely)
+
+# Primary topic extractor for enrichment mode:
+#   "llm"   → Ollama topic extraction, local keyphrase extractor as fallback
+#   "local" → local keyphrase extractor only (no LLM round trip, deterministic)
+TOPIC_EXTRACTOR = os.environ.get("TOPIC_EXTRACTOR", "llm").lower()
+
+# Set BATCH_ENRICHMENT=false to go back to one Ollama call per topic for
+# query generation and synthesis (batched: one call each for all topics)
+BATCH_ENRICHMENT = os.environ.get("BATCH_ENRICHMENT", "true").lower() == "true"
+
+# Where Agent-03 gets its source material:
+#   "web"       → Wikipedia API + DuckDuckGo (approved domains only)
+#   "local"     → offline BM25 knowledge index only (KNOWLEDGE_INDEX_DIR, air-gapped nodes)
+#   "local+web" → local index first, web search only for topics it doesn't cover
+ENRICHMENT_SOURCE = os.environ.get("ENRICHMENT_SOURCE", "web").lower()
+# A local passage only counts as covering a topic when it contains at least this share
+# of the topic's terms (BM25 also ranks a passage sharing one common word, e.g. "learning")
+LOCAL_KNOWLEDGE_MIN_COVERAGE = float(os.environ.get("LOCAL_KNOWLEDGE_MIN_COVERAGE", "0.6"))
+# Optional BM25 score floor on top of the coverage check (0 = off; scale depends on the corpus)
+LOCAL_KNOWLEDGE_MIN_SCORE = float(os.environ.get("LOCAL_KNOWLEDGE_MIN_SCORE", "0"))
+
+# ===============================
+# PIPELINE PROFILES (PER-REQUEST CONFIG)
+# ===============================
+# The module globals above are the process defaults. A PipelineConfig carries the
+# speed/quality settings for ONE request, so a single warm process (with its loaded
+# Whisper models) can serve "fast preview" and "exam-grade" quizzes side by side.
+WHISPER_MODELS = {
+    "tiny", "tiny.en", "base", "base.en", "small", "small.en",
+    "medium", "medium.en", "large", "large-v2", "large-v3", "turbo",
+}
+TOPIC_EXTRACTORS = {"llm", "local"}
+ENRICHMENT_SOURCES = {"web", "local", "local+web"}
+
+# Ollama models a request may select (comma-separated env, in addition to the configured
+# defaults) - `ollama run` pulls unknown models, so request input must never pick freely
+ALLOWED_OLLAMA_MODELS = {
+    m.strip() for m in os.environ.get("ALLOWED_OLLAMA_MODELS", "").split(",") if m.strip()
+} | {OLLAMA_MODEL, OLLAMA_ENRICHMENT_MODEL}
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """Speed/quality settings for one quiz generation request"""
+    profile: str = "default"
+    fast_mode: bool = FAST_MODE                     # Skip Agent-03 enrichment, fewer retries
+    max_transcript_tokens: int = MAX_TRANSCRIPT_TOKENS
+    whisper_model: str = WHISPER_MODEL
+    ollama_model: str = OLLAMA_MODEL
+    enrichment_model: str = OLLAMA_ENRICHMENT_MODEL
+    fetch_all_topics: bool = FETCH_ALL_TOPICS
+    topic_extractor: str = TOPIC_EXTRACTOR
+    enrichment_source: str = ENRICHMENT_SOURCE
+    max_retries: int = 3 if FAST_MODE else 10
+
+    @property
+    def max_context_tokens(self):
+        return self.max_transcript_tokens + ENRICHED_CONTEXT_TOKENS
+
+    def validate(self):
+        """Raise ValueError if any setting is unsupported (checked before any work starts)"""
+        if self.whisper_model not in WHISPER_MODELS:
+            raise ValueError(f"Unsupported whisper_model: {self.whisper_model}")
+        for field_name in ("ollama_model", "enrichment_model"):
+            model = getattr(self, field_name)
+            if model not in ALLOWED_OLLAMA_MODELS:
+                raise ValueError(
+                    f"{field_name} '{model}' is not allowed. "
+                    f"Allowed: {', '.join(sorted(ALLOWED_OLLAMA_MODELS))}"
+                )
+        if not 100 <= self.max_transcript_tokens <= 8192:
+            raise ValueError("max_transcript_tokens must be between 100 and 8192")
+        if self.topic_extractor not in TOPIC_EXTRACTORS:
+            raise ValueError(f"Unsupported topic_extractor: {self.topic_extractor}")
+        if self.enrichment_source not in ENRICHMENT_SOURCES:
+            raise ValueError(f"Unsupported enrichment_source: {self.enrichment_source}")
+        if not 0 <= self.max_retries <= 20:
+            raise ValueError("max_retries must be between 0 and 20")
+        return self
+
+    def to_dict(self):
+        return asdict(self)
+
+    def fingerprint(self):
+        """Short stable hash of all settings (requests with equal fingerprints produce equal quizzes)"""
+        payload = json.dumps(self.to_dict(), sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+PIPELINE_PROFILES = {
+    # Fast preview: no enrichment, tiny Whisper, short transcript budget (~30 seconds)
+    "fast": dict(fast_mode=True, max_transcript_tokens=500, whisper_model="tiny", max_retries=3),
+    # Exam-grade: Agent-03 enrichment (strict topics), base Whisper, larger budget
+    "exam": dict(fast_mode=False, max_transcript_tokens=750, whisper_model="base",
+                 fetch_all_topics=False, max_retries=10),
+}
+
+def default_pipeline_config():
+    """Process-default config built from the current module globals"""
+    return PipelineConfig(
+        fast_mode=FAST_MODE,
+        max_transcript_tokens=MAX_TRANSCRIPT_TOKENS,
+        whisper_model=WHISPER_MODEL,
+        ollama_model=OLLAMA_MODEL,
+        enrichment_model=OLLAMA_ENRICHMENT_MODEL,
+        fetch_all_topics=FETCH_ALL_TOPICS,
+        topic_extractor=TOPIC_EXTRACTOR,
+        enrichment_source=ENRICHMENT_SOURCE,
+        max_retries=3 if FAST_MODE else 10,
+    )
+
+def get_pipeline_config(profile=None, **overrides):
+    """
+    Build and validate a PipelineConfig for one request.
+    
+    Args:
+        profile: "fast", "exam" or None (process defaults)
+        **overrides: Individual PipelineConfig fields (None values are ignored)
+        
+    Returns:
+        Validated PipelineConfig
+        
+    Raises:
+        ValueError: Unknown profile/field or invalid setting
+    """
+    config = default_pipeline_config()
+    if profile:
+        if profile not in PIPELINE_PROFILES:
+            raise ValueError(
+                f"Unknown pipeline profile: {profile}. Available: {', '.join(sorted(PIPELINE_PROFILES))}"
+            )
+        config = replace(config, profile=profile, **PIPELINE_PROFILES[profile])
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    try:
+        config = replace(config, **overrides)
+    except TypeError as e:
+        raise ValueError(f"Invalid pipeline option: {e}")
+    return config.validate()
+
+# ===============================
+# WHISPER MODEL CACHE (SHARED BY ALL REQUESTS)
+# ===============================
+_whisper_models = {}
+_whisper_models_lock = threading.Lock()
+
+def load_whisper_model(name):
+    """
+    Whisper model for transcription: the local warm instance, or a proxy to the
+    ASR worker processes when ASR_SERVICE is set (nothing loaded in this process)
+    """
+    if ASR_SERVICE:
+        return RemoteWhisperModel(name)
+    return load_local_whisper_model(name)
+
+def load_local_whisper_model(name):
+    """Load a Whisper model once per process; later requests reuse the warm instance"""
+    with _whisper_models_lock:
+        model = _whisper_models.get(name)
+        record_cache("whisper_model", model is not None)
+        if model is None:
+            import whisper
+            configure_torch_threads()
+            model = whisper.load_model(name)
+            _whisper_models[name] = model
+        return model
+
+def warm_up_whisper(name):
+    """Load a Whisper model and transcribe one second of silence (first-call setup off the request path)"""
+    model = load_whisper_model(name)
+    with resource_slot("whisper"), pinned("whisper"):
+        model.transcribe(np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32))
+
+def sample_audio_chunks(audio, sample_rate, total_seconds, chunk_seconds=SAMPLE_CHUNK_SECONDS):
+    """Evenly spaced chunks covering total_seconds of the audio (whole lecture, thinner)"""
+    chunk = int(chunk_seconds * sample_rate)
+    n_chunks = max(1, int(total_seconds // chunk_seconds))
+    if len(audio) <= chunk * n_chunks:
+        return audio
+    starts = np.linspace(0, len(audio) - chunk, n_chunks).astype(np.int64)
+    return np.concatenate([audio[start:start + chunk] for start in starts])
+
+@stage_timer("audio_decode")
+def decode_audio(audio_path, sample_rate):
+    """
+    Decode audio to mono float32 PCM like whisper.load_audio, but with the ffmpeg
+    thread budget / cores and a cancellable process.
+    """
+    result = run_process(
+        ["ffmpeg", "-nostdin", *ffmpeg_thread_args(), "-i", audio_path,
+         "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"],
+        stage="ffmpeg",
+        cpus=process_cpus("ffmpeg")
+    )
+    set_attributes(input_bytes=os.path.getsize(audio_path), pcm_bytes=len(result.stdout),
+                   returncode=result.returncode)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to load audio: {result.stderr.decode(errors='replace')[-500:]}")
+    return np.frombuffer(result.stdout, np.int16).flatten().astype(np.float32) / 32768.0
+
+def transcribe_audio_file(audio_path, model_name, config=None, scheduler=None):
+    """
+    Transcribe an audio file with Whisper.
+    
+    With a deadline scheduler the Whisper model and audio coverage are chosen
+    from the measured real-time factor and the time left for the request.
+    """
+    sample_rate = WHISPER_SAMPLE_RATE
+    with resource_slot("ffmpeg"):
+        audio = decode_audio(audio_path, sample_rate)
+    if scheduler is not None:
+        config = replace(config or default_pipeline_config(), whisper_model=model_name)
+        model_name, sample_seconds = scheduler.plan_transcription(config, len(audio) / sample_rate)
+        if sample_seconds:
+            audio = sample_audio_chunks(audio, sample_rate, sample_seconds)
+    
+    model = load_whisper_model(model_name)
+    with resource_slot("whisper"), pinned("whisper"):
+        started = time.monotonic()
+        text = _run_whisper(model, model_name, audio, sample_rate)
+        stage_timings.record_whisper(model_name, len(audio) / sample_rate, time.monotonic() - started)
+    return text
+
+@stage_timer("whisper")
+def _run_whisper(model, model_name, audio, sample_rate):
+    set_attributes(model=model_name, audio_seconds=round(len(audio) / sample_rate, 1))
+    token = current_token()
+    if token is None:
+        text = model.transcribe(audio)["text"]
+    else:
+        # Segment by segment so a cancelled request stops Whisper mid-file
+        segment = int(WHISPER_SEGMENT_SECONDS * sample_rate)
+        texts, language = [], None
+        for start in range(0, len(audio), segment):
+            if token.cancelled:
+                seconds_left = (len(audio) - start) / sample_rate
+                cancellation_stats.record(
+                    "stopped_transcriptions", seconds_left * stage_timings.whisper_rtf(model_name)
+                )
+                token.raise_if_cancelled()
+            result = model.transcribe(
+                audio[start:start + segment],
+                language=language,
+                initial_prompt=texts[-1][-200:] if texts else None  # Carry context across the cut
+            )
+            language = language or result.get("language")
+            texts.append(result["text"].strip())
+        text = " ".join(texts)
+    return text
+
 # ===============================
 # YOUTUBE TRANSCRIPT FETCHER
 # ===============================
 class YouTubeTranscriptFetcher:
+    # Errors meaning "this video has no usable captions" - the API itself is fine
+    NO_TRANSCRIPT_ERRORS = (
+        "TranscriptsDisabled", "NoTranscriptFound", "NoTranscriptAvailable", "VideoUnavailable",
+        "NotTranslatable", "TranslationLanguageNotAvailable",
+    )
+
     def __init__(self):
         from youtube_transcript_api import YouTubeTranscriptApi
         self.api = YouTubeTranscriptApi
+        self.breaker = get_breaker("youtube_transcript")
+
+    def _is_upstream_failure(self, error):
+        if type(error) is RuntimeError:
+            return False  # Our own "no usable transcript" error
+        return type(error).__name__ not in self.NO_TRANSCRIPT_ERRORS
 
     def extract_video_id(self, url):
         parsed = urlparse(url)
@@ -134,31 +489,88 @@ class YouTubeTranscriptFetcher:
         raise ValueError("Invalid YouTube URL")
 
     def fetch(self, url):
+        """
+        Raises:
+            CircuitOpen: The transcript API is failing; skip straight to the fallback
+            RuntimeError: No usable transcript for this video
+        """
         vid = self.extract_video_id(url)
+        with timed_stage("transcript_fetch"), resource_slot("http"):
+            set_attributes(video_id=vid)
+            with self.breaker.guard(is_failure=self._is_upstream_failure):
+                return self._fetch(vid)
 
+    def _fetch(self, vid):
         # 1️⃣ Try English transcript
         try:
-            t = self.api.get_transcript(vid, languages=["en"])
+            with span("transcript_api.get", video_id=vid, language="en") as s:
+                t = self.api.get_transcript(vid, languages=["en"])
+                if s:
+                    s.set(segments=len(t))
             return " ".join(x["text"] for x in t)
-        except:
-            pass
+        except Exception as e:
+            if self._is_upstream_failure(e):
+                raise  # Blocked / unreachable: the Hindi attempt would fail the same way
 
         # 2️⃣ Try Hindi auto → translate to English
         try:
-            t = self.api.get_transcript(vid, languages=["hi"])
-            t = self.api.translate_transcript(t, "en")
+            with span("transcript_api.get", video_id=vid, language="hi", translate_to="en") as s:
+                t = self.api.get_transcript(vid, languages=["hi"])
+                t = self.api.translate_transcript(t, "en")
+                if s:
+                    s.set(segments=len(t))
             return " ".join(x["text"] for x in t)
-        except:
+        except Exception as e:
+            if self._is_upstream_failure(e):
+                raise
             raise RuntimeError("Transcript unavailable or corrupted")
 
+# Query parameters of signed URLs that change per signing, not per file: S3 (X-Amz-*),
+# GCS (X-Goog-*, GoogleAccessId), CloudFront, Azure SAS, Akamai, generic tokens
+URL_SIGNATURE_PARAMS = {
+    "expires", "signature", "key-pair-id", "policy", "googleaccessid", "token", "access_token",
+    "sig", "se", "st", "sp", "sv", "sr", "spr", "ss", "srt", "skoid", "sktid", "skt", "ske", "sks", "skv",
+    "hdnts", "hdnea", "awsaccesskeyid",
+}
+URL_SIGNATURE_PREFIXES = ("x-amz-", "x-goog-")
+
+def canonical_video_id(url):
+    """
+    Stable identifier for a video URL, used as a cache/bank key.
+
+    YouTube URLs map to "youtube:<video id>". Direct video URLs map to
+    "url:<host><path>[?<query>]" with signature / expiry parameters removed
+    (URL_SIGNATURE_PARAMS), so re-signed S3/CDN links keep one identity while
+    query parameters that select the file (e.g. Google Drive ?id=) stay in it.
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    if host in ("www.youtube.com", "youtube.com", "m.youtube.com"):
+        vid = parse_qs(parsed.query).get("v")
+        if vid:
+            return f"youtube:{vid[0]}"
+    if host == "youtu.be":
+        return f"youtube:{parsed.path.lstrip('/').split('?')[0]}"
+    kept = sorted(
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not _is_signature_param(name)
+    )
+    return f"url:{host}{parsed.path}" + (f"?{urlencode(kept)}" if kept else "")
+
+def _is_signature_param(name):
+    name = name.lower()
+    return name in URL_SIGNATURE_PARAMS or name.startswith(URL_SIGNATURE_PREFIXES)
+
 # ===============================
 # WHISPER FALLBACK (LAST RESORT)
 # ===============================
 class WhisperAudioTranscriber:
-    def __init__(self, model="base"):
-        import yt_dlp, whisper
+    def __init__(self, model="base", config=None):
+        import yt_dlp
         self.yt_dlp = yt_dlp
-        self.model = whisper.load_model(model)
+        self.config = config
+        self.model_name = model
+        self.model = load_whisper_model(model)
 
     def download_audio(self, url):
         """Download audio from YouTube URL and return path to MP3 file"""
@@ -183,6 +595,8 @@ class WhisperAudioTranscriber:
             "no_warnings": True,
             "retries": 10,
             "fragment_retries": 10,
+            # Abort the download as soon as the request is cancelled
+            "progress_hooks": [lambda _: check_cancelled()],
             "user_agent": (
                 "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                 "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -202,7 +616,8 @@ class WhisperAudioTranscriber:
                 break
 
         try:
-            with self.yt_dlp.YoutubeDL(opts) as ydl:
+            with resource_slot("http"), span("yt_dlp.download", url=url) as s, \
+                    self.yt_dlp.YoutubeDL(opts) as ydl:
                 ydl.download([url])
             
             # Verify file was created
@@ -219,6 +634,8 @@ class WhisperAudioTranscriber:
                         break
                 else:
                     raise RuntimeError(f"Audio file not found after download: {audio_path}")
+            if s:
+                s.set(bytes=os.path.getsize(audio_path))
             
             return audio_path
         except Exception as e:
@@ -228,18 +645,24 @@ class WhisperAudioTranscriber:
                     os.remove(audio_path)
                 except:
                     pass
+            token = current_token()
+            if token is not None and token.cancelled:
+                cancellation_stats.record("aborted_downloads")
+                raise OperationCancelled(f"Audio download cancelled: {token.reason}")
             raise RuntimeError(f"Failed to download audio: {str(e)}")
 
-    def transcribe(self, url):
+    def transcribe(self, url, scheduler=None):
         """Transcribe audio from YouTube URL using Whisper"""
         audio_path = None
         try:
-            audio_path = self.download_audio(url)
+            with timed_stage("media_download"):
+                audio_path = self.download_audio(url)
             if not os.path.exists(audio_path):
                 raise RuntimeError(f"Audio file not found: {audio_path}")
             
-            result = self.model.transcribe(audio_path)
-            return result["text"]
+            return transcribe_audio_file(audio_path, self.model_name, self.config, scheduler)
+        except OperationCancelled:
+            raise
         except Exception as e:
             raise RuntimeError(f"Whisper transcription failed: {str(e)}")
         finally:
@@ -258,11 +681,14 @@ class VideoURLTranscriber:
     Transcribe videos from direct URLs (S3, CDN, HTTPS).
     Works with any HTTP/HTTPS video URL - no YouTube, no yt-dlp, no cookies.
     """
-    def __init__(self, model=None):
-        import whisper
+    def __init__(self, model=None, config=None):
+        config = config or default_pipeline_config()
         if model is None:
-            model = WHISPER_MODEL  # Use global FAST_MODE setting
-        self.model = whisper.load_model(model)
+            model = config.whisper_model  # Per-request profile (defaults to FAST_MODE setting)
+        self.config = config
+        self.model_name = model
+        self.model = load_whisper_model(model)
+        self.io_timeout = 120 if config.fast_mode else 300
 
     def download_video(self, video_url: str) -> str:
         """Download video from URL and return path to local file"""
@@ -275,15 +701,27 @@ class VideoURLTranscriber:
         video_path = temp_file.name
 
         try:
+            import requests
             # Download with streaming for large files
-            response = requests.get(video_url, stream=True, timeout=120 if FAST_MODE else 300)
-            response.raise_for_status()
-            
-            with open(video_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=1024 * 1024):  # 1MB chunks
-                    if chunk:
-                        f.write(chunk)
-            
+            token = current_token()
+            with resource_slot("http"), span("http.get", url=video_url, stream=True) as s:
+                response = requests.get(video_url, stream=True, timeout=self.io_timeout)
+                if s:
+                    s.set(status_code=response.status_code)
+                response.raise_for_status()
+
+                downloaded = 0
+                with response, open(video_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):  # 1MB chunks
+                        if token is not None and token.cancelled:
+                            cancellation_stats.record("aborted_downloads")
+                            token.raise_if_cancelled()
+                        if chunk:
+                            f.write(chunk)
+                            downloaded += len(chunk)
+                if s:
+                    s.set(bytes=downloaded)
+
             if not os.path.exists(video_path) or os.path.getsize(video_path) == 0:
                 raise RuntimeError(f"Downloaded file is empty or missing: {video_path}")
             
@@ -295,8 +733,11 @@ class VideoURLTranscriber:
                     os.remove(video_path)
                 except:
                     pass
+            if isinstance(e, OperationCancelled):
+                raise
             raise RuntimeError(f"Failed to download video from URL: {str(e)}")
 
+    @stage_timer("audio_extract")
     def extract_audio(self, video_path: str) -> str:
         """Extract audio from video using FFmpeg"""
         audio_path = video_path.replace(".mp4", ".mp3")
@@ -306,21 +747,27 @@ class VideoURLTranscriber:
             audio_path = os.path.splitext(video_path)[0] + ".mp3"
         
         try:
-            # Use FFmpeg to extract audio
-            result = subprocess.run(
-                [
-                    "ffmpeg", "-y",  # -y: overwrite output file
-                    "-i", video_path,
-                    "-vn",  # No video
-                    "-acodec", "libmp3lame",  # MP3 codec
-                    "-ab", "192k",  # Audio bitrate
-                    audio_path
-                ],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,
-                check=True,
-                timeout=120 if FAST_MODE else 300
-            )
+            # Use FFmpeg to extract audio (process tree killed on timeout/cancellation)
+            with resource_slot("ffmpeg"):
+                result = run_process(
+                    [
+                        "ffmpeg", "-y",  # -y: overwrite output file
+                        *ffmpeg_thread_args(),
+                        "-i", video_path,
+                        "-vn",  # No video
+                        "-acodec", "libmp3lame",  # MP3 codec
+                        "-ab", "192k",  # Audio bitrate
+                        audio_path
+                    ],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    timeout=self.io_timeout,
+                    stage="ffmpeg",
+                    cpus=process_cpus("ffmpeg")
+                )
+            set_attributes(input_bytes=os.path.getsize(video_path), returncode=result.returncode)
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(result.returncode, result.args, stderr=result.stderr)
             
             if not os.path.exists(audio_path):
                 raise RuntimeError(f"Audio extraction failed: {audio_path}")
@@ -336,7 +783,7 @@ class VideoURLTranscriber:
                 "  macOS: brew install ffmpeg"
             )
 
-    def transcribe_from_url(self, video_url: str) -> str:
+    def transcribe_from_url(self, video_url: str, scheduler=None) -> str:
         """
         Transcribe video from URL (S3, CDN, HTTPS).
         
@@ -348,6 +795,8 @@ class VideoURLTranscriber:
         
         Args:
             video_url: HTTP/HTTPS URL to video file (e.g., S3 URL)
+            scheduler: Optional DeadlineScheduler (may switch the Whisper model
+                or sample the audio to meet the request deadline)
             
         Returns:
             Transcribed text string
@@ -356,16 +805,16 @@ class VideoURLTranscriber:
         audio_path = None
         
         try:
-            # Step 1: Download video
-            video_path = self.download_video(video_url)
-            
-            # Step 2: Extract audio
-            audio_path = self.extract_audio(video_path)
+            # Step 1-2: Download video, extract audio
+            with timed_stage("media_download"):
+                video_path = self.download_video(video_url)
+                audio_path = self.extract_audio(video_path)
             
             # Step 3: Transcribe
-            result = self.model.transcribe(audio_path)
-            return result["text"]
+            return transcribe_audio_file(audio_path, self.model_name, self.config, scheduler)
             
+        except OperationCancelled:
+            raise
         except Exception as e:
             raise RuntimeError(f"Video transcription failed: {str(e)}")
         finally:
@@ -377,20 +826,258 @@ class VideoURLTranscriber:
                     except Exception:
                         pass  # Ignore cleanup errors
 
+# ===============================
+# OLLAMA CALL (TOKEN-BUDGETED)
+# ===============================
+def _ollama_cli_args(model, prompt):
+    keep_alive = [f"--keepalive={OLLAMA_KEEP_ALIVE}"] if OLLAMA_KEEP_ALIVE else []
+    return [find_ollama_cmd(), "run", *keep_alive, model, prompt]
+
+def _call_ollama_cli(prompt, model, budget):
+    start = time.monotonic()
+    # Own process group: timeout/cancellation kills `ollama run` and anything it spawned
+    result = run_process(
+        _ollama_cli_args(model, prompt),
+        text=True,
+        encoding='utf-8',
+        errors='replace',  # Replace invalid chars instead of failing
+        timeout=budget.timeout,
+        stage="ollama"
+    )
+    elapsed = time.monotonic() - start
+    
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"Ollama failed with return code {result.returncode}\n"
+            f"Error: {result.stderr}\n"
+            f"Make sure Ollama is installed at: {OLLAMA_CMD}\n"
+            f"And model is pulled: ollama pull {model}"
+        )
+    
+    # The CLI reports no token stats: attribute the time not spent on the prompt to generation
+    prompt_seconds = budget.prompt_tokens / throughput.get(model)["prompt_tps"]
+    eval_tokens = count_tokens(result.stdout, model)
+    throughput.record(
+        model,
+        eval_tokens=eval_tokens,
+        eval_seconds=max(elapsed - prompt_seconds, 0.1 * elapsed)
+    )
+    return result.stdout, budget.prompt_tokens, eval_tokens
+
+def _call_ollama_http(prompt, model, budget, host=OLLAMA_HOST):
+    url = f"{host}/api/chat"
+    with span("ollama.http", endpoint=host, model=model) as s:
+        text, prompt_tokens, eval_tokens, received = _stream_ollama_chat(url, prompt, model, budget)
+        if s:
+            s.set(bytes=received, prompt_tokens=prompt_tokens, eval_tokens=eval_tokens)
+    return text, prompt_tokens, eval_tokens
+
+def _stream_ollama_chat(url, prompt, model, budget):
+    import requests
+    token = current_token()
+    started = time.monotonic()
+    received = 0
+    try:
+        # Streamed so the call can stop between chunks; closing the connection
+        # makes Ollama stop generating for a cancelled request
+        response = requests.post(
+            url,
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "stream": True,
+                **({"keep_alive": OLLAMA_KEEP_ALIVE} if OLLAMA_KEEP_ALIVE else {}),
+                "options": {
+                    "num_ctx": budget.num_ctx,
+                    "num_predict": budget.num_predict,
+                    **ollama_thread_options()
+                },
+            },
+            stream=True,
+            timeout=(min(OLLAMA_CONNECT_TIMEOUT, budget.timeout), budget.timeout)
+        )
+        with response:
+            if response.status_code != 200:
+                raise RuntimeError(
+                    f"Ollama failed with HTTP {response.status_code}\n"
+                    f"Error: {response.text[:500]}\n"
+                    f"Make sure Ollama is running at: {url}\n"
+                    f"And model is pulled: ollama pull {model}"
+                )
+            
+            parts, data = [], {}
+            for line in response.iter_lines():
+                elapsed = time.monotonic() - started
+                if token is not None and token.cancelled:
+                    cancellation_stats.record("aborted_llm_calls", budget.timeout - elapsed)
+                    token.raise_if_cancelled()
+                if elapsed > budget.timeout:
+                    raise subprocess.TimeoutExpired(url, budget.timeout)
+                if not line:
+                    continue
+                received += len(line)
+                data = json.loads(line)
+                parts.append(data.get("message", {}).get("content", ""))
+    except requests.ConnectTimeout:
+        raise  # A ConnectionError too: _call_ollama_pool fails over to another endpoint
+    except requests.Timeout:
+        raise subprocess.TimeoutExpired(url, budget.timeout)
+    
+    # The final chunk carries the token statistics
+    throughput.record(
+        model,
+        prompt_tokens=data.get("prompt_eval_count", 0),
+        prompt_seconds=data.get("prompt_eval_duration", 0) / 1e9,
+        eval_tokens=data.get("eval_count", 0),
+        eval_seconds=data.get("eval_duration", 0) / 1e9,
+        prompt_chars=len(prompt)
+    )
+    return "".join(parts), data.get("prompt_eval_count", 0), data.get("eval_count", 0), received
+
+def _call_ollama_pool(prompt, model, budget, purpose):
+    """HTTP call on the purpose's endpoint pool, failing over on connection errors"""
+    import requests
+    pool = get_ollama_pool(purpose)
+    tried = []
+    while True:
+        with pool.lease(model, exclude=tried) as endpoint:
+            try:
+                with endpoint.breaker.guard():
+                    result = _call_ollama_http(prompt, model, budget, endpoint.url)
+            except (requests.ConnectionError, CircuitOpen) as e:
+                if isinstance(e, requests.ConnectionError):
+                    pool.report_failure(endpoint, e)
+                tried.append(endpoint.url)
+                logger.warning(f"⚠ Ollama endpoint {endpoint.url} unavailable, trying another endpoint")
+                if len(tried) >= len(pool.endpoints):
+                    if isinstance(e, CircuitOpen):
+                        raise
+                    raise RuntimeError(f"No reachable Ollama endpoint in pool '{purpose}': {e}")
+                continue
+        pool.report_success(endpoint, model)
+        return result
+
+def warm_up_ollama(model, endpoint=None, timeout=300):
+    """
+    One-token generation that loads model into memory (kept there for OLLAMA_KEEP_ALIVE).
+    
+    Bypasses the token budget and throughput stats: a cold call is mostly model load.
+    
+    Args:
+        model: Ollama model name
+        endpoint: Ollama server URL (HTTP transport), None = the local CLI
+        timeout: Seconds allowed for the model load
+        
+    Raises:
+        RuntimeError: Ollama returned an error
+        subprocess.TimeoutExpired: Model not loaded within timeout
+        FileNotFoundError: Ollama binary missing (CLI transport)
+    """
+    prompt = "Reply with OK."
+    if endpoint is None:
+        with resource_slot("ollama"):
+            result = run_process(_ollama_cli_args(model, prompt), text=True, encoding="utf-8",
+                                 errors="replace", timeout=timeout, stage="ollama")
+        if result.returncode != 0:
+            raise RuntimeError(f"Ollama failed with return code {result.returncode}: {result.stderr.strip()}")
+        return
+    import requests
+    try:
+        response = requests.post(
+            f"{endpoint}/api/generate",
+            json={
+                "model": model,
+                "prompt": prompt,
+                "stream": False,
+                **({"keep_alive": OLLAMA_KEEP_ALIVE} if OLLAMA_KEEP_ALIVE else {}),
+                "options": {"num_predict": 1},
+            },
+            timeout=timeout
+        )
+    except requests.Timeout:
+        raise subprocess.TimeoutExpired(endpoint, timeout)
+    except requests.RequestException as e:
+        raise RuntimeError(f"Ollama unreachable at {endpoint}: {e}")
+    if response.status_code != 200:
+        raise RuntimeError(f"Ollama failed with HTTP {response.status_code}: {response.text[:200]}")
+
+def call_ollama(prompt, model, num_predict, purpose="mcq"):
+    """
+    Run one Ollama generation with a token-budgeted num_ctx/num_predict and timeout.
+    
+    The timeout is derived from the prompt's token count and the tokens/sec
+    measured for this model on this host (see token_budget.plan_call).
+    
+    Args:
+        prompt: Full prompt text
+        model: Ollama model name
+        num_predict: Expected maximum output tokens
+        purpose: Endpoint pool for the HTTP transport ("mcq" or "enrichment")
+        
+    Returns:
+        Generated text
+        
+    Raises:
+        RuntimeError: Ollama returned an error or no endpoint is healthy
+        CircuitOpen: Every Ollama endpoint for this call is failing (no call made)
+        subprocess.TimeoutExpired: Call exceeded its planned timeout
+        FileNotFoundError: Ollama binary missing (CLI transport)
+        OperationCancelled: The current request was cancelled
+    """
+    check_cancelled()
+    budget = plan_call(prompt, model, num_predict)
+    started = time.monotonic()
+    with span("ollama.call", model=model, purpose=purpose, transport=OLLAMA_TRANSPORT,
+              num_ctx=budget.num_ctx, num_predict=budget.num_predict, timeout=budget.timeout) as s:
+        try:
+            if OLLAMA_TRANSPORT == "http":
+                # Endpoint slots bound the concurrency of pooled calls
+                text, prompt_tokens, eval_tokens = _call_ollama_pool(prompt, model, budget, purpose)
+            else:
+                with resource_slot("ollama"), get_breaker("ollama:local").guard():
+                    text, prompt_tokens, eval_tokens = _call_ollama_cli(prompt, model, budget)
+        except Exception as e:
+            outcome = {
+                OperationCancelled: "cancelled", subprocess.TimeoutExpired: "timeout", CircuitOpen: "circuit_open"
+            }.get(type(e), "error")
+            record_ollama_call(model, purpose, time.monotonic() - started, outcome)
+            raise
+        if s:
+            s.set(prompt_tokens=prompt_tokens, eval_tokens=eval_tokens)
+    record_ollama_call(model, purpose, time.monotonic() - started, "ok", prompt_tokens, eval_tokens)
+    return text
+
 # ===============================
 # CLEAN + SHRINK TRANSCRIPT
 # ===============================
-def clean_transcript(text):
-    text = re.sub(r"\[.*?\]", "", text)
+# Caption tags like [Music] / [Applause]. The tag body cannot contain "[", so every scan
+# stops at the next one - `\[.*?\]` rescanned the rest of the line from EVERY unclosed "["
+# (quadratic: seconds for a few hundred KB of bracket-heavy captions)
+_CAPTION_TAG_RE = re.compile(r"\[[^\[\]\n]*\]")
+
+
+@stage_timer("clean_transcript")
+def clean_transcript(text, config=None):
+    config = config or default_pipeline_config()
+    text = _CAPTION_TAG_RE.sub("", text)
     text = re.sub(r"\s+", " ", text)
-    return text.strip()[:MAX_TRANSCRIPT_CHARS]
+    text = text.strip()
+    if TRANSCRIPT_COMPRESSION:
+        # Relevance-driven: drop filler/repeats, pack the highest-value sentences
+        return compress_transcript(
+            text, config.max_transcript_tokens,
+            count_tokens=lambda sentence: count_tokens(sentence, config.ollama_model)
+        )
+    return truncate_to_tokens(text, config.max_transcript_tokens, config.ollama_model)
 
 # ===============================
 # AGENT-03: WEB SEARCH KNOWLEDGE ENRICHMENT
 # ===============================
 
-def extract_topics_from_transcript(transcript):
+@stage_timer("topic_extraction")
+def extract_topics_from_transcript(transcript, config=None):
     """Extract key topics from transcript using Ollama llama3:8b"""
+    config = config or default_pipeline_config()
     prompt = f"""Extract 5-8 key educational topics from this transcript.
 Focus on specific, testable concepts (not generic words).
 
@@ -398,114 +1085,63 @@ Output as a JSON array of topic strings only.
 Example: ["x-ray radiation", "ionizing radiation safety", "medical imaging risks"]
 
 TRANSCRIPT:
-{transcript[:2000]}
+{truncate_to_tokens(transcript, TOPIC_TRANSCRIPT_TOKENS, config.enrichment_model)}
 
 Output JSON array only:"""
 
     try:
-        result = subprocess.run(
-            [OLLAMA_CMD, "run", OLLAMA_ENRICHMENT_MODEL, prompt],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            timeout=60,
-            check=False
-        )
-        
-        if result.returncode != 0:
-            print(f"   ⚠ LLM topic extraction failed (return code {result.returncode})")
-            return []
+        content = call_ollama(
+            prompt, config.enrichment_model, TOPIC_EXTRACTION_TOKENS, purpose="enrichment"
+        ).strip()
         
-        content = result.stdout.strip()
-        
-        # Debug logging (can be enabled for troubleshooting)
-        # print(f"🧪 Raw LLM output: {content[:500]}")
+        logger.debug(f"🧪 Raw LLM output: {content[:500]}")
         
         # Extract JSON array
         start = content.find("[")
         end = content.rfind("]")
         
         if start == -1 or end == -1:
-            print(f"   ⚠ LLM output missing JSON brackets. Raw: {content[:200]}")
+            logger.warning(f"   ⚠ LLM output missing JSON brackets. Raw: {content[:200]}")
             return []
         
         topics = json.loads(content[start:end + 1])
         topics = topics if isinstance(topics, list) else []
         
         if topics:
-            print(f"   ✓ LLM extracted {len(topics)} topics")
+            logger.info(f"   ✓ LLM extracted {len(topics)} topics")
         else:
-            print(f"   ⚠ LLM returned empty topic list")
-        
+            logger.warning(f"   ⚠ LLM returned empty topic list")
         return topics
     except json.JSONDecodeError as e:
-        print(f"   ⚠ JSON parsing failed: {e}")
+        logger.warning(f"   ⚠ JSON parsing failed: {e}")
         return []
     except Exception as e:
-        print(f"   ⚠ Topic extraction error: {e}")
+        logger.warning(f"   ⚠ Topic extraction error: {e}")
         return []
 
-def fallback_topic_extraction(transcript):
-    """Fallback: Extract topics using keyword matching when LLM fails"""
-    # Common educational keywords/phrases that indicate testable topics
-    keyword_patterns = [
-        # Medical/Health
-        r"\b(?:x-ray|xray|radiation|ionizing radiation|medical imaging|radiology|dose|exposure|safety)\b",
-        r"\b(?:health risk|medical procedure|diagnostic|scan|imaging)\b",
-        # Technology
-        r"\b(?:machine learning|artificial intelligence|neural network|algorithm|data structure)\b",
-        r"\b(?:programming|software|hardware|computer|network|security)\b",
-        # Science
-        r"\b(?:chemical|reaction|molecule|atom|element|compound)\b",
-        r"\b(?:physics|force|energy|wave|particle|quantum)\b",
-        # Business/Economics
-        r"\b(?:marketing|seo|search engine|optimization|business strategy|economics)\b",
-        # General educational
-        r"\b(?:concept|principle|theory|method|technique|process|system)\b",
-    ]
-    
-    found_topics = set()
-    text_lower = transcript.lower()
-    
-    # Extract multi-word phrases that match patterns
-    for pattern in keyword_patterns:
-        matches = re.finditer(pattern, text_lower)
-        for match in matches:
-            # Get context around the match (2-3 words before/after)
-            start = max(0, match.start() - 30)
-            end = min(len(text_lower), match.end() + 30)
-            context = text_lower[start:end]
-            
-            # Extract meaningful phrases
-            words = context.split()
-            if len(words) >= 2:
-                # Try to form 2-3 word phrases
-                for i in range(len(words) - 1):
-                    phrase = " ".join(words[i:i+2])
-                    if len(phrase) > 5:
-                        # In FETCH_ALL mode, don't filter generic words
-                        if FETCH_ALL_TOPICS or not any(gw in phrase for gw in GENERIC_WORDS):
-                            found_topics.add(phrase)
-                for i in range(len(words) - 2):
-                    phrase = " ".join(words[i:i+3])
-                    if len(phrase) > 8:
-                        # In FETCH_ALL mode, don't filter generic words
-                        if FETCH_ALL_TOPICS or not any(gw in phrase for gw in GENERIC_WORDS):
-                            found_topics.add(phrase)
-    
-    topics = list(found_topics)[:8]  # Limit to 8 topics
+@stage_timer("topic_extraction_fallback")
+def fallback_topic_extraction(transcript, config=None):
+    """Fallback: Extract topics locally (vectorized keyphrase ranking) when LLM fails"""
+    config = config or default_pipeline_config()
+    # In FETCH_ALL mode, don't filter generic words
+    topics = extract_keyphrases(
+        transcript,
+        top_k=8,  # Limit to 8 topics
+        exclude_words=frozenset() if config.fetch_all_topics else GENERIC_WORDS
+    )
     if topics:
-        print(f"   ✓ Fallback extracted {len(topics)} topics from keywords")
+        logger.info(f"   ✓ Fallback extracted {len(topics)} topics from keywords")
     return topics
 
-def validate_topics(topics):
+@stage_timer("topic_validation")
+def validate_topics(topics, config=None):
     """
     Topic validation with two modes:
-    - FETCH_ALL_TOPICS = True  → allow everything (research/exploration mode)
-    - FETCH_ALL_TOPICS = False → strict exam-safe validation (production mode)
+    - fetch_all_topics = True  → allow everything (research/exploration mode)
+    - fetch_all_topics = False → strict exam-safe validation (production mode)
     """
-    clean = set()
+    config = config or default_pipeline_config()
+    clean = []
     
     for t in topics:
         if not isinstance(t, str):
@@ -515,8 +1151,8 @@ def validate_topics(topics):
             continue
         
         # 🔥 FETCH ALL MODE: Accept everything (no filtering)
-        if FETCH_ALL_TOPICS:
-            clean.add(t)
+        if config.fetch_all_topics:
+            clean.append(t)
             continue
         
         # -------- STRICT MODE BELOW (Exam-grade safety) --------
@@ -531,7 +1167,7 @@ def validate_topics(topics):
         if len(words) < 2:
             if t in ACCEPTABLE_SINGLE_TERMS:
                 # Accept single term if it's domain-specific
-                clean.add(t)
+                clean.append(t)
             continue  # Otherwise skip single words
         
         # Skip generic words
@@ -546,12 +1182,15 @@ def validate_topics(topics):
         elif has_generic:
             continue
         
-        clean.add(t)
+        clean.append(t)
     
-    return list(clean)
+    # De-duplicate keeping the LLM's order (most relevant topics come first)
+    return list(dict.fromkeys(clean))
 
-def generate_search_queries(topic):
+@stage_timer("query_generation")
+def generate_search_queries(topic, config=None):
     """Generate intelligent web search queries using Ollama llama3:8b"""
+    config = config or default_pipeline_config()
     prompt = f"""Generate 4 high-quality educational web search queries for the topic: "{topic}"
 
 Rules:
@@ -566,20 +1205,9 @@ Example: ["What is {topic}?", "How does {topic} work?", "{topic} health effects"
 Output JSON array only:"""
 
     try:
-        result = subprocess.run(
-            [OLLAMA_CMD, "run", OLLAMA_ENRICHMENT_MODEL, prompt],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            timeout=60,
-            check=False
-        )
-        
-        if result.returncode != 0:
-            return []
-        
-        content = result.stdout.strip()
+        content = call_ollama(
+            prompt, config.enrichment_model, QUERY_GENERATION_TOKENS, purpose="enrichment"
+        ).strip()
         start = content.find("[")
         end = content.rfind("]")
         
@@ -589,9 +1217,68 @@ Output JSON array only:"""
         queries = json.loads(content[start:end + 1])
         return queries if isinstance(queries, list) else []
     except Exception as e:
-        print(f"⚠ Query generation failed for '{topic}': {e}")
+        logger.warning(f"⚠ Query generation failed for '{topic}': {e}")
         return []
 
+def _match_topic_keys(data, topics):
+    """Map keys of an LLM JSON object back to the requested topics (case/space-insensitive)"""
+    if not isinstance(data, dict):
+        return {}
+    by_norm = {str(k).strip().lower(): v for k, v in data.items()}
+    return {t: by_norm[t.strip().lower()] for t in topics if t.strip().lower() in by_norm}
+
+@stage_timer("query_generation")
+def generate_search_queries_batch(topics, config=None):
+    """
+    Generate web search queries for ALL topics in a single Ollama call.
+
+    The model returns a JSON object keyed by topic. Topics missing from the
+    batched output (or with an invalid entry) fall back to generate_search_queries.
+
+    Returns:
+        dict: topic → list of query strings (empty list if generation failed)
+    """
+    config = config or default_pipeline_config()
+    queries_by_topic = {}
+    if len(topics) > 1:
+        topic_list = "\n".join(f'- "{t}"' for t in topics)
+        prompt = f"""Generate 4 high-quality educational web search queries for EACH of these topics:
+{topic_list}
+
+Rules:
+- Use clear academic phrasing
+- Avoid vague wording
+- Focus on explanation, risks, safety, and technical details
+- Each query should be different
+
+Output as a JSON object mapping each topic (exactly as written above) to a JSON array of 4 query strings.
+Example: {{"x-ray radiation": ["What is x-ray radiation?", "How does x-ray radiation work?", "x-ray radiation health effects", "x-ray radiation safety precautions"]}}
+
+Output JSON object only:"""
+
+        try:
+            content = call_ollama(
+                prompt, config.enrichment_model, QUERY_GENERATION_TOKENS * len(topics), purpose="enrichment"
+            ).strip()
+            start = content.find("{")
+            end = content.rfind("}")
+            if start != -1 and end != -1:
+                data = _match_topic_keys(json.loads(content[start:end + 1]), topics)
+                for topic, queries in data.items():
+                    if isinstance(queries, list):
+                        queries = [q for q in queries if isinstance(q, str) and q.strip()]
+                        if queries:
+                            queries_by_topic[topic] = queries
+        except Exception as e:
+            logger.warning(f"⚠ Batched query generation failed: {e}")
+    # Per-topic fallback for anything the batched call didn't cover
+    missing = [t for t in topics if t not in queries_by_topic]
+    if missing and len(topics) > 1:
+        logger.warning(f"   ⚠ Batched queries incomplete, falling back for {len(missing)} topic(s)")
+    for topic in missing:
+        queries_by_topic[topic] = generate_search_queries(topic, config)
+    return queries_by_topic
+
 def is_approved_domain(url):
     """Check if URL is from an approved domain"""
     try:
@@ -611,15 +1298,50 @@ def is_approved_domain(url):
     except:
         return False
 
+def _web_breaker(url):
+    """
+    Breaker per named upstream site (APPROVED_DOMAINS entries; all Wikipedia
+    hosts share one). Hosts only approved by TLD (any .edu/.gov/.org) share
+    "web:other", so arbitrary search results can't grow the breaker registry.
+    """
+    host = (urlparse(url).hostname or "").lower()
+    if host.endswith("wikipedia.org"):
+        return get_breaker("wikipedia")
+    for domain in APPROVED_DOMAINS:
+        if "." in domain and (host == domain or host.endswith("." + domain)):
+            return get_breaker(f"web:{domain}")
+    return get_breaker("web:other")
+
+def _is_http_failure(error):
+    """Server-side / throttling / network errors count against a breaker; 4xx page errors do not"""
+    import requests
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return isinstance(error, requests.RequestException)
+
+def _http_get(url, **kwargs):
+    """requests.get traced as an "http.get" span (URL, status, response bytes)"""
+    import requests
+    with span("http.get", url=url) as s:
+        response = requests.get(url, **kwargs)
+        if s:
+            s.set(status_code=response.status_code, bytes=len(response.content))
+        return response
+
+@stage_timer("web_fetch")
 def fetch_clean_text(url, max_chars=4000):
     """Fetch and clean text content from a web page"""
+    if current_token() is not None and current_token().cancelled:
+        return ""
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+        with resource_slot("http"), _web_breaker(url).guard(is_failure=_is_http_failure):
+            response = _http_get(url, headers=headers, timeout=10)
+            response.raise_for_status()
         
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(response.text, 'html.parser')
         
         # Remove unwanted elements
@@ -635,7 +1357,7 @@ def fetch_clean_text(url, max_chars=4000):
         
         return text[:max_chars]
     except Exception as e:
-        print(f"⚠ Failed to fetch {url}: {e}")
+        logger.warning(f"⚠ Failed to fetch {url}: {e}")
         return ""
 
 def search_wikipedia_direct(query):
@@ -645,10 +1367,13 @@ def search_wikipedia_direct(query):
         topic = query.split()[0:3]  # First few words
         topic = " ".join(topic).lower()
         
-        # Wikipedia API search
-        api_url = "https://en.wikipedia.org/api/rest_v1/page/summary/" + requests.utils.quote(topic)
+        # Wikipedia API search (404 = no such page, not an outage)
+        api_url = f"{WIKIPEDIA_API_URL}/page/summary/" + quote(topic)
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(api_url, headers=headers, timeout=10)
+        with resource_slot("http"), get_breaker("wikipedia").guard(is_failure=_is_http_failure):
+            response = _http_get(api_url, headers=headers, timeout=10)
+            if response.status_code != 404:
+                response.raise_for_status()
         
         if response.status_code == 200:
             data = response.json()
@@ -658,9 +1383,12 @@ def search_wikipedia_direct(query):
         pass
     return []
 
+@stage_timer("web_search")
 def search_web_safely(query, max_results=2):
     """Perform controlled web search (approved domains only)"""
     results = []
+    if current_token() is not None and current_token().cancelled:
+        return results
     
     # Try Wikipedia API first (more reliable)
     wiki_results = search_wikipedia_direct(query)
@@ -669,14 +1397,20 @@ def search_web_safely(query, max_results=2):
     if len(results) >= max_results:
         return results[:max_results]
     
-    # Fallback: DuckDuckGo HTML search
+    # Fallback: DuckDuckGo HTML search (skipped while DuckDuckGo is throttling us)
     try:
-        search_url = f"https://html.duckduckgo.com/html/?q={requests.utils.quote(query)}"
+        import requests
+        from bs4 import BeautifulSoup
+        search_url = f"{DUCKDUCKGO_SEARCH_URL}?q={quote(query)}"
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        response = requests.get(search_url, headers=headers, timeout=10)
-        response.raise_for_status()
+        with resource_slot("http"), get_breaker("duckduckgo").guard():
+            response = _http_get(search_url, headers=headers, timeout=10)
+            response.raise_for_status()
+            if response.status_code != 200:
+                # 202 + anomaly page is DuckDuckGo's rate-limit response
+                raise requests.HTTPError(f"DuckDuckGo returned HTTP {response.status_code}")
         
         soup = BeautifulSoup(response.text, 'html.parser')
         
@@ -694,10 +1428,39 @@ def search_web_safely(query, max_results=2):
     
     return results[:max_results]
 
-def synthesize_knowledge(topic, web_texts):
+@stage_timer("local_search")
+def search_local_knowledge(topic, max_results=3, max_chars=4000):
+    """
+    Look up a topic in the offline knowledge index (BM25) - no network
+
+    Returns:
+        List of {"text", "score", "coverage", ...} hits, best first, that pass
+        LOCAL_KNOWLEDGE_MIN_COVERAGE / LOCAL_KNOWLEDGE_MIN_SCORE ([] = topic not covered)
+    """
+    index = get_knowledge_index()
+    if index is None:
+        return []
+    try:
+        hits = index.search(topic, k=max_results)
+    except Exception as e:
+        logger.warning(f"⚠ Local knowledge search failed for '{topic}': {e}")
+        return []
+    relevant = [
+        {**hit, "text": hit["text"][:max_chars]} for hit in hits
+        if hit.get("text") and hit.get("coverage", 1.0) >= LOCAL_KNOWLEDGE_MIN_COVERAGE
+        and hit["score"] >= LOCAL_KNOWLEDGE_MIN_SCORE
+    ]
+    if hits and not relevant:
+        logger.debug(f"   Local hits for '{topic}' below relevance threshold "
+                     f"(best: score {hits[0]['score']:.2f}, coverage {hits[0].get('coverage')})")
+    return relevant
+
+@stage_timer("knowledge_synthesis")
+def synthesize_knowledge(topic, web_texts, config=None):
     """Synthesize web content into structured knowledge using Ollama llama3:8b"""
+    config = config or default_pipeline_config()
     combined_text = "\n\n---\n\n".join(web_texts[:3])  # Use up to 3 sources
-    combined_text = combined_text[:3000]  # Limit input size
+    combined_text = truncate_to_tokens(combined_text, SYNTHESIS_SOURCE_TOKENS, config.enrichment_model)
     
     prompt = f"""Summarize the following content into a clear, exam-ready explanation for the topic: "{topic}"
 
@@ -714,62 +1477,148 @@ CONTENT:
 Provide a concise, educational summary:"""
 
     try:
-        result = subprocess.run(
-            [OLLAMA_CMD, "run", OLLAMA_ENRICHMENT_MODEL, prompt],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            timeout=60,
-            check=False
-        )
-        
-        if result.returncode != 0:
-            return ""
-        
-        return result.stdout.strip()
+        return call_ollama(prompt, config.enrichment_model, SYNTHESIS_TOKENS, purpose="enrichment").strip()
     except Exception as e:
-        print(f"⚠ Knowledge synthesis failed for '{topic}': {e}")
+        logger.warning(f"⚠ Knowledge synthesis failed for '{topic}': {e}")
         return ""
 
-def enrich_knowledge_with_web_search(transcript):
+# Topic sections are "## <topic>" only: a "###" subheading (or an echoed source
+# marker) inside a section must not cut it short
+_SECTION_RE = re.compile(r"^##[ \t]+(.+?)\s*$", re.MULTILINE)
+
+@stage_timer("knowledge_synthesis")
+def synthesize_knowledge_batch(sources_by_topic, config=None):
+    """
+    Synthesize web content for ALL topics in a single Ollama call.
+
+    The model writes one "## <topic>" section per topic. Topics whose section
+    is missing or empty fall back to synthesize_knowledge.
+
+    Args:
+        sources_by_topic: dict topic → list of fetched web texts
+
+    Returns:
+        dict: topic → knowledge summary ("" if synthesis failed)
+    """
+    config = config or default_pipeline_config()
+    topics = [t for t, texts in sources_by_topic.items() if texts]
+    knowledge_by_topic = {}
+
+    if len(topics) > 1:
+        # Same per-topic input budget as the per-topic calls
+        blocks = []
+        for topic in topics:
+            combined_text = "\n\n---\n\n".join(sources_by_topic[topic][:3])  # Use up to 3 sources
+            combined_text = truncate_to_tokens(combined_text, SYNTHESIS_SOURCE_TOKENS, config.enrichment_model)
+            blocks.append(f"[SOURCES FOR: {topic}]\n{combined_text}\n[END OF SOURCES]")
+        topic_list = "\n".join(f"## {t}" for t in topics)
+
+        prompt = f"""Summarize the following content into clear, exam-ready explanations, one per topic.
+
+Rules:
+- Educational tone
+- Fact-based
+- Avoid fluff
+- 200-300 words per topic
+- Focus on key concepts that would be tested in an exam
+- Use ONLY the sources given for that topic
+
+OUTPUT FORMAT (one section per topic, headings exactly as written):
+{topic_list}
+
+CONTENT:
+{chr(10).join(blocks)}
+
+Provide the concise, educational summaries:"""
+
+        try:
+            content = call_ollama(
+                prompt, config.enrichment_model, SYNTHESIS_TOKENS * len(topics), purpose="enrichment"
+            ).strip()
+            headings = list(_SECTION_RE.finditer(content))
+            sections = {}
+            for i, heading in enumerate(headings):
+                body_end = headings[i + 1].start() if i + 1 < len(headings) else len(content)
+                title = heading.group(1).strip().strip("*\"'").lower()
+                sections[title] = content[heading.end():body_end].strip()
+            for topic in topics:
+                body = sections.get(topic.strip().lower(), "")
+                if body:
+                    knowledge_by_topic[topic] = body
+        except Exception as e:
+            logger.warning(f"⚠ Batched knowledge synthesis failed: {e}")
+    # Per-topic fallback for anything the batched call didn't cover
+    missing = [t for t in topics if t not in knowledge_by_topic]
+    if missing and len(topics) > 1:
+        logger.warning(f"   ⚠ Batched synthesis incomplete, falling back for {len(missing)} topic(s)")
+    for topic in missing:
+        knowledge_by_topic[topic] = synthesize_knowledge(topic, sources_by_topic[topic], config)
+    return knowledge_by_topic
+
+def enrich_knowledge_with_web_search(transcript, config=None):
     """Agent-03: Main function to enrich transcript with web knowledge"""
-    mode_str = "FETCH_ALL (no filtering)" if FETCH_ALL_TOPICS else "STRICT (exam-safe)"
-    print(f"\n🧠 Agent-03: Web Knowledge Enrichment [{mode_str}]")
-    print("   Extracting topics from transcript...")
-    
-    # Step 1: Extract topics (LLM-first approach)
-    topics = extract_topics_from_transcript(transcript)
-    
-    # Step 1b: Fallback to keyword-based extraction if LLM fails
-    if not topics:
-        print("   ⚠ LLM topic extraction failed, trying fallback extractor...")
-        topics = fallback_topic_extraction(transcript)
+    config = config or default_pipeline_config()
+    mode_str = "FETCH_ALL (no filtering)" if config.fetch_all_topics else "STRICT (exam-safe)"
+    logger.info(f"🧠 Agent-03: Web Knowledge Enrichment [{mode_str}, source: {config.enrichment_source}]")
+    logger.info("   Extracting topics from transcript...")
+    # Step 1: Extract topics (local extractor saves one LLM round trip)
+    if config.topic_extractor == "local":
+        topics = fallback_topic_extraction(transcript, config)
         if not topics:
-            print("   ⚠ No topics extracted (LLM + fallback both failed), skipping enrichment")
-            print("   ℹ This is normal for very short, casual, or unclear transcripts")
+            logger.warning("   ⚠ No topics extracted by local extractor, skipping enrichment")
+            logger.info("   ℹ This is normal for very short, casual, or unclear transcripts")
             return ""
-        print("   ✓ Fallback extraction succeeded")
     else:
-        print(f"   ✓ LLM extracted {len(topics)} topics")
-    
+        # LLM-first approach
+        topics = extract_topics_from_transcript(transcript, config)
+        
+        # Step 1b: Fallback to keyword-based extraction if LLM fails
+        if not topics:
+            logger.warning("   ⚠ LLM topic extraction failed, trying fallback extractor...")
+            topics = fallback_topic_extraction(transcript, config)
+            if not topics:
+                logger.warning("   ⚠ No topics extracted (LLM + fallback both failed), skipping enrichment")
+                logger.info("   ℹ This is normal for very short, casual, or unclear transcripts")
+                return ""
+            logger.info("   ✓ Fallback extraction succeeded")
+        else:
+            logger.info(f"   ✓ LLM extracted {len(topics)} topics")
     # Step 2: Validate topics
-    validated_topics = validate_topics(topics)
+    validated_topics = validate_topics(topics, config)
     if not validated_topics:
-        print("   ⚠ No valid topics after validation, skipping enrichment")
-        print("   ℹ Topics may be too generic or transcript too vague")
+        logger.warning("   ⚠ No valid topics after validation, skipping enrichment")
+        logger.info("   ℹ Topics may be too generic or transcript too vague")
         return ""
     
-    print(f"   ✓ Validated {len(validated_topics)} topics (from {len(topics)} extracted)")
-    
+    logger.info(f"   ✓ Validated {len(validated_topics)} topics (from {len(topics)} extracted)")
     # Step 3-6: For each topic, generate queries, search, fetch, and synthesize
-    enriched_knowledge = []
+    selected_topics = validated_topics[:3]  # Limit to top 3 topics to avoid timeout
     
-    for topic in validated_topics[:3]:  # Limit to top 3 topics to avoid timeout
-        print(f"   📚 Enriching: {topic}")
-        
-        # Generate queries
-        queries = generate_search_queries(topic)
+    use_local = config.enrichment_source in ("local", "local+web")
+    use_web = config.enrichment_source in ("web", "local+web")
+    sources_by_topic = {}
+    
+    # Local knowledge index first (milliseconds, no query generation needed)
+    if use_local:
+        for topic in selected_topics:
+            hits = search_local_knowledge(topic)
+            if hits:
+                logger.info(f"   📚 Enriching: {topic} (local index, best score {hits[0]['score']:.1f})")
+                sources_by_topic[topic] = [hit["text"] for hit in hits]
+    
+    web_topics = [t for t in selected_topics if t not in sources_by_topic] if use_web else []
+    
+    # Query generation: one call for all topics (per-topic fallback inside)
+    if not web_topics:
+        queries_by_topic = {}
+    elif BATCH_ENRICHMENT:
+        queries_by_topic = generate_search_queries_batch(web_topics, config)
+    else:
+        queries_by_topic = {topic: generate_search_queries(topic, config) for topic in web_topics}
+    
+    for topic in web_topics:
+        logger.info(f"   📚 Enriching: {topic}")
+        queries = queries_by_topic.get(topic)
         if not queries:
             continue
         
@@ -782,25 +1631,41 @@ def enrich_knowledge_with_web_search(transcript):
                 if text:
                     web_texts.append(text)
         
-        if not web_texts:
-            continue
-        
-        # Synthesize knowledge
-        knowledge = synthesize_knowledge(topic, web_texts)
+        if web_texts:
+            sources_by_topic[topic] = web_texts
+    
+    # Synthesize knowledge: one call for all topics (per-topic fallback inside)
+    if BATCH_ENRICHMENT:
+        knowledge_by_topic = synthesize_knowledge_batch(sources_by_topic, config)
+    else:
+        knowledge_by_topic = {
+            topic: synthesize_knowledge(topic, texts, config) for topic, texts in sources_by_topic.items()
+        }
+    
+    enriched_knowledge = []
+    for topic in selected_topics:
+        knowledge = knowledge_by_topic.get(topic)
         if knowledge:
             enriched_knowledge.append(f"## {topic}\n{knowledge}")
     
     if not enriched_knowledge:
-        print("   ⚠ No enriched knowledge generated")
+        logger.warning("   ⚠ No enriched knowledge generated")
         return ""
     
     result = "\n\n".join(enriched_knowledge)
-    print(f"   ✓ Generated enriched knowledge ({len(result)} chars)")
+    logger.info(f"   ✓ Generated enriched knowledge ({len(result)} chars)")
     return result
 
 # ===============================
 # HARD DEDUP (FINAL GUARANTEE)
 # ===============================
+def normalize_question_text(question_text):
+    """Normalized dedup key for a question (lowercase, no punctuation, normalized spaces)"""
+    normalized = question_text.lower()
+    normalized = re.sub(r'[^\w\s]', '', normalized)  # Remove punctuation
+    normalized = re.sub(r'\s+', ' ', normalized).strip()  # Normalize spaces
+    return normalized
+
 def deduplicate(questions):
     """Remove duplicate questions - ensures each question appears ONLY ONCE (no repeats)"""
     seen = set()
@@ -815,10 +1680,7 @@ def deduplicate(questions):
         if not question_text:
             continue
             
-        # Create normalized key (lowercase, no punctuation, normalized spaces)
-        normalized = question_text.lower()
-        normalized = re.sub(r'[^\w\s]', '', normalized)  # Remove punctuation
-        normalized = re.sub(r'\s+', ' ', normalized).strip()  # Normalize spaces
+        normalized = normalize_question_text(question_text)
         
         # Check for exact duplicates - each question must appear ONLY ONCE
         if normalized not in seen and normalized:
@@ -831,6 +1693,20 @@ def deduplicate(questions):
 # ===============================
 # JSON REPAIR (HANDLE INCOMPLETE JSON)
 # ===============================
+# One complete question object. Every option is followed by an optional comma but no
+# trailing whitespace of its own, so there is exactly one way to split the whitespace
+# between options - the old `\s*,?\s*` form backtracked exponentially on malformed
+# options (seconds to minutes for a few hundred bytes, see benchmarks/micro_benchmark.py)
+_MCQ_OBJECT_RE = re.compile(
+    r'\{\s*"question"\s*:\s*"((?:[^"\\]|\\.)*)"'
+    r'\s*,\s*"options"\s*:\s*\{((?:\s*"[A-D]"\s*:\s*"(?:[^"\\]|\\.)*"(?:\s*,)?)+)\s*\}'
+    r'\s*,\s*"correct_answer"\s*:\s*"([A-D])"'
+    r'\s*,\s*"explanation"\s*:\s*"((?:[^"\\]|\\.)*)"\s*\}',
+    re.DOTALL
+)
+_MCQ_OPTION_RE = re.compile(r'"([A-D])"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
 def repair_json(json_str):
     """Try to repair incomplete or malformed JSON from Ollama"""
     # Remove trailing commas
@@ -839,10 +1715,7 @@ def repair_json(json_str):
     
     # Try to extract individual questions using regex
     questions = []
-    # Pattern to match a complete question object
-    pattern = r'\{\s*"question"\s*:\s*"((?:[^"\\]|\\.)*)"\s*,\s*"options"\s*:\s*\{((?:\s*"[A-D]"\s*:\s*"(?:[^"\\]|\\.)*"\s*,?\s*)+)\}\s*,\s*"correct_answer"\s*:\s*"([A-D])"\s*,\s*"explanation"\s*:\s*"((?:[^"\\]|\\.)*)"\s*\}'
-    
-    for match in re.finditer(pattern, json_str, re.DOTALL):
+    for match in _MCQ_OBJECT_RE.finditer(json_str):
         try:
             question_text = match.group(1)
             options_text = match.group(2)
@@ -851,8 +1724,7 @@ def repair_json(json_str):
             
             # Parse options
             options = {}
-            opt_pattern = r'"([A-D])"\s*:\s*"((?:[^"\\]|\\.)*)"'
-            for opt_match in re.finditer(opt_pattern, options_text):
+            for opt_match in _MCQ_OPTION_RE.finditer(options_text):
                 options[opt_match.group(1)] = opt_match.group(2)
             
             if len(options) == 4 and question_text:
@@ -870,28 +1742,48 @@ def repair_json(json_str):
 # ===============================
 # OLLAMA MCQ GENERATOR (DIRECT BINARY)
 # ===============================
-def generate_mcqs_with_ollama(transcript, max_retries=None):
-    """Generate MCQs using Ollama binary directly - ensures EXACTLY 20 questions (not less, not more)"""
+@stage_timer("mcq_generation")
+def generate_mcqs_with_ollama(transcript, max_retries=None, target_count=20, existing=None, config=None):
+    """
+    Generate MCQs using Ollama binary directly - ensures EXACTLY target_count questions (not less, not more)
+    
+    Args:
+        transcript: Transcript (optionally merged with enriched knowledge)
+        max_retries: Extra attempts for missing questions (default depends on FAST_MODE)
+        target_count: Exact number of questions to return (20 for a full quiz)
+        existing: Questions already generated for this quiz; they count towards
+            target_count and new questions must not repeat them
+        config: PipelineConfig (model, context budget, retries); process defaults if None
+    """
+    config = config or default_pipeline_config()
     if max_retries is None:
-        max_retries = 3 if FAST_MODE else 10  # Fewer retries in fast mode
+        max_retries = config.max_retries  # Fewer retries in fast mode
+    
+    all_questions = deduplicate(list(existing or []))
+    TARGET_COUNT = target_count  # EXACTLY this many questions required
     
-    all_questions = []
-    TARGET_COUNT = 20  # EXACTLY 20 questions required
+    # Token budget for transcript + enriched knowledge (replaces character slicing)
+    context = truncate_to_tokens(transcript, config.max_context_tokens, config.ollama_model)
     
+    retry_reason = "missing_questions"
     for attempt in range(max_retries + 1):
         if attempt > 0:
-            needed = TARGET_COUNT - len(all_questions)
-            if needed <= 0:
-                # We have enough, but need to trim to exactly 20
-                if len(all_questions) > TARGET_COUNT:
-                    print(f"✓ Trimming to exactly {TARGET_COUNT} questions (had {len(all_questions)})")
-                    return all_questions[:TARGET_COUNT]
-                elif len(all_questions) == TARGET_COUNT:
-                    print(f"✓ SUCCESS: Generated exactly {TARGET_COUNT} questions")
-                    return all_questions
-            print(f"🔄 Retry {attempt}/{max_retries}: Need {needed} more questions (have {len(all_questions)}/{TARGET_COUNT})...")
-            
-            # Generate only the missing questions
+            record_retry("mcq_generation", retry_reason)
+        retry_reason = "missing_questions"
+        needed = TARGET_COUNT - len(all_questions)
+        if needed <= 0:
+            # We have enough, but need to trim to exactly TARGET_COUNT
+            if len(all_questions) > TARGET_COUNT:
+                logger.info(f"✓ Trimming to exactly {TARGET_COUNT} questions (had {len(all_questions)})")
+                return all_questions[:TARGET_COUNT]
+            logger.info(f"✓ SUCCESS: Generated exactly {TARGET_COUNT} questions")
+            return all_questions
+        
+        if all_questions:
+            if attempt > 0:
+                logger.info(f"🔄 Retry {attempt}/{max_retries}: Need {needed} more questions (have {len(all_questions)}/{TARGET_COUNT})...")
+            # Generate only the missing questions, showing the model what to avoid
+            already_generated = "\n".join(f"- {q.get('question', '')}" for q in all_questions)
             prompt = f"""Generate EXACTLY {needed} MORE unique multiple-choice questions from this transcript.
 
 CRITICAL REQUIREMENTS:
@@ -900,6 +1792,9 @@ CRITICAL REQUIREMENTS:
 - Each question must test a UNIQUE concept
 - Output ONLY valid JSON, no other text
 
+QUESTIONS ALREADY GENERATED (do NOT repeat or rephrase these):
+{already_generated}
+
 JSON FORMAT (EXACTLY {needed} questions):
 {{
   "questions": [
@@ -913,20 +1808,22 @@ JSON FORMAT (EXACTLY {needed} questions):
 }}
 
 TRANSCRIPT:
-{transcript[:MAX_TRANSCRIPT_CHARS]}
+{context}
 
 Generate EXACTLY {needed} NEW unique questions. Output JSON only:"""
         else:
-            # First attempt - generate all 20
-            prompt = f"""Generate EXACTLY 20 unique multiple-choice questions from this transcript.
+            if attempt > 0:
+                logger.info(f"🔄 Retry {attempt}/{max_retries}: Need {needed} more questions (have 0/{TARGET_COUNT})...")
+            # Nothing accepted yet - generate the full set
+            prompt = f"""Generate EXACTLY {needed} unique multiple-choice questions from this transcript.
 
 CRITICAL REQUIREMENTS:
-- Generate EXACTLY 20 questions (not 19, not 21, EXACTLY 20)
+- Generate EXACTLY {needed} questions (not {needed-1}, not {needed+1}, EXACTLY {needed})
 - Each question tests a DIFFERENT concept
 - NO repeats - every question must be unique
 - Output ONLY valid JSON, no markdown, no explanations outside JSON
 
-JSON FORMAT (EXACTLY 20 questions):
+JSON FORMAT (EXACTLY {needed} questions):
 {{
   "questions": [
     {{
@@ -939,36 +1836,17 @@ JSON FORMAT (EXACTLY 20 questions):
 }}
 
 TRANSCRIPT:
-{transcript[:MAX_TRANSCRIPT_CHARS]}
+{context}
 
-Generate EXACTLY 20 questions. Output JSON only:"""
+Generate EXACTLY {needed} questions. Output JSON only:"""
         
-        print("🧠 Generating 20 UNIQUE MCQs using Ollama binary (local, free)")
+        logger.info(f"🧠 Generating {needed} UNIQUE MCQs using Ollama binary (local, free)")
         if attempt == 0:
-            print("   This may take 1-3 minutes depending on transcript length...")
-        
-        # Call Ollama binary directly via subprocess
+            logger.info("   This may take 1-3 minutes depending on transcript length...")
+        # Call Ollama (timeout and num_predict sized to the questions requested)
         try:
-            # Use UTF-8 encoding to avoid encoding issues
-            result = subprocess.run(
-                [OLLAMA_CMD, "run", OLLAMA_MODEL, prompt],
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',  # Replace invalid chars instead of failing
-                timeout=90 if FAST_MODE else 300,  # Faster timeout in fast mode
-                check=False  # Don't raise on non-zero exit
-            )
-            
-            if result.returncode != 0:
-                raise RuntimeError(
-                    f"Ollama failed with return code {result.returncode}\n"
-                    f"Error: {result.stderr}\n"
-                    f"Make sure Ollama is installed at: {OLLAMA_CMD}\n"
-                    f"And model is pulled: ollama pull {OLLAMA_MODEL}"
-                )
-            
-            content = result.stdout
+            with span("mcq_attempt", attempt=attempt, needed=needed):
+                content = call_ollama(prompt, config.ollama_model, TOKENS_PER_MCQ * needed + 150)
             
             # Clean and extract JSON from response
             # Remove markdown code blocks if present
@@ -979,6 +1857,7 @@ Generate EXACTLY 20 questions. Output JSON only:"""
             end = content.rfind("}")
             
             if start == -1 or end == -1:
+                record_json_parse("missing")
                 raise RuntimeError(f"No JSON returned by Ollama. Output: {content[:200]}")
             
             json_str = content[start:end + 1]
@@ -992,15 +1871,16 @@ Generate EXACTLY 20 questions. Output JSON only:"""
             data = None
             try:
                 data = json.loads(json_str)
+                record_json_parse("valid")
             except json.JSONDecodeError as e:
-                print("⚠ JSON parsing issue, attempting recovery...")
-                
+                logger.warning("⚠ JSON parsing issue, attempting recovery...")
                 # Try to extract questions using regex pattern matching
                 recovered_questions = repair_json(json_str)
                 
                 if len(recovered_questions) >= 5:  # If we got at least 5 valid questions
-                    print(f"✓ Recovered {len(recovered_questions)} questions from partial JSON")
+                    logger.info(f"✓ Recovered {len(recovered_questions)} questions from partial JSON")
                     data = {"questions": recovered_questions}
+                    record_json_parse("regex_recovered")
                 else:
                     # Last resort: try to fix the JSON by closing it properly
                     error_pos = e.pos if hasattr(e, 'pos') else len(json_str)
@@ -1020,16 +1900,19 @@ Generate EXACTLY 20 questions. Output JSON only:"""
                         
                         try:
                             data = json.loads(fixed_json)
-                            print("✓ Fixed incomplete JSON by closing brackets")
+                            record_json_parse("brackets_closed")
+                            logger.info("✓ Fixed incomplete JSON by closing brackets")
                         except:
                             pass
                     
                     if data is None:
                         # Try one more time with the recovered questions
                         if len(recovered_questions) > 0:
-                            print(f"⚠ Using {len(recovered_questions)} recovered questions (may be incomplete)")
+                            logger.warning(f"⚠ Using {len(recovered_questions)} recovered questions (may be incomplete)")
                             data = {"questions": recovered_questions}
+                            record_json_parse("partial")
                         else:
+                            record_json_parse("failed")
                             raise RuntimeError(
                                 f"JSON parsing failed. Ollama generated incomplete/malformed JSON.\n"
                                 f"Error: {str(e)}\n"
@@ -1054,6 +1937,7 @@ Generate EXACTLY 20 questions. Output JSON only:"""
             
             if len(new_questions) == 0:
                 if attempt < max_retries:
+                    retry_reason = "no_questions"
                     continue  # Try again
                 else:
                     raise RuntimeError("No valid questions generated after all retries.")
@@ -1064,45 +1948,47 @@ Generate EXACTLY 20 questions. Output JSON only:"""
             
             # Check if we have exactly 20
             if len(all_questions) == TARGET_COUNT:
-                print(f"✓ SUCCESS: Generated exactly {TARGET_COUNT} unique questions")
+                logger.info(f"✓ SUCCESS: Generated exactly {TARGET_COUNT} unique questions")
                 return all_questions
             elif len(all_questions) > TARGET_COUNT:
-                print(f"✓ SUCCESS: Generated {len(all_questions)} questions, trimming to exactly {TARGET_COUNT}")
+                logger.info(f"✓ SUCCESS: Generated {len(all_questions)} questions, trimming to exactly {TARGET_COUNT}")
                 return all_questions[:TARGET_COUNT]
             
             # If we still need more and have retries left, continue
             if len(all_questions) < TARGET_COUNT and attempt < max_retries:
                 continue
         
-        except FileNotFoundError:
-            if attempt < max_retries:
-                print(f"⚠ Ollama not found, retrying...")
-                continue
+        except (OperationCancelled, CircuitOpen):
+            raise  # Never retry a cancelled request or an upstream known to be down
+        except FileNotFoundError as e:
+            # A missing binary does not come back on retry
             raise RuntimeError(
-                f"Ollama executable not found at: {OLLAMA_CMD}\n"
+                f"Ollama executable not found ({e})\n"
                 f"Make sure Ollama is installed. Download from: https://ollama.com"
             )
-        except subprocess.TimeoutExpired:
+        except subprocess.TimeoutExpired as e:
             if attempt < max_retries:
-                print(f"⚠ Timeout, retrying...")
+                logger.warning(f"⚠ Timeout, retrying...")
+                retry_reason = "timeout"
                 continue
             raise RuntimeError(
-                f"Ollama request timed out after 5 minutes.\n"
+                f"Ollama request timed out after {e.timeout:.0f} seconds.\n"
                 f"Try using a smaller model or shorter transcript."
             )
         except Exception as e:
             if attempt < max_retries:
-                print(f"⚠ Error on attempt {attempt + 1}: {str(e)}")
+                logger.warning(f"⚠ Error on attempt {attempt + 1}: {str(e)}")
+                retry_reason = "error"
                 continue
             else:
                 raise
     
     # Final result - MUST have exactly 20
     if len(all_questions) == TARGET_COUNT:
-        print(f"✓ SUCCESS: Generated exactly {TARGET_COUNT} unique questions")
+        logger.info(f"✓ SUCCESS: Generated exactly {TARGET_COUNT} unique questions")
         return all_questions
     elif len(all_questions) > TARGET_COUNT:
-        print(f"✓ SUCCESS: Generated {len(all_questions)} questions, trimming to exactly {TARGET_COUNT}")
+        logger.info(f"✓ SUCCESS: Generated {len(all_questions)} questions, trimming to exactly {TARGET_COUNT}")
         return all_questions[:TARGET_COUNT]
     else:
         # CRITICAL: We MUST have exactly 20, raise error if we can't get it
@@ -1118,10 +2004,124 @@ Generate EXACTLY 20 questions. Output JSON only:"""
             f"   4. Increase max_retries in the code"
         )
 
+# ===============================
+# QUIZ PIPELINE (ENRICHMENT OVERLAPPED WITH MCQ GENERATION)
+# ===============================
+def merge_enriched_context(transcript, enriched_knowledge):
+    """Merge transcript with Agent-03 knowledge (transcript only if enrichment is empty)"""
+    if enriched_knowledge:
+        return f"{transcript}\n\n--- ENRICHED KNOWLEDGE ---\n\n{enriched_knowledge}"
+    return transcript
+
+def run_enrichment(transcript, config=None):
+    """Agent-03 enrichment, timed for deadline planning"""
+    with timed_stage("enrichment"):
+        return enrich_knowledge_with_web_search(transcript, config)
+
+def generate_enriched_mcqs(transcript, max_retries=None, target_count=20, config=None,
+                           scheduler=None):
+    """
+    Full-mode quiz: Agent-03 enrichment + MCQ generation, overlapped.
+    
+    Pipeline (SPECULATIVE_PIPELINE=true):
+    1. Start enrichment in a background thread
+    2. Immediately generate (target_count - ENRICHMENT_QUOTA) transcript-grounded questions
+    3. Wait for enrichment until ENRICHMENT_DEADLINE (measured from step 1)
+    4. Fill the remaining quota from transcript + enriched knowledge
+       (or from the transcript alone if enrichment failed or missed the deadline)
+    
+    With SPECULATIVE_PIPELINE=false enrichment runs to completion first (sequential).
+    With a deadline scheduler the wait in step 3 is also capped so that the
+    remaining questions still fit before the request deadline.
+    
+    Returns:
+        List of exactly target_count MCQ dictionaries
+    """
+    config = config or default_pipeline_config()
+    if not SPECULATIVE_PIPELINE:
+        enriched_knowledge = run_enrichment(transcript, config)
+        return generate_mcqs_with_ollama(
+            merge_enriched_context(transcript, enriched_knowledge),
+            max_retries=max_retries,
+            target_count=target_count,
+            config=config
+        )
+    
+    started = time.monotonic()
+    # Agent-03 gets a child token: stopped with the request, or on its own once its result is dropped
+    enrichment_token = child_token(current_token())
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent03")
+    enrichment = None
+    try:
+        # Copy the request context so Agent-03 inherits the trace and pipeline settings
+        enrichment = executor.submit(
+            contextvars.copy_context().run, _run_enrichment_in_scope, enrichment_token, transcript, config
+        )
+        
+        transcript_quota = max(1, target_count - ENRICHMENT_QUOTA)
+        logger.info(f"⚡ Generating {transcript_quota} transcript-grounded questions while Agent-03 runs...")
+        questions = generate_mcqs_with_ollama(
+            transcript, max_retries=max_retries, target_count=transcript_quota, config=config
+        )
+        
+        remaining = ENRICHMENT_DEADLINE - (time.monotonic() - started)
+        if scheduler is not None:
+            remaining = min(remaining, scheduler.enrichment_wait(config, target_count - len(questions)))
+        try:
+            enriched_knowledge = enrichment.result(timeout=max(0.0, remaining))
+        except FuturesTimeout:
+            logger.warning(f"⚠ Enrichment missed its deadline ({remaining:.0f}s left to wait), dropping it")
+            if scheduler is not None:
+                scheduler.degrade("skip_enrichment")
+            enriched_knowledge = ""
+        except Exception as e:
+            logger.warning(f"⚠ Enrichment failed, continuing with transcript only: {e}")
+            enriched_knowledge = ""
+        
+        if enriched_knowledge:
+            logger.info("✓ Merging transcript with enriched knowledge for the remaining questions...")
+        return generate_mcqs_with_ollama(
+            merge_enriched_context(transcript, enriched_knowledge),
+            max_retries=max_retries,
+            target_count=target_count,
+            existing=questions,
+            config=config
+        )
+    finally:
+        # Don't block on a late enrichment thread - its result is discarded, so stop its Ollama calls
+        if enrichment is not None and not enrichment.done():
+            enrichment_token.cancel("enrichment result discarded")
+        executor.shutdown(wait=False)
+
+def _run_enrichment_in_scope(token, transcript, config):
+    with cancel_scope(token):
+        return run_enrichment(transcript, config)
+
+def generate_quiz_questions(transcript, config=None, scheduler=None):
+    """
+    Generate the MCQs for a cleaned transcript (enrichment skipped in fast mode).
+    
+    20 questions, unless a deadline scheduler cuts the count (or skips
+    enrichment) to finish in time.
+    """
+    config = config or default_pipeline_config()
+    target_count = 20
+    if scheduler is not None:
+        config, target_count = scheduler.plan_generation(
+            config, count_tokens(transcript, config.ollama_model)
+        )
+    if config.fast_mode:
+        # Skip enrichment for faster processing (~30 seconds)
+        return generate_mcqs_with_ollama(transcript, target_count=target_count, config=config)
+    return generate_enriched_mcqs(
+        transcript, target_count=target_count, config=config, scheduler=scheduler
+    )
+
 # ===============================
 # MAIN
 # ===============================
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     if len(sys.argv) < 2:
         print("Usage: python youtube_quiz_generator.py <youtube_url>")
         sys.exit(1)
@@ -1145,18 +2145,8 @@ def main():
 
     transcript = clean_transcript(transcript)
 
-    # Agent-03: Enrich knowledge with web search
-    enriched_knowledge = enrich_knowledge_with_web_search(transcript)
-    
-    # Merge transcript with enriched knowledge
-    if enriched_knowledge:
-        enriched_context = f"{transcript}\n\n--- ENRICHED KNOWLEDGE ---\n\n{enriched_knowledge}"
-        print("\n✓ Merging transcript with enriched knowledge...")
-    else:
-        enriched_context = transcript
-        print("\n✓ Using transcript only (no enrichment)")
-
-    questions = generate_mcqs_with_ollama(enriched_context)
+    # Agent-03: Enrich knowledge with web search (overlapped with MCQ generation)
+    questions = generate_enriched_mcqs(transcript)
 
     # Final validation: MUST have exactly 20 questions
     if len(questions) != 20:
@@ -1186,7 +2176,7 @@ def main():
 # ===============================
 # API WRAPPER FUNCTION (for FastAPI/REST API)
 # ===============================
-def generate_quiz_from_url(youtube_url: str):
+def generate_quiz_from_url(youtube_url: str, config=None, scheduler=None, cancel_token=None):
     """
     Generate 20 unique MCQs from a YouTube URL.
     
@@ -1195,52 +2185,64 @@ def generate_quiz_from_url(youtube_url: str):
     
     Args:
         youtube_url: YouTube video URL
+        config: PipelineConfig for this request (see get_pipeline_config);
+            process defaults if None
+        scheduler: Optional DeadlineScheduler; applied degradations are
+            recorded in scheduler.degradations
+        cancel_token: Optional CancellationToken; cancelling it (client disconnect,
+            deadline) stops every stage and kills child processes
         
     Returns:
         List of 20 MCQ dictionaries with keys: question, options, correct_answer, explanation
+        (scheduler.question_count if the deadline forced fewer)
         
     Raises:
-        RuntimeError: If exactly 20 questions cannot be generated
+        RuntimeError: If the expected number of questions cannot be generated
+        OperationCancelled: If cancel_token was cancelled
         Exception: For transcript fetching or processing errors
     """
-    fetcher = YouTubeTranscriptFetcher()
-    
-    try:
-        transcript = fetcher.fetch(youtube_url)
-    except Exception as e:
-        if IS_CLOUD_ENV:
+    with cancel_scope(cancel_token or current_token()), pipeline_timer("youtube", url=youtube_url):
+        config = config or default_pipeline_config()
+        cache = get_transcript_cache()
+        video_id = canonical_video_id(youtube_url)
+        whisper_source = f"whisper:{config.whisper_model}"
+        
+        # Shared by every worker on the host (transcript_cache.py)
+        transcript = cache.get(video_id, "captions", whisper_source)
+        if transcript is None:
+            try:
+                transcript = YouTubeTranscriptFetcher().fetch(youtube_url)
+                cache.put(video_id, "captions", transcript)
+            except OperationCancelled:
+                raise  # Not "no captions": no Whisper fallback for a cancelled request
+            except Exception as e:
+                if IS_CLOUD_ENV:
+                    raise RuntimeError(
+                        "Transcript unavailable. Whisper fallback is disabled on cloud servers. "
+                        "Please use a video with available captions."
+                    )
+                degradations = len(scheduler.degradations) if scheduler is not None else 0
+                transcriber = WhisperAudioTranscriber(model=config.whisper_model, config=config)
+                transcript = transcriber.transcribe(youtube_url, scheduler)
+                if scheduler is None or len(scheduler.degradations) == degradations:
+                    cache.put(video_id, whisper_source, transcript)
+        
+        transcript = clean_transcript(transcript, config)
+        
+        # Agent-03 enrichment (skipped in fast mode) + MCQ generation
+        questions = generate_quiz_questions(transcript, config, scheduler)
+        
+        # Final validation: MUST have exactly 20 questions (unless the deadline cut the quiz)
+        expected = scheduler.question_count if scheduler is not None else 20
+        if len(questions) != expected:
             raise RuntimeError(
-                "Transcript unavailable. Whisper fallback is disabled on cloud servers. "
-                "Please use a video with available captions."
+                f"Expected exactly {expected} questions, but got {len(questions)}"
             )
-        transcriber = WhisperAudioTranscriber(model=WHISPER_MODEL)
-        transcript = transcriber.transcribe(youtube_url)
-    
-    transcript = clean_transcript(transcript)
-    
-    # Agent-03: Enrich knowledge with web search (skipped in FAST_MODE)
-    if FAST_MODE:
-        # Skip enrichment for faster processing (~30 seconds)
-        enriched_context = transcript
-    else:
-        enriched_knowledge = enrich_knowledge_with_web_search(transcript)
-        if enriched_knowledge:
-            enriched_context = f"{transcript}\n\n--- ENRICHED KNOWLEDGE ---\n\n{enriched_knowledge}"
-        else:
-            enriched_context = transcript
-    
-    questions = generate_mcqs_with_ollama(enriched_context, max_retries=3 if FAST_MODE else 10)
-    
-    # Final validation: MUST have exactly 20 questions
-    if len(questions) != 20:
-        raise RuntimeError(
-            f"Expected exactly 20 questions, but got {len(questions)}"
-        )
-    
-    return questions
+        
+        return questions
 
 
-def generate_quiz_from_video_url(video_url: str):
+def generate_quiz_from_video_url(video_url: str, config=None, scheduler=None, cancel_token=None):
     """
     Generate 20 unique MCQs from a direct video URL (S3, CDN, HTTPS).
     
@@ -1256,42 +2258,53 @@ def generate_quiz_from_video_url(video_url: str):
     
     Args:
         video_url: HTTP/HTTPS URL to video file (e.g., S3 URL)
+        config: PipelineConfig for this request (see get_pipeline_config);
+            process defaults if None
+        scheduler: Optional DeadlineScheduler; applied degradations are
+            recorded in scheduler.degradations
+        cancel_token: Optional CancellationToken; cancelling it (client disconnect,
+            deadline) stops every stage and kills child processes
         
     Returns:
         List of 20 MCQ dictionaries with keys: question, options, correct_answer, explanation
+        (scheduler.question_count if the deadline forced fewer)
         
     Raises:
-        RuntimeError: If exactly 20 questions cannot be generated
+        RuntimeError: If the expected number of questions cannot be generated
+        OperationCancelled: If cancel_token was cancelled
         Exception: For video download, transcription, or processing errors
     """
-    # Step 1: Transcribe video from URL
-    transcriber = VideoURLTranscriber(model=WHISPER_MODEL)
-    transcript = transcriber.transcribe_from_url(video_url)
-    
-    # Step 2: Clean transcript
-    transcript = clean_transcript(transcript)
-    
-    # Step 3: Agent-03: Enrich knowledge with web search (skipped in FAST_MODE)
-    if FAST_MODE:
-        # Skip enrichment for faster processing (~30 seconds)
-        enriched_context = transcript
-    else:
-        enriched_knowledge = enrich_knowledge_with_web_search(transcript)
-        if enriched_knowledge:
-            enriched_context = f"{transcript}\n\n--- ENRICHED KNOWLEDGE ---\n\n{enriched_knowledge}"
-        else:
-            enriched_context = transcript
-    
-    # Step 4: Generate MCQs
-    questions = generate_mcqs_with_ollama(enriched_context, max_retries=3 if FAST_MODE else 10)
-    
-    # Step 6: Validate
-    if len(questions) != 20:
-        raise RuntimeError(
-            f"Expected exactly 20 questions, but got {len(questions)}"
-        )
-    
-    return questions
+    with cancel_scope(cancel_token or current_token()), pipeline_timer("video_url", url=video_url):
+        config = config or default_pipeline_config()
+        
+        # Step 1: Transcribe video from URL (unless a worker on this host already did)
+        cache = get_transcript_cache()
+        video_id = canonical_video_id(video_url)
+        source = f"whisper:{config.whisper_model}"
+        transcript = cache.get(video_id, source)
+        if transcript is None:
+            degradations = len(scheduler.degradations) if scheduler is not None else 0
+            transcriber = VideoURLTranscriber(config=config)
+            transcript = transcriber.transcribe_from_url(video_url, scheduler)
+            # A downgraded / sampled transcript only serves this request
+            if scheduler is None or len(scheduler.degradations) == degradations:
+                cache.put(video_id, source, transcript)
+        
+        # Step 2: Clean transcript
+        transcript = clean_transcript(transcript, config)
+        
+        # Step 3-4: Agent-03 enrichment (skipped in fast mode, overlapped with MCQ
+        # generation otherwise) + MCQ generation
+        questions = generate_quiz_questions(transcript, config, scheduler)
+        
+        # Step 6: Validate
+        expected = scheduler.question_count if scheduler is not None else 20
+        if len(questions) != expected:
+            raise RuntimeError(
+                f"Expected exactly {expected} questions, but got {len(questions)}"
+            )
+        
+        return questions
 
 
 # ===============================